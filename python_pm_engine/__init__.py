@@ -1,22 +1,34 @@
 """
 Python Password Manager Engine Package
+Public names are imported on first access (PEP 562), so importing the
+package does not load the engine or cryptography
 """
 
-from pm_engine import PasswordManagerEngine
-from pm_crypto import (
-    ez_subtle_encrypt,
-    ez_subtle_decrypt,
-    generate_sym_key,
-    generate_and_export_key,
-    import_raw_key
-)
+import importlib
 
 __version__ = "1.0.0"
-__all__ = [
-    "PasswordManagerEngine",
-    "ez_subtle_encrypt",
-    "ez_subtle_decrypt", 
-    "generate_sym_key",
-    "generate_and_export_key",
-    "import_raw_key"
-]
+
+# Public name -> module that defines it
+_LAZY_ATTRS = {
+    "PasswordManagerEngine": "pm_engine",
+    "ez_subtle_encrypt": "pm_crypto",
+    "ez_subtle_decrypt": "pm_crypto",
+    "generate_sym_key": "pm_crypto",
+    "generate_and_export_key": "pm_crypto",
+    "import_raw_key": "pm_crypto",
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
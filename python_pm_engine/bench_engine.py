@@ -0,0 +1,298 @@
+"""
+Benchmarks for Python Password Manager Engine
+Times the codec, KDF, AES-GCM and CSV vault loading/search on generated vaults
+
+Usage:
+    python bench_engine.py                                  # 1k, 10k and 100k row vaults
+    python bench_engine.py --sizes 1000 --output results.json
+    python bench_engine.py --save-baseline baseline.json
+    python bench_engine.py --baseline baseline.json --threshold 0.25 --max-slowdown kdf.derive=0.5
+
+Results are seconds per call (lower is better). With --baseline the exit
+status is 1 if any benchmark is slower than the baseline by more than its threshold.
+The report also has a "memory" section: bytes per loaded entry, measured with
+tracemalloc, for the list-of-lists rows of read_csv_vault and for a columnar Vault.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pm_crypto import (
+    bytes_to_base64,
+    base64_string_to_bytes,
+    compress_payload,
+    decompress_payload,
+    disable_kdf_cache,
+    ez_subtle_decrypt,
+    ez_subtle_encrypt,
+    encrypt_many,
+    generate_sym_key,
+    get_key_material_from_passphrase,
+    import_raw_key,
+    KeyHandle
+)
+from pm_engine import PasswordManagerEngine
+from pm_vault import CsvVaultReader, read_csv_vault, Vault
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_THRESHOLD = 0.25  # allowed slowdown, as a fraction of the baseline
+BENCH_PASSPHRASE = "benchmark passphrase"
+HEADERS = ["Index", "Site", "Username", "Password", "AdditionalInfo"]
+
+
+def timeit(func: Callable, number: int = 1, repeat: int = 3) -> float:
+    """Best of `repeat` runs, in seconds per call"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def make_vault(csv_file: str, rows: int, master_key: bytes):
+    """Writes a CSV export with `rows` entries encrypted with master_key"""
+    handle = KeyHandle(master_key)
+    with open(csv_file, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(["Master key", ez_subtle_encrypt(master_key, BENCH_PASSPHRASE)])
+        writer.writerow(HEADERS)
+        for i in range(1, rows + 1):
+            writer.writerow([
+                str(i),
+                f"site{i}.example.com",
+                ez_subtle_encrypt(f"user{i}@example.com", handle),
+                ez_subtle_encrypt(f"password-{i:08d}", handle),
+                ez_subtle_encrypt(f"note for entry {i}", handle),
+            ])
+
+
+def bench_codec(repeat: int) -> Dict[str, float]:
+    """JS-compatible base64 codec on an IV-sized and a secret-sized buffer"""
+    results = {}
+    for size in (12, 48):
+        data = os.urandom(size)
+        encoded = bytes_to_base64(data)
+        results[f"codec.bytes_to_base64.{size}b"] = timeit(lambda: bytes_to_base64(data), 2000, repeat)
+        results[f"codec.base64_string_to_bytes.{size}b"] = timeit(lambda: base64_string_to_bytes(encoded), 2000, repeat)
+    return results
+
+
+def bench_crypto(repeat: int) -> Dict[str, float]:
+    """PBKDF2 and AES-GCM per call (the KDF cache is disabled)"""
+    disable_kdf_cache()
+    master_key = generate_sym_key()
+    handle = KeyHandle(master_key)
+    plaintext = b"password-12345678"
+    batch = [plaintext] * 1000
+    ciphertext = ez_subtle_encrypt(plaintext, handle)
+    encrypted_master_key = ez_subtle_encrypt(master_key, BENCH_PASSPHRASE)
+    # A long AdditionalInfo value: recovery codes and a PEM-like block
+    note = "\n".join([f"recovery code {i}: {os.urandom(5).hex()}" for i in range(10)] +
+                     [bytes_to_base64(os.urandom(48))[:64] for _ in range(20)])
+    note_ciphertext = ez_subtle_encrypt(note, handle)
+    compressed_note_ciphertext = ez_subtle_encrypt(compress_payload(note), handle)
+    return {
+        "kdf.derive": timeit(lambda: get_key_material_from_passphrase(BENCH_PASSPHRASE), 200, repeat),
+        "crypto.unlock_master_key": timeit(
+            lambda: import_raw_key(ez_subtle_decrypt(encrypted_master_key, BENCH_PASSPHRASE)), 200, repeat),
+        "crypto.encrypt": timeit(lambda: ez_subtle_encrypt(plaintext, handle), 2000, repeat),
+        "crypto.decrypt": timeit(lambda: ez_subtle_decrypt(ciphertext, handle), 2000, repeat),
+        # Per item, so it compares directly with crypto.encrypt
+        "crypto.encrypt_many": timeit(lambda: encrypt_many(batch, handle), 20, repeat) / len(batch),
+        "crypto.encrypt_note": timeit(lambda: ez_subtle_encrypt(note, handle), 500, repeat),
+        "crypto.encrypt_note_compressed": timeit(lambda: ez_subtle_encrypt(compress_payload(note), handle), 500, repeat),
+        "crypto.decrypt_note": timeit(lambda: ez_subtle_decrypt(note_ciphertext, handle), 500, repeat),
+        "crypto.decrypt_note_compressed": timeit(
+            lambda: decompress_payload(ez_subtle_decrypt(compressed_note_ciphertext, handle)), 500, repeat),
+    }
+
+
+def vault_path(workdir: str, rows: int) -> str:
+    return os.path.join(workdir, f"vault_{rows}.csv")
+
+
+def bench_vault(rows: int, workdir: str, repeat: int, workers: Optional[int] = None) -> Dict[str, float]:
+    """Loading, scanning, indexing, searching and decrypting a generated vault"""
+    csv_file = vault_path(workdir, rows)
+    master_key = generate_sym_key()
+    make_vault(csv_file, rows, master_key)
+
+    def stream_scan():
+        with CsvVaultReader(csv_file) as reader:
+            reader.scan()
+
+    _, headers, data_rows = read_csv_vault(csv_file)
+    sites = [row[1] for row in data_rows]
+    engine = PasswordManagerEngine()
+    engine.master_key = master_key
+    engine.build_site_index(sites)
+
+    middle = rows // 2 or 1
+    prefix = f"site{str(middle)[:2]}"
+    typo = f"stie{middle}.exmaple.com"
+
+    name = f"vault.{rows}"
+    return {
+        f"{name}.read_csv_vault": timeit(lambda: read_csv_vault(csv_file), 1, repeat),
+        f"{name}.load_vault": timeit(lambda: Vault.from_csv(csv_file), 1, repeat),
+        f"{name}.stream_scan": timeit(stream_scan, 1, repeat),
+        f"{name}.build_site_index": timeit(lambda: engine.build_site_index(sites), 1, repeat),
+        f"{name}.search_exact": timeit(lambda: engine.search_sites(f"site{middle}.example.com", limit=10), 20, repeat),
+        f"{name}.search_prefix": timeit(lambda: engine.search_sites(prefix, limit=10), 20, repeat),
+        f"{name}.search_fuzzy": timeit(lambda: engine.search_sites(typo, limit=10), 5, repeat),
+        f"{name}.decrypt_vault": timeit(lambda: list(engine.decrypt_vault(data_rows, headers, workers)), 1, repeat),
+        f"{name}.decrypt_vault_processes": timeit(
+            lambda: list(engine.decrypt_vault(data_rows, headers, workers, mode='process')), 1, repeat),
+    }
+
+
+def allocated_bytes(load: Callable[[], object]) -> int:
+    """Bytes still allocated by load() while its result is alive"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = load()
+        allocated = tracemalloc.get_traced_memory()[0] - before
+        del result
+        return allocated
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory(rows: int, workdir: str) -> Dict[str, float]:
+    """Bytes per entry of a vault generated by bench_vault, held as lists and as a Vault"""
+    csv_file = vault_path(workdir, rows)
+    name = f"vault.{rows}"
+    return {
+        f"{name}.list_rows_bytes_per_entry": allocated_bytes(lambda: read_csv_vault(csv_file)) / rows,
+        f"{name}.vault_bytes_per_entry": allocated_bytes(lambda: Vault.from_csv(csv_file)) / rows,
+    }
+
+
+def run_benchmarks(sizes: Iterable[int] = DEFAULT_SIZES, repeat: int = 3, workers: Optional[int] = None,
+                   workdir: Optional[str] = None, log: Callable[[str], None] = lambda msg: None) -> dict:
+    """
+    Runs every benchmark and returns {"meta": {...}, "results": {name: seconds},
+    "memory": {name: bytes per entry}}
+    - Vaults are generated in workdir (a temporary directory by default)
+    """
+    sizes = list(sizes)
+    results: Dict[str, float] = {}
+    memory: Dict[str, float] = {}
+    log("🔤 Codec...")
+    results.update(bench_codec(repeat))
+    log("🔑 KDF and AES-GCM...")
+    results.update(bench_crypto(repeat))
+    with tempfile.TemporaryDirectory(dir=workdir) as tmpdir:
+        for rows in sizes:
+            log(f"📁 Vault with {rows} rows...")
+            results.update(bench_vault(rows, tmpdir, repeat, workers))
+            memory.update(bench_memory(rows, tmpdir))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "repeat": repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+        "memory": memory,
+    }
+
+
+def compare_to_baseline(results: Dict[str, float], baseline: Dict[str, float],
+                        threshold: float = DEFAULT_THRESHOLD,
+                        overrides: Optional[Dict[str, float]] = None) -> List[str]:
+    """
+    Returns a message for every benchmark slower than baseline * (1 + threshold)
+    - overrides maps a benchmark name to its own threshold
+    - Benchmarks missing from either side are skipped
+    """
+    overrides = overrides or {}
+    regressions = []
+    for name, seconds in sorted(results.items()):
+        base = baseline.get(name)
+        if not base:
+            continue
+        allowed = overrides.get(name, threshold)
+        ratio = seconds / base
+        if ratio > 1 + allowed:
+            regressions.append(f"{name}: {seconds:.6g}s vs baseline {base:.6g}s "
+                               f"({(ratio - 1) * 100:+.0f}%, allowed +{allowed * 100:.0f}%)")
+    return regressions
+
+
+def _parse_overrides(values: List[str]) -> Dict[str, float]:
+    overrides = {}
+    for value in values:
+        name, sep, fraction = value.partition("=")
+        if not sep:
+            raise ValueError(f"Expected NAME=FRACTION, got {value!r}")
+        overrides[name] = float(fraction)
+    return overrides
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the Python Password Manager Engine")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated vault sizes in rows (default: 1000,10000,100000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the best is kept")
+    parser.add_argument("--workers", type=int, default=None, help="Threads (or processes) for decrypt_vault")
+    parser.add_argument("--output", "-o", help="Write JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--save-baseline", help="Also write the results here, for later --baseline runs")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown as a fraction of the baseline (default: 0.25)")
+    parser.add_argument("--max-slowdown", action="append", default=[], metavar="NAME=FRACTION",
+                        help="Per-benchmark threshold, e.g. kdf.derive=0.5 (repeatable)")
+    args = parser.parse_args(argv)
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+        overrides = _parse_overrides(args.max_slowdown)
+    except ValueError as e:
+        print(f"❌ Error: {e}", file=sys.stderr)
+        return 2
+
+    report = run_benchmarks(sizes, args.repeat, args.workers, log=lambda msg: print(msg, file=sys.stderr))
+    for name, seconds in report["results"].items():
+        print(f"  {name:<40} {seconds * 1e6:12.1f} µs", file=sys.stderr)
+    for name, size in report["memory"].items():
+        print(f"  {name:<40} {size:12.1f} B", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as file:
+            file.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)["results"]
+        regressions = compare_to_baseline(report["results"], baseline, args.threshold, overrides)
+        if regressions:
+            print(f"❌ {len(regressions)} benchmark(s) regressed:", file=sys.stderr)
+            for message in regressions:
+                print(f"  {message}", file=sys.stderr)
+            return 1
+        print("✅ No regressions against the baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
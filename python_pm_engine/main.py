@@ -1,16 +1,52 @@
 """
 Python Password Manager Engine CLI
 Main entry point using Typer for command-line interface
+
+Only typer is imported at module load. The engine, cryptography and csv are
+imported inside the commands that use them, so --help, shell completion and
+commands that never touch crypto start fast.
 """
 
 import typer
-from typing import Optional
-import csv
+from typing import TYPE_CHECKING, List, Optional
 import os
-from pm_engine import PasswordManagerEngine
+
+if TYPE_CHECKING:
+    from pm_engine import PasswordManagerEngine
 
 app = typer.Typer(help="Python Password Manager Engine CLI")
 
+# Encrypted fields read-csv-passwords --hide still shows as soon as an entry is opened
+DEFAULT_REVEALED_COLUMNS = ('password',)
+
+
+def unlock_engine(engine: "PasswordManagerEngine", encrypted_master_key: str,
+                  passphrase: Optional[str] = None, hide_input: bool = False, err: bool = False):
+    """
+    Unlock engine for the given encrypted master key.
+    
+    If an unlock agent holding this master key is running, it is attached and
+    no passphrase is needed. Otherwise the passphrase is prompted for (unless
+    given) and the master key is decrypted locally. err sends messages to stderr.
+    """
+    from pm_agent import AgentClient, agent_key_id
+    
+    agent = AgentClient.connect(agent_key_id(encrypted_master_key))
+    if agent is not None:
+        engine.attach_agent(agent)
+        typer.echo("🔐 Using master key from the unlock agent", err=err)
+        return
+    
+    # Prompt for master key passphrase
+    if passphrase is None:
+        passphrase = typer.prompt("Enter master key passphrase", hide_input=hide_input, err=err)
+    
+    # Decrypt the master key
+    typer.echo("🔑 Decrypting master key...", err=err)
+    from pm_crypto import ez_subtle_decrypt, import_raw_key
+    engine.master_key = import_raw_key(ez_subtle_decrypt(encrypted_master_key, passphrase))
+    typer.echo("✅ Master key decrypted successfully!", err=err)
+
 
 @app.command()
 def decrypt_master_key(
@@ -64,6 +100,8 @@ def encrypt_master_key(
     This mirrors the freshStart functionality from the JavaScript code.
     """
     try:
+        from pm_engine import PasswordManagerEngine
+        
         # Create engine instance
         engine = PasswordManagerEngine()
         
@@ -115,6 +153,8 @@ def test_decrypt(
     This uses the same encrypted key and passphrase from the fakeVals() function.
     """
     try:
+        from pm_engine import PasswordManagerEngine
+        
         # Create engine instance
         engine = PasswordManagerEngine()
         
@@ -184,21 +224,19 @@ def decrypt_secret_with_master_key(
     Decrypt a secret using a master key.
     
     This first decrypts the master key using a passphrase, then uses the decrypted
-    master key to decrypt the secret.
+    master key to decrypt the secret. If an unlock agent holding this master key
+    is running, it is used instead and no passphrase is asked for.
     """
     try:
-        from pm_crypto import ez_subtle_decrypt
+        from pm_engine import PasswordManagerEngine
         
-        # Step 1: Prompt for master key passphrase and decrypt the master key
-        master_passphrase = typer.prompt("Enter master key passphrase", hide_input=False)
-        
-        typer.echo("🔑 Decrypting master key...")
-        master_key = ez_subtle_decrypt(master_key_encrypted, master_passphrase)
-        typer.echo("✅ Master key decrypted successfully!")
+        # Step 1: Unlock the master key (agent or passphrase)
+        engine = PasswordManagerEngine()
+        unlock_engine(engine, master_key_encrypted)
         
         # Step 2: Use the decrypted master key to decrypt the secret
         typer.echo("🔓 Decrypting secret...")
-        decrypted_secret = ez_subtle_decrypt(secret_encrypted, master_key)
+        decrypted_secret = engine._decrypt_secret_bytes(secret_encrypted)
         
         # Try to decode as UTF-8, fall back to hex if it's not readable text
         try:
@@ -241,7 +279,9 @@ def decrypt_secret(
 
 @app.command()
 def read_csv_passwords(
-    csv_file: str = typer.Argument(..., help="The CSV file containing encrypted password data")
+    csv_file: str = typer.Argument(..., help="The CSV file containing encrypted password data"),
+    use_mmap: bool = typer.Option(False, "--mmap", help="Memory-map the CSV file instead of using buffered reads"),
+    hide: bool = typer.Option(False, "--hide", help="Show only the Password of an entry until other fields are asked for")
 ):
     """
     Read and interact with a CSV file containing encrypted password data.
@@ -253,6 +293,11 @@ def read_csv_passwords(
     
     This function will decrypt the master key, show available entries,
     and allow you to select and decrypt specific entries.
+    
+    Only the site names are kept in memory; a selected entry is re-read
+    from the file by its offset, and its fields are decrypted when shown.
+    With --hide, encrypted fields other than Password stay hidden (and
+    encrypted) until they are asked for by name.
     """
     try:
         # Check if CSV file exists
@@ -260,70 +305,78 @@ def read_csv_passwords(
             typer.echo(f"❌ CSV file not found: {csv_file}", err=True)
             return 1
         
-        # Read the CSV file
-        with open(csv_file, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            rows = list(reader)
+        from pm_engine import PasswordManagerEngine
+        from pm_search import FUZZY
+        from pm_vault import CsvVaultReader, column_positions, is_encrypted_column
         
-        if len(rows) < 3:
+        # Open the CSV file; rows are streamed and indexed by offset
+        reader = CsvVaultReader(csv_file, use_mmap=use_mmap)
+    except Exception as e:
+        typer.echo(f"❌ Error: {e}", err=True)
+        return 1
+    
+    try:
+        encrypted_master_key = reader.encrypted_master_key
+        headers = reader.headers
+        
+        # Keep only the "site" field (plain text) of each row for display
+        positions = column_positions(headers)
+        site_index = positions.get('site')
+        sites = []
+        for row in reader:
+            if site_index is not None and site_index < len(row):
+                sites.append(row[site_index].strip())
+            else:
+                sites.append("")
+        
+        if not sites:
             typer.echo("❌ CSV file must have at least 3 rows: master key, headers, and at least one data row", err=True)
             return 1
         
-        # Extract the components
-        encrypted_master_key = rows[0][1]  # First row, second column (ignore first column)
-        headers = rows[1]  # Second row
-        data_rows = rows[2:]  # Remaining rows
+        # Build the search index once, up front
+        engine = PasswordManagerEngine()
+        engine.build_site_index(sites)
         
         typer.echo(f"📁 CSV file loaded: {csv_file}")
-        typer.echo(f"📊 Found {len(data_rows)} entries with {len(headers)} columns")
+        typer.echo(f"📊 Found {len(sites)} entries with {len(headers)} columns")
         typer.echo(f"🔑 Headers: {', '.join(headers)}")
         typer.echo()
         
-        # Prompt for master key passphrase
-        master_passphrase = typer.prompt("Enter master key passphrase", hide_input=False)
-        
-        # Decrypt the master key
-        typer.echo("🔑 Decrypting master key...")
-        from pm_crypto import ez_subtle_decrypt
-        master_key = ez_subtle_decrypt(encrypted_master_key, master_passphrase)
-        typer.echo("✅ Master key decrypted successfully!")
+        # Unlock the master key (agent or passphrase)
+        unlock_engine(engine, encrypted_master_key)
+        from pm_crypto import PlaintextCache
+        engine.plaintext_cache = PlaintextCache(maxsize=64, ttl=120)
         typer.echo()
         
         # Main interaction loop
-        current_display_rows = data_rows  # Track which rows to display
-        current_display_indices = list(range(1, len(data_rows) + 1))  # Track original indices
+        all_indices = list(range(1, len(sites) + 1))
+        current_display_indices = all_indices  # Track original indices of displayed rows
+        fuzzy_indices = set()  # Displayed rows that only matched as near-misses
         
         while True:
+            showing_all = current_display_indices is all_indices
+            
             # Show available entries
-            if current_display_rows == data_rows:
+            if showing_all:
                 typer.echo("📋 Available entries:")
             else:
-                typer.echo(f"🔍 Search results ({len(current_display_rows)} entries):")
+                typer.echo(f"🔍 Search results ({len(current_display_indices)} entries):")
             
-            for i, (display_index, row) in enumerate(zip(current_display_indices, current_display_rows), 1):
-                # Use the "site" field (plain text) for display
-                site_index = None
-                for j, header in enumerate(headers):
-                    if header.lower() == 'site':
-                        site_index = j
-                        break
-                
-                if site_index is not None and site_index < len(row) and row[site_index].strip():
-                    site_display = row[site_index].strip()
-                else:
-                    site_display = "[No site]"
-                
+            for i, display_index in enumerate(current_display_indices, 1):
+                site_display = sites[display_index - 1] or "[No site]"
+                if not showing_all and display_index in fuzzy_indices:
+                    site_display += " (fuzzy)"
                 typer.echo(f"  {i:2d}. {site_display}")
             
             typer.echo()
-            if current_display_rows == data_rows:
+            if showing_all:
                 typer.echo("Options:")
-                typer.echo("  - Enter a number (1-{}) to view entry details".format(len(current_display_rows)))
-                typer.echo("  - Enter 'search <term>' to filter entries by site name")
+                typer.echo("  - Enter a number (1-{}) to view entry details".format(len(current_display_indices)))
+                typer.echo("  - Enter 'search <term>' to find entries by site name (prefix and fuzzy matches)")
                 typer.echo("  - Enter 'quit' or 'exit' to exit")
             else:
                 typer.echo("Options:")
-                typer.echo("  - Enter a number (1-{}) to view entry details".format(len(current_display_rows)))
+                typer.echo("  - Enter a number (1-{}) to view entry details".format(len(current_display_indices)))
                 typer.echo("  - Enter 'search <term>' to search again")
                 typer.echo("  - Press Enter to show all entries again")
                 typer.echo("  - Enter 'quit' or 'exit' to exit")
@@ -343,31 +396,21 @@ def read_csv_passwords(
                     typer.echo("❌ Please provide a search term")
                     continue
                 
-                typer.echo(f"🔍 Searching for entries containing: '{search_term}'")
+                typer.echo(f"🔍 Searching for entries matching: '{search_term}'")
                 typer.echo()
                 
-                # Filter and show matching entries
-                matching_rows = []
-                matching_indices = []
-                for i, row in enumerate(data_rows, 1):
-                    # Find the site field index
-                    site_index = None
-                    for j, header in enumerate(headers):
-                        if header.lower() == 'site':
-                            site_index = j
-                            break
-                    
-                    if site_index is not None and site_index < len(row) and row[site_index].strip():
-                        site_display = row[site_index].strip()
-                        if search_term.lower() in site_display.lower():
-                            matching_rows.append(row)
-                            matching_indices.append(i)
+                # Ranked lookup in the prebuilt site index; near-misses only when nothing else matches
+                matches = engine.search_sites(search_term, fuzzy=False) or engine.search_sites(search_term)
+                matching_indices = [match.position + 1 for match in matches]
+                fuzzy_indices = {match.position + 1 for match in matches if match.kind == FUZZY}
                 
-                if matching_rows:
+                if matching_indices:
                     # Update display to show only matching entries
-                    current_display_rows = matching_rows
                     current_display_indices = matching_indices
-                    typer.echo(f"✅ Found {len(matching_rows)} matching entries")
+                    if fuzzy_indices:
+                        typer.echo(f"✅ No exact matches; found {len(matching_indices)} similar entries")
+                    else:
+                        typer.echo(f"✅ Found {len(matching_indices)} matching entries")
                 else:
                     typer.echo("❌ No entries found matching your search term")
                     typer.echo("Enter a new search term or press Enter to show all entries again")
@@ -376,60 +419,65 @@ def read_csv_passwords(
                         typer.echo("👋 Goodbye!")
                         break
                     # Reset to show all entries
-                    current_display_rows = data_rows
-                    current_display_indices = list(range(1, len(data_rows) + 1))
+                    current_display_indices = all_indices
                 typer.echo()
                 
             elif user_input == '':
                 # Handle Enter key - show all entries again
-                current_display_rows = data_rows
-                current_display_indices = list(range(1, len(data_rows) + 1))
+                current_display_indices = all_indices
                 typer.echo("📋 Showing all entries again")
                 typer.echo()
                 
             elif user_input.isdigit():
                 # Handle entry selection
                 entry_num = int(user_input)
-                if 1 <= entry_num <= len(current_display_rows):
-                    selected_row = current_display_rows[entry_num - 1]
+                if 1 <= entry_num <= len(current_display_indices):
                     original_index = current_display_indices[entry_num - 1]
-                    typer.echo(f"📖 Entry {entry_num} details:")
-                    typer.echo("=" * 50)
+                    entry = engine.lazy_row(reader.read_row(original_index - 1), headers, positions)
+                    revealed = set(DEFAULT_REVEALED_COLUMNS) & set(positions) if hide else set()
+                    if not revealed:
+                        revealed = set(positions)
                     
-                    # Decrypt and display only the encrypted fields (Username, Password, Additional Info)
-                    # Skip Index and Site fields as they are plain text
-                    for i, (header, encrypted_value) in enumerate(zip(headers, selected_row)):
-                        # Skip Index and Site fields (plain text)
-                        if header.lower() in ['index', 'site']:
-                            # Show plain text value
-                            value_display = encrypted_value.strip() if encrypted_value.strip() else "[Empty]"
-                            typer.echo(f"{header}: {value_display}")
-                        else:
-                            # Decrypt encrypted fields (Username, Password, Additional Info)
-                            if encrypted_value.strip():
-                                try:
-                                    decrypted_value = ez_subtle_decrypt(encrypted_value, master_key)
-                                    try:
-                                        value_display = decrypted_value.decode('utf-8')
-                                    except UnicodeDecodeError:
-                                        value_display = f"[Binary data - {len(decrypted_value)} bytes]"
-                                except Exception as e:
-                                    value_display = f"[Decryption failed: {e}]"
+                    quit_requested = False
+                    while True:
+                        typer.echo(f"📖 Entry {entry_num} details:")
+                        typer.echo("=" * 50)
+                        
+                        # Index and Site are plain text; other fields are decrypted only when revealed
+                        for header in headers:
+                            if is_encrypted_column(header) and header.strip().lower() not in revealed:
+                                value_display = "[Hidden]" if entry.raw(header).strip() else "[Empty]"
+                            elif entry.raw(header).strip():
+                                value_display = entry[header].strip() if not is_encrypted_column(header) else entry[header]
                             else:
                                 value_display = "[Empty]"
-                            
                             typer.echo(f"{header}: {value_display}")
+                        
+                        typer.echo("=" * 50)
+                        typer.echo()
+                        
+                        # Ask if user wants to reveal more or continue
+                        if revealed == set(positions):
+                            question = "Press Enter to continue or 'q' to quit"
+                        else:
+                            question = ("Enter a field name to reveal it, 'all' to reveal everything, "
+                                        "Enter to continue or 'q' to quit")
+                        continue_input = typer.prompt(question, default="", show_default=False).strip().lower()
+                        if continue_input in ['quit', 'exit', 'q']:
+                            quit_requested = True
+                            break
+                        elif continue_input == 'all' and revealed != set(positions):
+                            revealed = set(positions)
+                        elif continue_input in positions and continue_input not in revealed:
+                            revealed.add(continue_input)
+                        else:
+                            break
                     
-                    typer.echo("=" * 50)
-                    typer.echo()
-                    
-                    # Ask if user wants to continue
-                    continue_input = typer.prompt("Press Enter to continue or 'q' to quit").strip().lower()
-                    if continue_input in ['quit', 'exit', 'q']:
+                    if quit_requested:
                         typer.echo("👋 Goodbye!")
                         break
                 else:
-                    typer.echo(f"❌ Invalid entry number. Please enter 1-{len(current_display_rows)}")
+                    typer.echo(f"❌ Invalid entry number. Please enter 1-{len(current_display_indices)}")
             else:
                 typer.echo("❌ Invalid input. Please enter a number, 'search <term>', or 'quit'")
                 typer.echo()
@@ -437,6 +485,711 @@ def read_csv_passwords(
     except Exception as e:
         typer.echo(f"❌ Error: {e}", err=True)
         return 1
+    
+    finally:
+        reader.close()
+
+
+@app.command()
+def export_decrypted(
+    csv_file: str = typer.Argument(..., help="The CSV file containing encrypted password data"),
+    output: str = typer.Option(..., "--output", "-o", help="Where to write the decrypted CSV"),
+    workers: Optional[int] = typer.Option(None, "--workers", "-w", help="Number of decryption threads or processes (default: based on CPU count)"),
+    mode: str = typer.Option("auto", "--mode", help="'thread', 'process' or 'auto' (processes for large vaults on multi-core hosts)")
+):
+    """
+    Decrypt a whole CSV export and write it out as plain text.
+    
+    The master key is decrypted once, then every encrypted column of every row
+    is decrypted on a thread or process pool. The output keeps the header row and the
+    original row order; the master key row is dropped.
+    
+    WARNING: the output file contains all of your secrets in plain text.
+    """
+    try:
+        if not os.path.exists(csv_file):
+            typer.echo(f"❌ CSV file not found: {csv_file}", err=True)
+            return 1
+        
+        import csv
+        from pm_engine import PasswordManagerEngine
+        from pm_vault import Vault
+        
+        # Held by column, not as a list per row
+        vault = Vault.from_csv(csv_file)
+        typer.echo(f"📁 CSV file loaded: {csv_file}")
+        typer.echo(f"📊 Found {len(vault)} entries with {len(vault.headers)} columns")
+        
+        engine = PasswordManagerEngine()
+        unlock_engine(engine, vault.encrypted_master_key)
+        
+        typer.echo("🔓 Decrypting vault...")
+        with open(output, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(vault.headers)
+            count = 0
+            for row in engine.decrypt_vault(vault, vault.headers, workers=workers, mode=mode):
+                writer.writerow(row)
+                count += 1
+        
+        typer.echo(f"✅ Decrypted {count} entries to {output}")
+        
+    except Exception as e:
+        typer.echo(f"❌ Error: {e}", err=True)
+        return 1
+
+
+@app.command()
+def rotate_master_key(
+    csv_file: str = typer.Argument(..., help="The CSV file containing encrypted password data"),
+    output: str = typer.Option(..., "--output", "-o", help="Where to write the re-encrypted CSV"),
+    workers: Optional[int] = typer.Option(None, "--workers", "-w", help="Number of worker threads or processes (default: based on CPU count)"),
+    checkpoint: Optional[str] = typer.Option(None, "--checkpoint", help="Checkpoint file (default: OUTPUT.checkpoint)"),
+    chunk_size: int = typer.Option(1000, "--chunk-size", help="Rows written between checkpoints"),
+    mode: str = typer.Option("auto", "--mode", help="'thread', 'process' or 'auto' (processes for large vaults on multi-core hosts)")
+):
+    """
+    Replace the master key and re-encrypt the whole vault with it.
+    
+    A new master key is generated and every encrypted cell is decrypted with
+    the old key and encrypted with the new one. The new key is stored in the
+    output, encrypted with the new passphrase. Progress is checkpointed, so if
+    the run is interrupted, running the same command again resumes it.
+    """
+    try:
+        if not os.path.exists(csv_file):
+            typer.echo(f"❌ CSV file not found: {csv_file}", err=True)
+            return 1
+        
+        import time
+        from pm_engine import PasswordManagerEngine
+        from pm_rotate import rotate_csv_vault, default_checkpoint_path
+        from pm_vault import CsvVaultReader
+        
+        with CsvVaultReader(csv_file) as reader:
+            encrypted_master_key = reader.encrypted_master_key
+        typer.echo(f"📁 CSV file loaded: {csv_file}")
+        
+        engine = PasswordManagerEngine()
+        unlock_engine(engine, encrypted_master_key)
+        
+        checkpoint = checkpoint or default_checkpoint_path(output)
+        if os.path.exists(checkpoint):
+            typer.echo(f"⏯️  Resuming interrupted rotation from {checkpoint}")
+            new_passphrase = typer.prompt("Enter the new passphrase used for this rotation", hide_input=True)
+        else:
+            new_passphrase = typer.prompt("Enter new master key passphrase", hide_input=True,
+                                          confirmation_prompt=True)
+        
+        start = time.perf_counter()
+        
+        def progress(rows_done: int):
+            elapsed = time.perf_counter() - start
+            typer.echo(f"🔄 {rows_done} rows re-encrypted ({elapsed:.1f}s)")
+        
+        count = rotate_csv_vault(engine, csv_file, output, new_passphrase, checkpoint_file=checkpoint,
+                                 workers=workers, chunk_size=chunk_size, progress=progress,
+                                 mode=mode)
+        typer.echo(f"✅ Rotated the master key for {count} entries; wrote {output}")
+        typer.echo("⚠️  Keep the old file until you have checked the new one opens with the new passphrase")
+        
+    except KeyboardInterrupt:
+        typer.echo("\n⏸️  Interrupted; run the same command again to resume", err=True)
+        return 1
+    except Exception as e:
+        typer.echo(f"❌ Error: {e}", err=True)
+        return 1
+
+
+@app.command()
+def get(
+    keys: Optional[List[str]] = typer.Argument(None, help="Site names or Index values to look up"),
+    csv_file: str = typer.Option(..., "--csv", "-c", help="The CSV file (or sharded vault directory) containing encrypted password data"),
+    from_stdin: bool = typer.Option(False, "--stdin", help="Also read keys from stdin, one per line"),
+    by: str = typer.Option("auto", "--by", help="Match keys against 'site', 'index' or 'auto' (either)"),
+    fields: Optional[List[str]] = typer.Option(None, "--field", "-f", help="Only output these columns (repeatable)"),
+    output_format: str = typer.Option("json", "--format", help="'json' (one array) or 'jsonl' (one object per line)"),
+    passphrase: Optional[str] = typer.Option(None, "--passphrase", "-p", envvar="PM_PASSPHRASE", help="Master key passphrase (prompted for if not given)"),
+    workers: Optional[int] = typer.Option(None, "--workers", "-w", help="Number of decryption threads")
+):
+    """
+    Look up many entries at once and print them as JSON.
+    
+    The master key is unlocked once (or taken from a running unlock agent) and
+    only the matching rows are decrypted.
+    Site matches are case-insensitive. Each result carries the key it matched
+    as "query". A field that fails to decrypt is null, and its cause and message
+    are in the result's "errors" object. Status messages go to stderr so stdout
+    stays machine-readable; the exit code is 1 if any key had no match or any
+    field failed to decrypt.
+    """
+    import json
+    
+    if by not in ('auto', 'site', 'index') or output_format not in ('json', 'jsonl'):
+        typer.echo("❌ --by must be auto/site/index and --format must be json/jsonl", err=True)
+        raise typer.Exit(code=2)
+    
+    queries = list(keys or [])
+    if from_stdin:
+        import sys
+        queries.extend(line.strip() for line in sys.stdin if line.strip())
+    if not queries:
+        typer.echo("❌ No keys given", err=True)
+        raise typer.Exit(code=2)
+    
+    try:
+        from pm_engine import PasswordManagerEngine
+        from pm_vault import CsvVaultReader, column_positions, is_encrypted_column, normalize_site
+        
+        if os.path.isdir(csv_file):
+            # Sharded vault: each lookup only loads the shard it needs
+            from pm_sharded_vault import ShardedVault
+            with ShardedVault(csv_file) as vault:
+                headers = vault.headers
+                positions = column_positions(headers)
+                matches = []
+                for query in dict.fromkeys(queries):
+                    found = []
+                    if by in ('auto', 'index'):
+                        row = vault.get_by_index(query)
+                        found = [row] if row is not None else []
+                    if not found and by in ('auto', 'site'):
+                        found = vault.find_by_site(query)
+                    matches.extend((query, row) for row in found)
+                encrypted_master_key = vault.encrypted_master_key
+        else:
+            with CsvVaultReader(csv_file) as reader:
+                headers = reader.headers
+                positions = column_positions(headers)
+                
+                # Several spellings of a key (e.g. "GitHub" and "github") each get the row
+                wanted_sites = {}
+                wanted_indices = {}
+                for q in dict.fromkeys(queries):
+                    if by in ('auto', 'site'):
+                        wanted_sites.setdefault(normalize_site(q), []).append(q)
+                    if by in ('auto', 'index'):
+                        wanted_indices.setdefault(q.strip(), []).append(q)
+                index_col = positions.get('index')
+                site_col = positions.get('site')
+                
+                # One streaming pass; only matching rows are kept
+                matches = []
+                for row in reader:
+                    found = []
+                    if index_col is not None and index_col < len(row):
+                        found += wanted_indices.get(row[index_col].strip(), [])
+                    if site_col is not None and site_col < len(row):
+                        found += wanted_sites.get(normalize_site(row[site_col]), [])
+                    matches.extend((query, row) for query in dict.fromkeys(found))
+                
+                encrypted_master_key = reader.encrypted_master_key
+        
+        if fields:
+            wanted = [f.strip().lower() for f in fields]
+            missing = [f for f, key in zip(fields, wanted) if key not in positions]
+            if missing:
+                typer.echo(f"❌ Unknown field(s): {', '.join(missing)}", err=True)
+                raise typer.Exit(code=2)
+            columns = [positions[key] for key in wanted]
+        else:
+            columns = list(range(len(headers)))
+        out_headers = [headers[i] for i in columns]
+        rows = [[row[i] if i < len(row) else "" for i in columns] for _, row in matches]
+        
+        engine = PasswordManagerEngine()
+        unlock_engine(engine, encrypted_master_key, passphrase, hide_input=True, err=True)
+        
+        results = [{"query": query, **dict(zip(out_headers, row))} for (query, _), row in zip(matches, rows)]
+        
+        # Failures are reported per field, never passed off as values
+        cells = []
+        for result, row in zip(results, rows):
+            for header, value in zip(out_headers, row):
+                if is_encrypted_column(header):
+                    if value.strip():
+                        cells.append((result, header, value))
+                    else:
+                        result[header] = ""
+        failed = 0
+        texts = engine.decrypt_cells([value for _, _, value in cells], workers=workers)
+        for (result, header, _), text in zip(cells, texts):
+            if isinstance(text, Exception):
+                result[header] = None
+                cause = getattr(text, "cause", type(text).__name__)
+                result.setdefault("errors", {})[header] = {"cause": cause, "message": str(text)}
+                failed += 1
+            else:
+                result[header] = text
+    except typer.Exit:
+        raise
+    except Exception as e:
+        typer.echo(f"❌ Error: {e}", err=True)
+        raise typer.Exit(code=1)
+    
+    if output_format == 'jsonl':
+        for result in results:
+            typer.echo(json.dumps(result))
+    else:
+        typer.echo(json.dumps(results, indent=2))
+    
+    found = {result["query"] for result in results}
+    not_found = [q for q in dict.fromkeys(queries) if q not in found]
+    if not_found:
+        typer.echo(f"⚠️  No match for: {', '.join(not_found)}", err=True)
+    if failed:
+        typer.echo(f"❌ {failed} field(s) failed to decrypt; see \"errors\" in the output", err=True)
+    if not_found or failed:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def reencode_csv(
+    csv_file: str = typer.Argument(..., help="The CSV file containing encrypted password data"),
+    output: str = typer.Option(..., "--output", "-o", help="Where to write the re-encoded CSV"),
+    to_format: str = typer.Option("v2", "--to", help="Target envelope: 'v2' (compact) or 'legacy' (iv_base64&ciphertext_base64)")
+):
+    """
+    Re-encode every ciphertext in a CSV export into another envelope format.
+    
+    No passphrase is needed: the iv, ciphertext and tag are only repacked,
+    never decrypted. Rows are streamed, so the file is never held in memory.
+    
+    Note: the Google Sheets UI only understands the legacy format.
+    """
+    try:
+        if to_format not in ('v2', 'legacy'):
+            typer.echo("❌ --to must be 'v2' or 'legacy'", err=True)
+            return 1
+        
+        if not os.path.exists(csv_file):
+            typer.echo(f"❌ CSV file not found: {csv_file}", err=True)
+            return 1
+        
+        import csv
+        from pm_crypto import reencode_ciphertext
+        from pm_vault import is_encrypted_column
+        compact = to_format == 'v2'
+        
+        converted = 0
+        failed = 0
+        
+        def convert(value: str, location: str) -> str:
+            nonlocal converted, failed
+            if not value.strip():
+                return value
+            try:
+                new_value = reencode_ciphertext(value, compact=compact)
+            except ValueError as e:
+                failed += 1
+                typer.echo(f"⚠️  Left {location} unchanged: {e}", err=True)
+                return value
+            converted += 1
+            return new_value
+        
+        with open(csv_file, 'r', newline='', encoding='utf-8') as infile, \
+                open(output, 'w', newline='', encoding='utf-8') as outfile:
+            reader = csv.reader(infile)
+            writer = csv.writer(outfile)
+            
+            master_row = next(reader, None)
+            headers = next(reader, None)
+            if master_row is None or headers is None or len(master_row) < 2:
+                typer.echo("❌ CSV file must start with a master key row and a header row", err=True)
+                return 1
+            
+            master_row[1] = convert(master_row[1], "master key")
+            writer.writerow(master_row)
+            writer.writerow(headers)
+            
+            encrypted_columns = [is_encrypted_column(header) for header in headers]
+            for row_num, row in enumerate(reader, 3):
+                for i, value in enumerate(row):
+                    if i < len(encrypted_columns) and encrypted_columns[i]:
+                        row[i] = convert(value, f"row {row_num}, column {headers[i]}")
+                writer.writerow(row)
+        
+        typer.echo(f"✅ Re-encoded {converted} ciphertexts to {to_format} in {output}")
+        if failed:
+            typer.echo(f"⚠️  {failed} cells could not be parsed and were copied unchanged", err=True)
+        
+    except Exception as e:
+        typer.echo(f"❌ Error: {e}", err=True)
+        return 1
+
+
+@app.command()
+def import_sqlite(
+    csv_file: str = typer.Argument(..., help="The CSV file containing encrypted password data"),
+    db_file: str = typer.Argument(..., help="The SQLite vault to create or replace")
+):
+    """
+    Import a CSV export into an indexed SQLite vault.
+    
+    The ciphertexts are copied as-is, so no passphrase is needed. Lookups by
+    Index and Site in the resulting vault use indexes instead of a full scan.
+    """
+    try:
+        if not os.path.exists(csv_file):
+            typer.echo(f"❌ CSV file not found: {csv_file}", err=True)
+            return 1
+        
+        from pm_sqlite_vault import SqliteVault
+        
+        with SqliteVault(db_file) as vault:
+            count = vault.import_csv(csv_file)
+        
+        typer.echo(f"✅ Imported {count} entries into {db_file}")
+        
+    except Exception as e:
+        typer.echo(f"❌ Error: {e}", err=True)
+        return 1
+
+
+@app.command()
+def import_passwords(
+    source_csv: str = typer.Argument(..., help="CSV export from another password manager"),
+    output: str = typer.Option(..., "--output", "-o", help="Where to write the upload-ready encrypted CSV"),
+    vault: Optional[str] = typer.Option(None, "--vault", "-v", help="Existing CSV export to add the entries to (its master key is used)"),
+    layout: str = typer.Option("auto", "--layout", "-l", help="'auto', 'generic', 'bitwarden', 'lastpass', 'keepass' or 'chrome'"),
+    start_index: Optional[int] = typer.Option(None, "--start-index", help="Index of the first imported entry (default: after the vault's highest)"),
+    batch_size: int = typer.Option(1000, "--batch-size", help="Entries encrypted per work item"),
+    workers: Optional[int] = typer.Option(None, "--workers", "-w", help="Number of worker threads or processes (default: based on CPU count)"),
+    mode: str = typer.Option("auto", "--mode", help="'thread', 'process' or 'auto' (processes for large exports on multi-core hosts)"),
+    compress: bool = typer.Option(False, "--compress", help="Compress long values before encrypting them (the Sheets UI cannot read these)")
+):
+    """
+    Import entries exported from another password manager.
+    
+    Generic Site/Username/Password/Notes CSVs and Bitwarden, LastPass, KeePass
+    and Chrome exports are mapped onto Index, Site, Username, Password,
+    AdditionalInfo. Columns without a place of their own (URL, TOTP, folder)
+    are kept in AdditionalInfo. The source is streamed and encrypted in
+    parallel batches.
+    
+    With --vault, the existing entries are copied to the output and the new ones
+    are encrypted with the vault's master key. Without it, a new master key is
+    generated and protected with a new passphrase.
+    """
+    try:
+        for path in [source_csv] + ([vault] if vault else []):
+            if not os.path.exists(path):
+                typer.echo(f"❌ CSV file not found: {path}", err=True)
+                return 1
+        
+        import csv
+        import time
+        from pm_crypto import ez_subtle_encrypt, generate_and_export_key
+        from pm_engine import PasswordManagerEngine
+        from pm_import import import_passwords as run_import, detect_layout, LAYOUTS
+        from pm_vault import CsvVaultReader
+        
+        if layout != 'auto' and layout not in LAYOUTS:
+            typer.echo(f"❌ --layout must be auto or one of: {', '.join(LAYOUTS)}", err=True)
+            return 1
+        with open(source_csv, 'r', newline='', encoding='utf-8-sig') as file:
+            headers = next(csv.reader(file), [])
+        detected = detect_layout(headers).name if layout == 'auto' else layout
+        typer.echo(f"📁 Source loaded: {source_csv} ({detected} layout)")
+        
+        engine = PasswordManagerEngine()
+        engine.compress_secrets = compress
+        if vault:
+            with CsvVaultReader(vault) as reader:
+                encrypted_master_key = reader.encrypted_master_key
+            unlock_engine(engine, encrypted_master_key)
+        else:
+            typer.echo("🆕 No --vault given; creating a new master key")
+            passphrase = typer.prompt("Enter new master key passphrase", hide_input=True, confirmation_prompt=True)
+            engine.master_key = generate_and_export_key()
+            encrypted_master_key = ez_subtle_encrypt(engine.master_key, passphrase)
+        
+        start = time.perf_counter()
+        
+        def progress(count: int):
+            typer.echo(f"📥 {count} entries encrypted ({time.perf_counter() - start:.1f}s)")
+        
+        count = run_import(engine, source_csv, output, encrypted_master_key, layout=layout, existing_csv=vault,
+                           start_index=start_index, batch_size=batch_size, workers=workers, mode=mode,
+                           progress=progress)
+        typer.echo(f"✅ Imported {count} entries in {time.perf_counter() - start:.1f}s; wrote {output}")
+    
+    except Exception as e:
+        typer.echo(f"❌ Error: {e}", err=True)
+        return 1
+
+
+@app.command()
+def shard_vault(
+    csv_file: str = typer.Argument(..., help="The CSV file containing encrypted password data"),
+    vault_dir: str = typer.Argument(..., help="The sharded vault directory to create or replace"),
+    shards: int = typer.Option(16, "--shards", "-n", help="Number of shards"),
+    partition_by: str = typer.Option("index", "--by", help="Partition rows by 'index' or 'site'")
+):
+    """
+    Split a CSV export into a sharded vault directory.
+    
+    Rows are hash-partitioned by Index or Site into CSV shards next to a small
+    manifest. Lookups on the partition key then read a single shard. The
+    ciphertexts are copied as-is, so no passphrase is needed.
+    """
+    try:
+        if not os.path.exists(csv_file):
+            typer.echo(f"❌ CSV file not found: {csv_file}", err=True)
+            return 1
+        if os.path.exists(os.path.join(vault_dir, "manifest.json")):
+            typer.echo(f"❌ {vault_dir} already holds a sharded vault", err=True)
+            return 1
+        
+        from pm_sharded_vault import ShardedVault
+        
+        with ShardedVault(vault_dir, shard_count=shards, partition_by=partition_by) as vault:
+            count = vault.import_csv(csv_file)
+        
+        typer.echo(f"✅ Split {count} entries into {shards} shards (by {partition_by}) in {vault_dir}")
+        
+    except Exception as e:
+        typer.echo(f"❌ Error: {e}", err=True)
+        return 1
+
+
+@app.command()
+def diff_vaults(
+    old_csv: str = typer.Argument(..., help="The earlier CSV export"),
+    new_csv: str = typer.Argument(..., help="The later CSV export"),
+    decrypt: bool = typer.Option(False, "--decrypt", "-d", help="Decrypt the values that changed"),
+    output_format: str = typer.Option("text", "--format", help="'text' or 'json'"),
+    workers: Optional[int] = typer.Option(None, "--workers", "-w", help="Number of decryption threads")
+):
+    """
+    Show which entries were added, changed or deleted between two exports.
+    
+    Rows are matched by Index and compared by ciphertext, so unchanged rows are
+    never decrypted. Without --decrypt no passphrase is needed and only the
+    names of the changed columns are shown.
+    """
+    try:
+        for path in (old_csv, new_csv):
+            if not os.path.exists(path):
+                typer.echo(f"❌ CSV file not found: {path}", err=True)
+                return 1
+        if output_format not in ('text', 'json'):
+            typer.echo("❌ --format must be text or json", err=True)
+            return 1
+        
+        import json
+        from pm_diff import VaultDiff, ADDED, CHANGED
+        
+        diff = VaultDiff(old_csv, new_csv)
+        counts = diff.counts()
+        
+        if diff.master_key_changed:
+            typer.echo("⚠️  The master key row differs; if the key was rotated, every row shows as changed", err=True)
+        
+        new_engine = old_engine = None
+        if decrypt and diff.changes:
+            from pm_engine import PasswordManagerEngine
+            new_engine = PasswordManagerEngine()
+            typer.echo(f"🔑 Unlocking {new_csv}", err=True)
+            unlock_engine(new_engine, diff.new_master_key, err=True)
+            if diff.master_key_changed and counts['deleted'] + counts['changed']:
+                old_engine = PasswordManagerEngine()
+                typer.echo(f"🔑 Unlocking {old_csv}", err=True)
+                unlock_engine(old_engine, diff.old_master_key, err=True)
+        
+        records = diff.report(new_engine, old_engine, workers=workers)
+        
+        if output_format == 'json':
+            typer.echo(json.dumps({"counts": counts, "changes": records}, indent=2))
+            return
+        
+        symbols = {ADDED: "➕", CHANGED: "✏️ "}
+        for record in records:
+            symbol = symbols.get(record["change"], "➖")
+            typer.echo(f"{symbol} {record['index']}: {record['site']} ({', '.join(record['columns'])})")
+            if decrypt:
+                for column in record["columns"]:
+                    old_value = (record["old"] or {}).get(column)
+                    new_value = (record["new"] or {}).get(column)
+                    typer.echo(f"     {column}: {old_value!r} -> {new_value!r}")
+        typer.echo(f"📊 {counts['added']} added, {counts['changed']} changed, "
+                   f"{counts['deleted']} deleted, {counts['unchanged']} unchanged")
+        
+    except Exception as e:
+        typer.echo(f"❌ Error: {e}", err=True)
+        return 1
+
+
+@app.command()
+def audit(
+    csv_file: str = typer.Argument(..., help="The CSV file containing encrypted password data"),
+    workers: Optional[int] = typer.Option(None, "--workers", "-w", help="Number of worker threads or processes (default: based on CPU count)"),
+    chunk_size: int = typer.Option(2000, "--chunk-size", help="Cells verified per work item"),
+    mode: str = typer.Option("auto", "--mode", help="'thread', 'process' or 'auto' (processes for large vaults on multi-core hosts)"),
+    output_format: str = typer.Option("text", "--format", help="'text' or 'json'"),
+    quiet: bool = typer.Option(False, "--quiet", "-q", help="Do not print progress")
+):
+    """
+    Check that every encrypted cell of a vault still decrypts.
+    
+    The master key is unlocked once and each cell's envelope and GCM tag are
+    verified on a thread or process pool. Failures are listed by row, column
+    and cause (bad base64, bad envelope or bad tag). The exit code is 1 if any
+    cell fails, so it can gate a backup.
+    """
+    if output_format not in ('text', 'json') or mode not in ('thread', 'process', 'auto'):
+        typer.echo("❌ --format must be text or json and --mode must be thread/process/auto", err=True)
+        raise typer.Exit(code=2)
+    
+    try:
+        if not os.path.exists(csv_file):
+            typer.echo(f"❌ CSV file not found: {csv_file}", err=True)
+            raise typer.Exit(code=1)
+        
+        import json
+        from pm_audit import audit_csv_vault
+        from pm_engine import PasswordManagerEngine
+        from pm_vault import CsvVaultReader
+        
+        with CsvVaultReader(csv_file) as reader:
+            encrypted_master_key = reader.encrypted_master_key
+        typer.echo(f"📁 CSV file loaded: {csv_file}", err=True)
+        
+        engine = PasswordManagerEngine()
+        unlock_engine(engine, encrypted_master_key, hide_input=True, err=True)
+        
+        def progress(cells_done: int, elapsed: float):
+            rate = cells_done / elapsed if elapsed > 0 else 0.0
+            typer.echo(f"🔍 {cells_done} cells checked ({rate:,.0f} cells/s)", err=True)
+        
+        result = audit_csv_vault(engine, csv_file, workers=workers, chunk_size=chunk_size,
+                                 progress=None if quiet else progress, mode=mode)
+    except typer.Exit:
+        raise
+    except Exception as e:
+        typer.echo(f"❌ Error: {e}", err=True)
+        raise typer.Exit(code=1)
+    
+    if output_format == 'json':
+        typer.echo(json.dumps({
+            "rows": result.rows,
+            "cells": result.cells,
+            "seconds": round(result.seconds, 3),
+            "failures": [failure._asdict() for failure in result.failures],
+        }, indent=2))
+    else:
+        for failure in result.failures:
+            typer.echo(f"❌ Row {failure.row} (Index {failure.index}), {failure.column}: "
+                       f"{failure.cause} — {failure.message}")
+    
+    summary = (f"{result.rows} rows, {result.cells} cells in {result.seconds:.2f}s "
+               f"({result.cells_per_second:,.0f} cells/s)")
+    if not result.ok:
+        typer.echo(f"📊 {len(result.failures)} of {result.cells} cells failed; {summary}", err=True)
+        raise typer.Exit(code=1)
+    typer.echo(f"✅ All cells verified; {summary}", err=True)
+
+
+@app.command()
+def agent_start(
+    source: str = typer.Argument(..., help="A CSV export, or the encrypted master key itself"),
+    idle_timeout: float = typer.Option(15 * 60, "--idle-timeout", "-t", help="Seconds without requests before the agent exits"),
+    foreground: bool = typer.Option(False, "--foreground", help="Run in the foreground instead of as a daemon"),
+    socket_path: Optional[str] = typer.Option(None, "--socket", help="Socket path (default: $PM_AGENT_SOCK or a per-user path)")
+):
+    """
+    Start an unlock agent that keeps the master key in memory.
+    
+    While it runs, read-csv-passwords, export-decrypted, get and
+    decrypt-secret-with-master-key use it automatically for this master key
+    instead of asking for the passphrase. It exits after --idle-timeout seconds
+    without requests, or on agent-stop.
+    """
+    try:
+        from pm_agent import UnlockAgent, AgentClient, agent_key_id, default_socket_path
+        from pm_engine import PasswordManagerEngine
+        
+        if os.path.exists(source):
+            from pm_vault import CsvVaultReader
+            with CsvVaultReader(source) as reader:
+                encrypted_master_key = reader.encrypted_master_key
+        else:
+            encrypted_master_key = source
+        
+        socket_path = socket_path or default_socket_path()
+        key_id = agent_key_id(encrypted_master_key)
+        running = AgentClient.connect(socket_path=socket_path)
+        if running is not None:
+            running.close()
+            typer.echo(f"❌ An agent is already running on {socket_path}; stop it with agent-stop first", err=True)
+            raise typer.Exit(code=1)
+        
+        engine = PasswordManagerEngine()
+        unlock_engine(engine, encrypted_master_key)
+        if engine.master_key is None:
+            typer.echo("❌ An agent is already serving this master key", err=True)
+            return 1
+        
+        agent = UnlockAgent(engine, key_id, socket_path, idle_timeout)
+        
+        if foreground:
+            typer.echo(f"🔐 Agent listening on {socket_path} (Ctrl+C to stop)")
+            agent.serve_forever()
+            return
+        
+        pid = os.fork()
+        if pid == 0:
+            # Child: detach from the terminal and serve
+            os.setsid()
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(devnull, fd)
+            code = 1
+            try:
+                agent.serve_forever()
+                code = 0
+            finally:
+                os._exit(code)
+        
+        import time
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            # Only our agent counts: another one may have taken the socket meanwhile
+            client = AgentClient.connect(key_id, socket_path)
+            if client is not None:
+                client.close()
+                typer.echo(f"✅ Agent started (pid {pid}) on {socket_path}")
+                return
+            if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                typer.echo(f"❌ Agent exited during startup (is {socket_path} in use?)", err=True)
+                raise typer.Exit(code=1)
+            time.sleep(0.05)
+        typer.echo("❌ Agent did not start", err=True)
+        raise typer.Exit(code=1)
+        
+    except typer.Exit:
+        raise
+    except Exception as e:
+        typer.echo(f"❌ Error: {e}", err=True)
+        return 1
+
+
+@app.command()
+def agent_stop(
+    socket_path: Optional[str] = typer.Option(None, "--socket", help="Socket path (default: $PM_AGENT_SOCK or a per-user path)")
+):
+    """
+    Stop a running unlock agent (the master key is dropped from memory).
+    """
+    from pm_agent import AgentClient
+    
+    client = AgentClient.connect(socket_path=socket_path)
+    if client is None:
+        typer.echo("ℹ️  No agent is running")
+        return
+    with client:
+        client.stop()
+    typer.echo("✅ Agent stopped")
 
 
 if __name__ == "__main__":
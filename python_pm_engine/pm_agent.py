@@ -0,0 +1,315 @@
+"""
+Unlock agent for Python Password Manager Engine
+An ssh-agent style daemon that keeps the decrypted master key in memory and
+serves encrypt/decrypt requests over a local Unix socket
+
+Protocol: one JSON object per line in each direction. Responses come back in
+request order, so clients may pipeline several requests before reading.
+    {"op": "ping"}                                  -> {"ok": true, "key_id": ...}
+    {"op": "decrypt", "data": [ciphertext, ...]}    -> {"ok": true, "results": [{"value": b64} | {"error": msg, "cause": ...}, ...]}
+    {"op": "encrypt", "data": [b64, ...], "compact": false} -> {"ok": true, "results": [ciphertext, ...]}
+    {"op": "decrypt_rows", "headers": [...], "rows": [[...], ...]} -> {"ok": true, "rows": [[...], ...]}
+    {"op": "stop"}                                  -> {"ok": true}
+"""
+
+import base64
+import hashlib
+import itertools
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Union
+
+SOCKET_ENV_VAR = "PM_AGENT_SOCK"
+DEFAULT_IDLE_TIMEOUT = 15 * 60  # seconds
+
+
+def default_socket_path() -> str:
+    """$PM_AGENT_SOCK, else a per-user socket in $XDG_RUNTIME_DIR or the home directory"""
+    path = os.environ.get(SOCKET_ENV_VAR)
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "pm_engine_agent.sock")
+    return os.path.join(os.path.expanduser("~"), ".pm_engine_agent.sock")
+
+
+def agent_key_id(encrypted_master_key: str) -> str:
+    """
+    Identifies which master key an agent holds without revealing it
+    - Derived from the raw iv||ciphertext, so both envelope formats give the same id
+    """
+    from pm_crypto import unpack_ciphertext
+    iv, encrypted_data = unpack_ciphertext(encrypted_master_key)
+    return hashlib.sha256(iv + encrypted_data).hexdigest()
+
+
+class _AgentRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        agent = self.server.agent
+        for line in self.rfile:
+            agent.touch()
+            try:
+                request = json.loads(line)
+                response = agent.dispatch(request)
+            except Exception as e:
+                request = {}
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write(json.dumps(response).encode('utf-8') + b"\n")
+            self.wfile.flush()
+            if request.get("op") == "stop":
+                break
+
+
+class _AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class UnlockAgent:
+    """
+    Serves an unlocked PasswordManagerEngine over a Unix socket
+    - The socket file is only accessible to the current user (mode 0600)
+    - Shuts down (and drops the key) after idle_timeout seconds without requests
+    """
+
+    def __init__(self, engine, key_id: str, socket_path: Optional[str] = None,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.engine = engine
+        self.key_id = key_id
+        self.socket_path = socket_path or default_socket_path()
+        self.idle_timeout = idle_timeout
+        self._last_activity = time.monotonic()
+        self._server: Optional[_AgentServer] = None
+        self._ready = threading.Event()
+
+    def touch(self):
+        self._last_activity = time.monotonic()
+
+    def dispatch(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "ping":
+            return {"ok": True, "key_id": self.key_id}
+
+        if op == "decrypt":
+            from pm_crypto import ez_subtle_decrypt
+            results = []
+            for ciphertext in request["data"]:
+                try:
+                    plaintext = ez_subtle_decrypt(ciphertext, self.engine.master_key_handle)
+                    results.append({"value": base64.b64encode(plaintext).decode('ascii')})
+                except Exception as e:
+                    results.append({"error": str(e), "cause": getattr(e, "cause", None)})
+            return {"ok": True, "results": results}
+
+        if op == "encrypt":
+            from pm_crypto import encrypt_many
+            compact = bool(request.get("compact", False))
+            plaintexts = [base64.b64decode(data) for data in request["data"]]
+            return {"ok": True, "results": encrypt_many(plaintexts, self.engine.master_key_handle, compact)}
+
+        if op == "decrypt_rows":
+            rows = list(self.engine.decrypt_vault(request["rows"], request["headers"], workers=1))
+            return {"ok": True, "rows": rows}
+
+        if op == "stop":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True}
+
+        return {"ok": False, "error": f"Unknown op: {op}"}
+
+    def _remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        client = AgentClient.connect(socket_path=self.socket_path)
+        if client is not None:
+            client.close()
+            raise RuntimeError(f"An agent is already running on {self.socket_path}")
+        os.unlink(self.socket_path)
+
+    def _watch_idle(self):
+        while not self._stopped.wait(min(1.0, self.idle_timeout)):
+            if time.monotonic() - self._last_activity > self.idle_timeout:
+                self.shutdown()
+                return
+
+    def serve_forever(self):
+        """Binds the socket and serves until stopped or idle"""
+        self._remove_stale_socket()
+        old_umask = os.umask(0o177)
+        try:
+            self._server = _AgentServer(self.socket_path, _AgentRequestHandler)
+        finally:
+            os.umask(old_umask)
+        self._server.agent = self
+        self._stopped = threading.Event()
+        self.touch()
+        watcher = threading.Thread(target=self._watch_idle, daemon=True)
+        watcher.start()
+        self._ready.set()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stopped.set()
+            self._server.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+            self.engine.master_key = None
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class AgentClient:
+    """
+    Client for a running UnlockAgent
+    - connect() returns None when no agent is running or it holds another key,
+      so callers can fall back to the passphrase
+    """
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = 30.0):
+        self.socket_path = socket_path
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(socket_path)
+        except BaseException:
+            self._sock.close()
+            raise
+        self._file = self._sock.makefile('rwb')
+        self._lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, key_id: Optional[str] = None, socket_path: Optional[str] = None) -> Optional["AgentClient"]:
+        """Connects to the agent if one is running (and holds key_id, when given)"""
+        path = socket_path or default_socket_path()
+        if not os.path.exists(path):
+            return None
+        try:
+            client = cls(path)
+        except OSError:
+            return None
+        try:
+            response = client.request({"op": "ping"})
+        except (OSError, ValueError):
+            client.close()
+            return None
+        if not response.get("ok") or (key_id is not None and response.get("key_id") != key_id):
+            client.close()
+            return None
+        return client
+
+    def close(self):
+        try:
+            self._file.close()
+        finally:
+            self._sock.close()
+
+    def __enter__(self) -> "AgentClient":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _send(self, request: dict):
+        self._file.write(json.dumps(request).encode('utf-8') + b"\n")
+
+    def _receive(self) -> dict:
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Agent closed the connection")
+        return json.loads(line)
+
+    def request(self, request: dict) -> dict:
+        """Sends one request and waits for its response"""
+        with self._lock:
+            self._send(request)
+            self._file.flush()
+            return self._receive()
+
+    def pipeline(self, requests: Iterable[dict], window: int = 8) -> Iterator[dict]:
+        """
+        Sends requests without waiting for each response; yields responses in order
+        - At most `window` requests are outstanding, so neither side's socket buffer fills up
+        """
+        with self._lock:
+            outstanding = 0
+            for request in requests:
+                self._send(request)
+                outstanding += 1
+                if outstanding >= window:
+                    self._file.flush()
+                    yield self._receive()
+                    outstanding -= 1
+            self._file.flush()
+            while outstanding:
+                yield self._receive()
+                outstanding -= 1
+
+    @staticmethod
+    def _check(response: dict) -> dict:
+        if not response.get("ok"):
+            raise ValueError(f"Agent error: {response.get('error')}")
+        return response
+
+    @staticmethod
+    def _error(result: dict) -> ValueError:
+        """Rebuilds the agent's exception, keeping its pm_crypto error class"""
+        from pm_crypto import CiphertextError
+        for error_class in CiphertextError.__subclasses__():
+            if result.get("cause") == error_class.cause:
+                return error_class(result["error"])
+        return ValueError(result["error"])
+
+    def decrypt_many(self, ciphertexts: List[str]) -> List[Union[bytes, ValueError]]:
+        """Decrypts a batch in one round trip; failures come back as ValueError instances"""
+        response = self._check(self.request({"op": "decrypt", "data": list(ciphertexts)}))
+        return [
+            base64.b64decode(result["value"]) if "value" in result else self._error(result)
+            for result in response["results"]
+        ]
+
+    def decrypt(self, ciphertext: str) -> bytes:
+        result = self.decrypt_many([ciphertext])[0]
+        if isinstance(result, ValueError):
+            raise result
+        return result
+
+    def encrypt_many(self, plaintexts: Iterable[Union[str, bytes]], compact: bool = False) -> List[str]:
+        """Encrypts a batch in one round trip"""
+        data = [
+            base64.b64encode(p.encode('utf-8') if isinstance(p, str) else p).decode('ascii')
+            for p in plaintexts
+        ]
+        return self._check(self.request({"op": "encrypt", "data": data, "compact": compact}))["results"]
+
+    def encrypt(self, plaintext: Union[str, bytes], compact: bool = False) -> str:
+        return self.encrypt_many([plaintext], compact)[0]
+
+    def decrypt_rows(self, rows: Iterable[List[str]], headers: List[str],
+                     chunk_size: int = 256) -> Iterator[List[str]]:
+        """Decrypts vault rows in pipelined chunks; rows come back in order"""
+        rows = iter(rows)
+
+        def requests():
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    return
+                yield {"op": "decrypt_rows", "headers": headers, "rows": chunk}
+
+        for response in self.pipeline(requests()):
+            yield from self._check(response)["rows"]
+
+    def stop(self):
+        """Asks the agent to shut down"""
+        self._check(self.request({"op": "stop"}))
@@ -0,0 +1,113 @@
+"""
+asyncio front end for the Python Password Manager Engine
+Mirrors the Promise-based API of PasswordManageEngine.js
+"""
+
+import asyncio
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Union
+
+from pm_engine import PasswordManagerEngine
+from pm_parallel import chunked
+
+# Items per executor job in the batch calls
+DEFAULT_CHUNK_SIZE = 256
+
+
+class AsyncPasswordManagerEngine:
+    """
+    Async wrapper around PasswordManagerEngine
+    - KDF, AES-GCM and storage work run on an executor, so the event loop is never blocked
+    - At most max_concurrency jobs are in flight; extra calls wait their turn
+    - Batch calls return awaitables that work with asyncio.gather; they send
+      chunk_size items per executor job, not one job per item
+    """
+
+    def __init__(self, engine: Optional[PasswordManagerEngine] = None, max_concurrency: int = 4,
+                 executor: Optional[Executor] = None):
+        self.engine = engine if engine is not None else PasswordManagerEngine()
+        self.max_concurrency = max_concurrency
+        self._owns_executor = executor is None
+        self._executor = executor if executor is not None else ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="pm-engine")
+        # Created on first use so it belongs to the running loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncPasswordManagerEngine":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """Shuts down the executor if this object created it"""
+        if self._owns_executor:
+            await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    @property
+    def master_key(self) -> Optional[bytes]:
+        return self.engine.master_key
+
+    async def fresh_start(self, passphrase: str, gtauk: str) -> str:
+        """Async freshStart: new master key, encrypted with passphrase and stored with GTAUK"""
+        return await self._run(self.engine.fresh_start, passphrase, gtauk)
+
+    async def session_start(self, mk_pe: str, gtauk: str, passphrase_callback: Callable,
+                            passphrase: Optional[str] = None) -> bool:
+        """Async sessionStart: recovers the master key from storage or the passphrase"""
+        return await self._run(self.engine.session_start, mk_pe, gtauk, passphrase_callback, passphrase)
+
+    async def change_passphrase_on_master_key(self, new_passphrase: str) -> str:
+        """Async changePassphraseOnMasterKey"""
+        return await self._run(self.engine.change_passphrase_on_master_key, new_passphrase)
+
+    async def decrypt_secret(self, ciphertext: str, readable: bool = False) -> Union[bytes, str]:
+        """Async decryptSecretWithMasterKey"""
+        return await self._run(self.engine.decrypt_secret_with_master_key, ciphertext, readable)
+
+    async def encrypt_secret(self, plaintext: Union[str, bytes]) -> str:
+        """Async encryptSecretWithMasterKey"""
+        return await self._run(self.engine.encrypt_secret_with_master_key, plaintext)
+
+    async def _run_chunks(self, func: Callable[[List[Any]], List[Any]], items: Iterable[Any],
+                          chunk_size: int) -> List[Any]:
+        """Runs func on chunks of items concurrently and joins the results in input order"""
+        results = await asyncio.gather(*(self._run(func, chunk) for chunk in chunked(items, chunk_size)))
+        return [item for chunk in results for item in chunk]
+
+    async def decrypt_many(self, ciphertexts: Iterable[str], readable: bool = False,
+                           chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Union[bytes, str]]:
+        """Decrypts many secrets concurrently, a chunk per job; results keep input order"""
+        return await self._run_chunks(functools.partial(self._decrypt_chunk, readable=readable),
+                                      ciphertexts, chunk_size)
+
+    async def encrypt_many(self, plaintexts: Iterable[Union[str, bytes]],
+                           chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[str]:
+        """Encrypts many secrets concurrently, a chunk per job; results keep input order"""
+        return await self._run_chunks(self._encrypt_chunk, plaintexts, chunk_size)
+
+    async def decrypt_vault(self, rows: Iterable[List[str]], headers: List[str],
+                            chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[List[str]]:
+        """Decrypts every encrypted column of a vault export, a chunk of rows per job"""
+        if not self.engine.is_unlocked:
+            self.engine.whoops("Cannot decrypt! Get master key first.")
+            return []
+        return await self._run_chunks(functools.partial(self._decrypt_rows, headers=headers), rows, chunk_size)
+
+    def _decrypt_chunk(self, ciphertexts: List[str], readable: bool) -> List[Union[bytes, str]]:
+        return [self.engine.decrypt_secret_with_master_key(c, readable) for c in ciphertexts]
+
+    def _encrypt_chunk(self, plaintexts: List[Union[str, bytes]]) -> List[str]:
+        # engine.encrypt_many returns [] on error; keep one (empty) result per input, like encrypt_secret
+        return self.engine.encrypt_many(plaintexts) or [""] * len(plaintexts)
+
+    def _decrypt_rows(self, rows: List[List[str]], headers: List[str]) -> List[List[str]]:
+        return list(self.engine.decrypt_vault(rows, headers, workers=1))
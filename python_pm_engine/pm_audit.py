@@ -0,0 +1,137 @@
+"""
+Vault integrity audit for Python Password Manager Engine
+Checks that every encrypted cell of a CSV export still decrypts
+
+A cell passes when its envelope parses, its GCM tag verifies under the
+master key and, if it holds a compressed payload, the payload inflates.
+Failures are reported by row, column and cause, using the pm_crypto error
+classes: bad base64, bad envelope, bad tag or bad payload.
+"""
+
+import time
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from pm_crypto import (clear_worker_keys, decompress_payload, decrypt_many, decrypt_many_in_worker,
+                       init_worker_keys)
+from pm_parallel import chunked, ordered_map, resolve_mode
+from pm_vault import CsvVaultReader, column_positions, is_encrypted_column
+
+# (data row number, Index, column name, ciphertext)
+Cell = Tuple[int, str, str, str]
+
+
+class AuditFailure(NamedTuple):
+    """A cell that did not decrypt; row is the 1-based data row number"""
+    row: int
+    index: str
+    column: str
+    cause: str
+    message: str
+
+
+class AuditResult(NamedTuple):
+    rows: int
+    cells: int
+    failures: List[AuditFailure]
+    seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+    @property
+    def cells_per_second(self) -> float:
+        return self.cells / self.seconds if self.seconds > 0 else 0.0
+
+
+def failure_cause(error: Exception) -> str:
+    """bad base64 / bad envelope / bad tag / bad payload for pm_crypto errors, else the exception type"""
+    return getattr(error, "cause", type(error).__name__)
+
+
+def _encrypted_cells(reader: CsvVaultReader) -> Iterator[Cell]:
+    headers = reader.headers
+    encrypted = [(i, header) for i, header in enumerate(headers) if is_encrypted_column(header)]
+    index_col = column_positions(headers).get('index')
+    for row_number, row in enumerate(reader, start=1):
+        index = row[index_col] if index_col is not None and index_col < len(row) else ""
+        for i, header in encrypted:
+            if i < len(row) and row[i].strip():
+                yield row_number, index, header, row[i]
+
+
+def _check_payload(outcome: Union[bytes, Exception]) -> Optional[Exception]:
+    if isinstance(outcome, Exception):
+        return outcome
+    try:
+        decompress_payload(outcome)
+    except ValueError as e:
+        return e
+    return None
+
+
+def _failures(chunk: List[Cell], outcomes: List[Union[bytes, Exception]]) -> List[AuditFailure]:
+    failures = []
+    for (row, index, column, _), outcome in zip(chunk, outcomes):
+        error = _check_payload(outcome)
+        if error is not None:
+            failures.append(AuditFailure(row, index, column, failure_cause(error), str(error)))
+    return failures
+
+
+def _verify_chunk(engine, chunk: List[Cell]) -> Tuple[int, List[AuditFailure]]:
+    ciphertexts = [cell[3] for cell in chunk]
+    if engine.master_key is None:
+        # Unlocked through an agent: one round trip per chunk
+        outcomes = engine.agent.decrypt_many(ciphertexts)
+    else:
+        outcomes = decrypt_many(ciphertexts, engine.master_key_handle)
+    return len(chunk), _failures(chunk, outcomes)
+
+
+def _verify_chunk_in_worker(chunk: List[Cell]) -> Tuple[int, List[AuditFailure]]:
+    """Process pool task; the key comes from init_worker_keys"""
+    return len(chunk), _failures(chunk, decrypt_many_in_worker([cell[3] for cell in chunk]))
+
+
+def audit_csv_vault(engine, csv_file: str, workers: Optional[int] = None, chunk_size: int = 2000,
+                    progress: Optional[Callable[[int, float], None]] = None,
+                    mode: str = 'thread') -> AuditResult:
+    """
+    Verifies every encrypted cell of csv_file with the engine's master key
+    - engine must be unlocked (directly or through an agent)
+    - Cells are streamed in chunks of chunk_size onto the ordered_map pool
+    - mode='process' verifies chunks in worker processes that receive the master
+      key once; 'auto' counts the rows first and picks by size (see pm_parallel.resolve_mode).
+      An agent-unlocked engine always uses threads, since the key stays in the agent
+    - progress(cells_checked, seconds_elapsed) is called after every chunk
+    """
+    if not engine.is_unlocked:
+        raise ValueError("Engine must be unlocked with the vault's master key")
+
+    start = time.perf_counter()
+    failures: List[AuditFailure] = []
+    cells_done = 0
+    with CsvVaultReader(csv_file) as reader:
+        if engine.master_key is None:
+            mode = 'thread'
+        elif mode == 'auto':
+            encrypted = sum(1 for header in reader.headers if is_encrypted_column(header))
+            mode = resolve_mode(mode, reader.scan() * encrypted)
+
+        chunks = chunked(_encrypted_cells(reader), chunk_size)
+        if resolve_mode(mode) == 'process':
+            results = ordered_map(_verify_chunk_in_worker, chunks, workers, mode='process',
+                                  initializer=init_worker_keys, initargs=(engine.master_key,),
+                                  finalizer=clear_worker_keys)
+        else:
+            results = ordered_map(lambda chunk: _verify_chunk(engine, chunk), chunks, workers)
+
+        for count, chunk_failures in results:
+            failures.extend(chunk_failures)
+            cells_done += count
+            if progress is not None:
+                progress(cells_done, time.perf_counter() - start)
+        rows = len(reader.offsets)
+
+    return AuditResult(rows, cells_done, failures, time.perf_counter() - start)
@@ -1,15 +1,23 @@
 """
 Core crypto functions for Python Password Manager Engine
 Mirrors the functionality from subtlecrypto.js and subtlecryptowrap.js
+
+cryptography is imported on first use (KDF or KeyHandle), so the codec and
+envelope helpers can be used without loading it.
 """
 
 import base64
+import binascii
+import hashlib
+import hmac
 import os
-from typing import Union, Optional
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Iterable, List, Tuple, Union, Optional
+
+from pm_metrics import get_metrics
 
 
 def get_salt(size: int = 12) -> bytes:
@@ -17,120 +25,674 @@ def get_salt(size: int = 12) -> bytes:
     return os.urandom(size)
 
 
-def get_key_material_from_passphrase(passphrase: str) -> bytes:
+class CiphertextError(ValueError):
+    """A ciphertext that cannot be decrypted; cause says why"""
+    cause = "invalid"
+
+
+class CiphertextEncodingError(CiphertextError):
+    """The base64 (or its decimal byte text) does not decode"""
+    cause = "bad base64"
+
+
+class CiphertextFormatError(CiphertextError):
+    """The envelope is malformed or truncated"""
+    cause = "bad envelope"
+
+
+class DecryptionError(CiphertextError):
+    """The GCM tag does not verify (wrong key or corrupted data)"""
+    cause = "bad tag"
+
+
+class PayloadError(CiphertextError):
+    """The tag verifies but a compressed payload does not inflate"""
+    cause = "bad payload"
+
+
+# PBKDF2 parameters shared with the JS code
+KDF_SALT = b'\x00' * 32  # Fixed salt like in JS
+KDF_ITERATIONS = 100  # Same as JS
+
+
+class DerivedKeyCache:
+    """
+    Bounded cache of PBKDF2 results with TTL eviction
+    - Entries are keyed by an HMAC of (passphrase, salt, iterations) under a
+      per-process random key, so the cache never holds the passphrase itself
+    - Derived keys are zeroed when they are evicted, expire or are cleared
+    """
+    
+    def __init__(self, maxsize: int = 16, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, Tuple[float, bytearray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint_key = os.urandom(32)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def fingerprint(self, passphrase: str, salt: bytes, iterations: int) -> bytes:
+        """Returns the cache key for one derivation"""
+        passphrase_bytes = passphrase.encode('utf-8')
+        message = (len(passphrase_bytes).to_bytes(4, 'big') + passphrase_bytes +
+                   len(salt).to_bytes(4, 'big') + salt + iterations.to_bytes(8, 'big'))
+        return hmac.new(self._fingerprint_key, message, hashlib.sha256).digest()
+    
+    def get(self, fingerprint: bytes) -> Optional[bytes]:
+        """Returns the cached key or None, counting the hit or miss"""
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                self._drop(fingerprint)
+                self.expirations += 1
+                entry = None
+            
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            self.hits += 1
+            self._entries.move_to_end(fingerprint)
+            return bytes(entry[1])
+    
+    def put(self, fingerprint: bytes, key: bytes):
+        """Stores a derived key, evicting the least recently used entries over maxsize"""
+        with self._lock:
+            if fingerprint in self._entries:
+                self._drop(fingerprint)
+            self._entries[fingerprint] = (time.monotonic(), bytearray(key))
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def clear(self):
+        """Drops (and zeroes) every cached key"""
+        with self._lock:
+            for fingerprint in list(self._entries):
+                self._drop(fingerprint)
+    
+    def stats(self) -> dict:
+        """Returns hit/miss statistics"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+    
+    def _drop(self, fingerprint: bytes):
+        _, key = self._entries.pop(fingerprint)
+        key[:] = bytes(len(key))
+
+
+# Opt-in process-wide KDF cache (see enable_kdf_cache)
+_kdf_cache: Optional[DerivedKeyCache] = None
+
+
+def enable_kdf_cache(maxsize: int = 16, ttl: float = 300.0) -> DerivedKeyCache:
+    """
+    Turns on memoization of get_key_material_from_passphrase
+    - Repeated operations under the same passphrase pay for PBKDF2 once per ttl seconds
+    """
+    global _kdf_cache
+    if _kdf_cache is not None:
+        _kdf_cache.clear()
+    _kdf_cache = DerivedKeyCache(maxsize, ttl)
+    return _kdf_cache
+
+
+def disable_kdf_cache():
+    """Turns off KDF memoization and wipes the cache"""
+    global _kdf_cache
+    if _kdf_cache is not None:
+        _kdf_cache.clear()
+    _kdf_cache = None
+
+
+def clear_kdf_cache():
+    """Wipes the KDF cache without turning it off"""
+    if _kdf_cache is not None:
+        _kdf_cache.clear()
+
+
+def kdf_cache_stats() -> Optional[dict]:
+    """Returns KDF cache statistics, or None when the cache is disabled"""
+    return _kdf_cache.stats() if _kdf_cache is not None else None
+
+
+class PlaintextCache:
+    """
+    Bounded cache of decrypted secrets with TTL eviction
+    - Keyed by ciphertext (every encryption uses a fresh IV, so a ciphertext
+      string always maps to the same plaintext)
+    - Entries expire ttl seconds after they were decrypted, oldest first;
+      expired, evicted and cleared plaintexts are zeroed
+    """
+    
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, bytearray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def _purge_expired(self, now: float):
+        # Entries are kept in insertion order, so expired ones are at the front
+        while self._entries:
+            ciphertext, (stored, _) = next(iter(self._entries.items()))
+            if now - stored <= self.ttl:
+                break
+            self._drop(ciphertext)
+    
+    def get(self, ciphertext: str) -> Optional[bytes]:
+        """Returns the cached plaintext or None"""
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            entry = self._entries.get(ciphertext)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return bytes(entry[1])
+    
+    def put(self, ciphertext: str, plaintext: bytes):
+        """Stores a plaintext, evicting the oldest entries over maxsize"""
+        with self._lock:
+            now = time.monotonic()
+            self._purge_expired(now)
+            if ciphertext in self._entries:
+                self._drop(ciphertext)
+            self._entries[ciphertext] = (now, bytearray(plaintext))
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+    
+    def clear(self):
+        """Drops (and zeroes) every cached plaintext"""
+        with self._lock:
+            for ciphertext in list(self._entries):
+                self._drop(ciphertext)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge_expired(time.monotonic())
+            return len(self._entries)
+    
+    def _drop(self, ciphertext: str):
+        _, plaintext = self._entries.pop(ciphertext)
+        plaintext[:] = bytes(len(plaintext))
+
+
+def get_key_material_from_passphrase(passphrase: str, salt: bytes = KDF_SALT,
+                                     iterations: int = KDF_ITERATIONS) -> bytes:
     """Derives a key from passphrase using PBKDF2 (equivalent to getKeyMaterialFromPassphrase)"""
+    metrics = get_metrics()
+    cache = _kdf_cache
+    if cache is not None:
+        fingerprint = cache.fingerprint(passphrase, salt, iterations)
+        key = cache.get(fingerprint)
+        if key is not None:
+            if metrics is not None:
+                metrics.inc("kdf_cache_hits_total")
+            return key
+    
+    start = time.perf_counter()
+    
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    from cryptography.hazmat.backends import default_backend
+    
     # Convert passphrase to bytes
     passphrase_bytes = passphrase.encode('utf-8')
     
-    # Use a fixed salt (32 bytes) as in the JS code
-    salt = b'\x00' * 32  # Fixed salt like in JS
-    
     # Derive key using PBKDF2 with same parameters as JS
     kdf = PBKDF2HMAC(
         algorithm=hashes.SHA256(),
         length=32,  # 256 bits = 32 bytes
         salt=salt,
-        iterations=100,  # Same as JS
+        iterations=iterations,
         backend=default_backend()
     )
+    key = kdf.derive(passphrase_bytes)
     
-    return kdf.derive(passphrase_bytes)
+    if metrics is not None:
+        metrics.observe("kdf_derive_seconds", time.perf_counter() - start)
+    
+    if cache is not None:
+        cache.put(fingerprint, key)
+    
+    return key
+
+
+# The JavaScript code uses a custom format for binary data:
+# 1. Convert Uint8Array to comma-separated numbers: "126,160,19,118,78,27,218,65,236,10,181,100"
+# 2. Then base64 encode that string
+# These tables map every byte value to its decimal text and back, so the codec
+# never has to build an intermediate str or call int() per byte
+_BYTE_TO_DECIMAL = [str(i).encode('ascii') for i in range(256)]
+_DECIMAL_TO_BYTE = {text: i for i, text in enumerate(_BYTE_TO_DECIMAL)}
+
+
+def _decimal_text_to_bytes(decoded: bytes) -> bytes:
+    """Converts comma-separated decimal text to bytes"""
+    try:
+        return bytes(map(_DECIMAL_TO_BYTE.__getitem__, decoded.split(b',')))
+    except KeyError:
+        # Not canonical (whitespace, leading zeros, ...); let int() sort it out
+        return bytes(int(x) for x in decoded.split(b','))
+
+
+def _decode_or_raise(decoded: bytes) -> bytes:
+    """Converts decimal text to bytes, raising the codec's ValueError on bad input"""
+    try:
+        return _decimal_text_to_bytes(decoded)
+    except Exception as e:
+        raise CiphertextEncodingError(f"Invalid base64 string: {e}")
 
 
 def base64_string_to_bytes(base64_string: str) -> bytes:
     """Converts base64 string to bytes (equivalent to base64StringToUInt8Arr in JS)"""
     try:
-        # The JavaScript code uses a custom format:
-        # 1. Convert Uint8Array to comma-separated numbers: "126,160,19,118,78,27,218,65,236,10,181,100"
-        # 2. Then base64 encode that string
-        # So we need to base64 decode first, then split by comma and convert to bytes
-        
-        # First decode the base64 string
-        decoded = base64.b64decode(base64_string)
-        decoded_str = decoded.decode('utf-8')
-        
-        # Split by comma and convert each number to byte
-        numbers = [int(x.strip()) for x in decoded_str.split(',')]
-        return bytes(numbers)
-        
+        decoded = binascii.a2b_base64(base64_string)
     except Exception as e:
-        raise ValueError(f"Invalid base64 string: {e}")
+        raise CiphertextEncodingError(f"Invalid base64 string: {e}")
+    return _decode_or_raise(decoded)
 
 
 def bytes_to_base64(data: bytes) -> str:
     """Converts bytes to base64 string (equivalent to btoa in JS)"""
-    # The JavaScript code converts Uint8Array to comma-separated numbers first
-    # then base64 encodes that string
-    comma_separated = ','.join(str(b) for b in data)
-    return base64.b64encode(comma_separated.encode('utf-8')).decode('utf-8')
+    comma_separated = b','.join(map(_BYTE_TO_DECIMAL.__getitem__, data))
+    return binascii.b2a_base64(comma_separated, newline=False).decode('ascii')
 
 
-def ez_subtle_encrypt(data: Union[str, bytes], key: Union[str, bytes]) -> str:
+def base64_strings_to_bytes(base64_strings: Iterable[str]) -> List[bytes]:
     """
-    Encrypts data with key (equivalent to ezSubtleEncrypt)
-    Returns: iv_base64 + "&" + ciphertext_base64
+    Batch version of base64_string_to_bytes
+    - All decimal text is converted in a single pass and then sliced per input
+    """
+    try:
+        decoded = [binascii.a2b_base64(s) for s in base64_strings]
+    except Exception as e:
+        raise CiphertextEncodingError(f"Invalid base64 string: {e}")
+    
+    try:
+        joined = bytes(map(_DECIMAL_TO_BYTE.__getitem__, b','.join(decoded).split(b',')))
+    except KeyError:
+        # Something is not canonical; fall back to per-item decoding for exact errors
+        return [_decode_or_raise(d) for d in decoded]
+    
+    result = []
+    start = 0
+    for d in decoded:
+        end = start + d.count(b',') + 1
+        result.append(joined[start:end])
+        start = end
+    return result
+
+
+def bytes_list_to_base64(data_list: Iterable[bytes]) -> List[str]:
+    """Batch version of bytes_to_base64"""
+    table = _BYTE_TO_DECIMAL.__getitem__
+    b2a = binascii.b2a_base64
+    return [b2a(b','.join(map(table, data)), newline=False).decode('ascii') for data in data_list]
+
+
+# Compact "v2" envelope: prefix + unpadded base64url of iv || ciphertext || tag
+# ':' is not in either base64 alphabet, so it can never be mistaken for iv_base64&ciphertext_base64
+COMPACT_PREFIX = "v2:"
+IV_SIZE = 12
+TAG_SIZE = 16
+
+
+def is_compact_ciphertext(cipher_data: str) -> bool:
+    """Returns True if cipher_data uses the compact v2 envelope"""
+    return cipher_data.startswith(COMPACT_PREFIX)
+
+
+def pack_ciphertext(iv: bytes, encrypted_data: bytes, compact: bool = False) -> str:
+    """
+    Builds the ciphertext envelope from iv and ciphertext+tag
+    - Legacy (default): iv_base64&ciphertext_base64, readable by the JavaScript code
+    - Compact: v2:base64url(iv || ciphertext || tag)
+    """
+    if compact:
+        packed = base64.urlsafe_b64encode(iv + encrypted_data).rstrip(b'=').decode('ascii')
+        return COMPACT_PREFIX + packed
+    return f"{bytes_to_base64(iv)}&{bytes_to_base64(encrypted_data)}"
+
+
+def unpack_ciphertext(cipher_data: str) -> Tuple[bytes, bytes]:
+    """
+    Parses either ciphertext envelope
+    Returns: (iv, ciphertext+tag)
+    """
+    if is_compact_ciphertext(cipher_data):
+        packed = cipher_data[len(COMPACT_PREFIX):]
+        try:
+            raw = base64.b64decode(packed + '=' * (-len(packed) % 4), altchars=b'-_', validate=True)
+        except Exception as e:
+            raise CiphertextEncodingError(f"Invalid base64 string: {e}")
+        if len(raw) < IV_SIZE + TAG_SIZE:
+            raise CiphertextFormatError("Invalid cipher data format. Compact envelope is too short")
+        return raw[:IV_SIZE], raw[IV_SIZE:]
+    
+    # Split iv and ciphertext
+    parts = cipher_data.split('&')
+    if len(parts) != 2:
+        raise CiphertextFormatError("Invalid cipher data format. Expected: iv_base64&ciphertext_base64")
+    
+    # Decode iv and ciphertext from base64 in one codec pass
+    iv, encrypted_data = base64_strings_to_bytes(parts)
+    if len(iv) != IV_SIZE or len(encrypted_data) < TAG_SIZE:
+        raise CiphertextFormatError(f"Invalid cipher data format. Expected a {IV_SIZE} byte IV and "
+                                    f"at least {TAG_SIZE} bytes of ciphertext")
+    return iv, encrypted_data
+
+
+def reencode_ciphertext(cipher_data: str, compact: bool = True) -> str:
+    """Converts a ciphertext between the legacy and compact envelopes without decrypting it"""
+    if is_compact_ciphertext(cipher_data) == compact:
+        return cipher_data
+    iv, encrypted_data = unpack_ciphertext(cipher_data)
+    return pack_ciphertext(iv, encrypted_data, compact)
+
+
+# Opt-in compressed payloads. The marker is part of the plaintext, so the GCM
+# tag covers it. It starts with NUL, which text secrets never do, and is five
+# bytes long, so an ordinary value is never mistaken for a compressed one.
+COMPRESSED_MAGIC = b"\x00PMZ\x01"
+COMPRESS_MIN_SIZE = 64  # shorter values never shrink enough to be worth it
+MAX_DECOMPRESSED_SIZE = 16 * 1024 * 1024
+
+
+def compress_payload(data: Union[str, bytes], min_size: int = COMPRESS_MIN_SIZE) -> bytes:
+    """
+    Returns data as a marked, deflate-compressed payload if that makes it smaller
+    - Values shorter than min_size, or that do not shrink, are returned unchanged
+    - A value that already starts with the marker is always wrapped, so it round-trips
     """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    marked = data.startswith(COMPRESSED_MAGIC)
+    if len(data) < min_size and not marked:
+        return data
+    
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    packed = COMPRESSED_MAGIC + compressor.compress(data) + compressor.flush()
+    return packed if marked or len(packed) < len(data) else data
+
+
+def decompress_payload(data: bytes) -> bytes:
+    """Inverse of compress_payload; data without the marker is returned unchanged"""
+    if not data.startswith(COMPRESSED_MAGIC):
+        return data
+    
+    decompressor = zlib.decompressobj(-15)
+    try:
+        plaintext = decompressor.decompress(data[len(COMPRESSED_MAGIC):], MAX_DECOMPRESSED_SIZE)
+    except zlib.error as e:
+        raise PayloadError(f"Invalid compressed payload: {e}")
+    if decompressor.unconsumed_tail or not decompressor.eof:
+        raise PayloadError("Invalid compressed payload: truncated or larger than "
+                           f"{MAX_DECOMPRESSED_SIZE} bytes")
+    return plaintext
+
+
+class KeyHandle:
+    """
+    Reusable AES-GCM context for one raw key (equivalent to a CryptoKey in JS)
+    - The AES key schedule is set up once, not on every encrypt/decrypt
+    """
+    
+    __slots__ = ('raw', '_aesgcm')
+    
+    def __init__(self, raw_key: bytes):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        self.raw = bytes(raw_key)
+        self._aesgcm = AESGCM(self.raw)
+    
+    def encrypt(self, iv: bytes, data: bytes) -> bytes:
+        """Returns ciphertext + tag"""
+        return self._aesgcm.encrypt(iv, data, None)
+    
+    def decrypt(self, iv: bytes, encrypted_data: bytes) -> bytes:
+        """Decrypts ciphertext + tag, raising DecryptionError (a ValueError) if the tag does not verify"""
+        try:
+            return self._aesgcm.decrypt(iv, encrypted_data, None)
+        except Exception as e:
+            raise DecryptionError(f"Decryption failed: {e}")
+
+
+KeyLike = Union[str, bytes, KeyHandle]
+
+
+def get_key_handle(key: KeyLike) -> KeyHandle:
+    """Returns a KeyHandle for a passphrase, raw key bytes or an existing handle"""
+    if isinstance(key, KeyHandle):
+        return key
+    
     # Get key material from passphrase if string
     if isinstance(key, str):
         key = get_key_material_from_passphrase(key)
     
+    return KeyHandle(key)
+
+
+class KeyRing:
+    """
+    Small LRU cache of KeyHandles for secondary keys (GTAUK, passphrases, ...)
+    - Entries are looked up by a SHA-256 digest of the key, never the key itself
+    - Passphrases only go through PBKDF2 on a cache miss
+    """
+    
+    def __init__(self, maxsize: int = 8):
+        self.maxsize = maxsize
+        self._handles: "OrderedDict[bytes, KeyHandle]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _fingerprint(key: Union[str, bytes]) -> bytes:
+        if isinstance(key, str):
+            return hashlib.sha256(b'passphrase:' + key.encode('utf-8')).digest()
+        return hashlib.sha256(b'raw:' + bytes(key)).digest()
+    
+    def get(self, key: KeyLike) -> KeyHandle:
+        """Returns the cached handle for key, building it on first use"""
+        if isinstance(key, KeyHandle):
+            return key
+        
+        fingerprint = self._fingerprint(key)
+        with self._lock:
+            handle = self._handles.get(fingerprint)
+            if handle is not None:
+                self._handles.move_to_end(fingerprint)
+                return handle
+        
+        handle = get_key_handle(key)
+        
+        with self._lock:
+            self._handles[fingerprint] = handle
+            self._handles.move_to_end(fingerprint)
+            while len(self._handles) > self.maxsize:
+                self._handles.popitem(last=False)
+        return handle
+    
+    def clear(self):
+        """Drops every cached handle"""
+        with self._lock:
+            self._handles.clear()
+    
+    def __len__(self) -> int:
+        return len(self._handles)
+
+
+def ez_subtle_encrypt(data: Union[str, bytes], key: KeyLike, compact: bool = False) -> str:
+    """
+    Encrypts data with key (equivalent to ezSubtleEncrypt)
+    key can be a passphrase, raw key bytes or a KeyHandle
+    Returns: iv_base64 + "&" + ciphertext_base64
+    (or the v2 compact envelope if compact is True)
+    """
+    metrics = get_metrics()
+    if metrics is None:
+        return _ez_subtle_encrypt(data, key, compact)
+    with metrics.timer("encrypt_seconds"):
+        return _ez_subtle_encrypt(data, key, compact)
+
+
+def _ez_subtle_encrypt(data: Union[str, bytes], key: KeyLike, compact: bool) -> str:
+    handle = get_key_handle(key)
+    
     # Convert data to bytes if string
     if isinstance(data, str):
         data = data.encode('utf-8')
     
     # Generate random IV
-    iv = get_salt(12)
+    iv = get_salt(IV_SIZE)
     
-    # Encrypt data
-    cipher = Cipher(algorithms.AES(key), modes.GCM(iv), backend=default_backend())
-    encryptor = cipher.encryptor()
-    
-    ciphertext = encryptor.update(data) + encryptor.finalize()
-    
-    # Get the tag (GCM authentication tag)
-    tag = encryptor.tag
-    
-    # Combine ciphertext and tag
-    encrypted_data = ciphertext + tag
+    # Encrypt data (AES-GCM appends the 16 byte tag to the ciphertext)
+    encrypted_data = handle.encrypt(iv, data)
     
     # Return iv&ciphertext format
-    return f"{bytes_to_base64(iv)}&{bytes_to_base64(encrypted_data)}"
+    return pack_ciphertext(iv, encrypted_data, compact)
 
 
-def ez_subtle_decrypt(cipher_data: str, key: Union[str, bytes]) -> bytes:
+def ez_subtle_decrypt(cipher_data: str, key: KeyLike) -> bytes:
     """
     Decrypts cipher_data with key (equivalent to ezSubtleDecrypt)
-    cipher_data format: iv_base64&ciphertext_base64
+    key can be a passphrase, raw key bytes or a KeyHandle
+    cipher_data format: iv_base64&ciphertext_base64 or v2:base64url (detected automatically)
     Returns: decrypted bytes
     """
-    # Get key material from passphrase if string
-    if isinstance(key, str):
-        key = get_key_material_from_passphrase(key)
-    
-    # Split iv and ciphertext
-    parts = cipher_data.split('&')
-    if len(parts) != 2:
-        raise ValueError("Invalid cipher data format. Expected: iv_base64&ciphertext_base64")
+    metrics = get_metrics()
+    if metrics is None:
+        return _ez_subtle_decrypt(cipher_data, key)
+    with metrics.timer("decrypt_seconds"):
+        try:
+            return _ez_subtle_decrypt(cipher_data, key)
+        except Exception:
+            metrics.inc("decrypt_failures_total")
+            raise
+
+
+def _ez_subtle_decrypt(cipher_data: str, key: KeyLike) -> bytes:
+    handle = get_key_handle(key)
     
-    iv_b64, ct_b64 = parts
+    iv, encrypted_data = unpack_ciphertext(cipher_data)
     
-    # Decode from base64
-    iv = base64_string_to_bytes(iv_b64)
-    encrypted_data = base64_string_to_bytes(ct_b64)
+    # Decrypt (the last 16 bytes are the GCM tag)
+    return handle.decrypt(iv, encrypted_data)
+
+
+def encrypt_many(plaintexts: Iterable[Union[str, bytes]], key: KeyLike, compact: bool = False) -> List[str]:
+    """
+    Batch version of ez_subtle_encrypt; results keep input order
+    - The key is resolved once and one KeyHandle encrypts every item
+    - All IVs come from a single os.urandom read and are checked for
+      uniqueness within the batch (a repeat is redrawn), so no IV is reused
+    - Legacy envelopes are encoded in one bytes_list_to_base64 pass
+    """
+    metrics = get_metrics()
+    if metrics is None:
+        return _encrypt_many(plaintexts, key, compact)
+    with metrics.timer("encrypt_many_seconds"):
+        return _encrypt_many(plaintexts, key, compact)
+
+
+def _encrypt_many(plaintexts: Iterable[Union[str, bytes]], key: KeyLike, compact: bool) -> List[str]:
+    handle = get_key_handle(key)
+    data = [p.encode('utf-8') if isinstance(p, str) else p for p in plaintexts]
+    count = len(data)
     
-    # Split ciphertext and tag (last 16 bytes are the GCM tag)
-    ciphertext = encrypted_data[:-16]
-    tag = encrypted_data[-16:]
+    pool = get_salt(IV_SIZE * count)
+    ivs = [pool[i:i + IV_SIZE] for i in range(0, IV_SIZE * count, IV_SIZE)]
+    if len(set(ivs)) != count:
+        seen = set()
+        for i, iv in enumerate(ivs):
+            while iv in seen:
+                iv = get_salt(IV_SIZE)
+            ivs[i] = iv
+            seen.add(iv)
     
-    # Decrypt
-    cipher = Cipher(algorithms.AES(key), modes.GCM(iv, tag), backend=default_backend())
-    decryptor = cipher.decryptor()
+    encrypt = handle.encrypt
+    encrypted = [encrypt(iv, d) for iv, d in zip(ivs, data)]
     
-    try:
-        plaintext = decryptor.update(ciphertext) + decryptor.finalize()
-        return plaintext
-    except Exception as e:
-        raise ValueError(f"Decryption failed: {e}")
+    if compact:
+        return [pack_ciphertext(iv, e, compact=True) for iv, e in zip(ivs, encrypted)]
+    encoded = bytes_list_to_base64(ivs + encrypted)
+    return [f"{iv_text}&{ct_text}" for iv_text, ct_text in zip(encoded[:count], encoded[count:])]
+
+
+def decrypt_many(ciphertexts: Iterable[str], key: KeyLike) -> List[Union[bytes, CiphertextError]]:
+    """
+    Batch version of ez_subtle_decrypt; results keep input order
+    - The key is resolved once and one KeyHandle decrypts every item
+    - An item that fails gives its CiphertextError in place instead of raising
+      (like pm_agent.AgentClient.decrypt_many)
+    """
+    metrics = get_metrics()
+    if metrics is None:
+        return _decrypt_many(ciphertexts, key)
+    with metrics.timer("decrypt_many_seconds"):
+        results = _decrypt_many(ciphertexts, key)
+    for result in results:
+        if isinstance(result, Exception):
+            metrics.inc("decrypt_failures_total")
+    return results
+
+
+def _decrypt_many(ciphertexts: Iterable[str], key: KeyLike) -> List[Union[bytes, CiphertextError]]:
+    decrypt = get_key_handle(key).decrypt
+    results = []
+    for cipher_data in ciphertexts:
+        try:
+            results.append(decrypt(*unpack_ciphertext(cipher_data)))
+        except CiphertextError as e:
+            results.append(e)
+    return results
+
+
+# Process pool workers (pm_parallel.ordered_map with mode='process').
+# init_worker_keys is the pool initializer, so each worker process receives
+# the keys once; tasks only carry ciphertexts or plaintexts.
+_worker_keys: Tuple[KeyHandle, ...] = ()
+
+
+def init_worker_keys(*keys: bytes):
+    """Pool initializer: keeps a KeyHandle for each key in this process"""
+    global _worker_keys
+    _worker_keys = tuple(KeyHandle(key) for key in keys)
+
+
+def clear_worker_keys():
+    """Drops the keys from init_worker_keys; the finalizer for inline (workers <= 1) maps"""
+    global _worker_keys
+    _worker_keys = ()
+
+
+def worker_key(n: int = 0) -> KeyHandle:
+    """The n-th key passed to init_worker_keys in this process"""
+    if n >= len(_worker_keys):
+        raise RuntimeError("No worker key; pass init_worker_keys as the pool initializer")
+    return _worker_keys[n]
+
+
+def decrypt_many_in_worker(ciphertexts: List[str]) -> List[Union[bytes, CiphertextError]]:
+    """decrypt_many with the worker's key"""
+    return decrypt_many(ciphertexts, worker_key())
+
+
+def encrypt_many_in_worker(task: Tuple[List[Union[str, bytes]], bool]) -> List[str]:
+    """encrypt_many with the worker's key; task is (plaintexts, compact)"""
+    plaintexts, compact = task
+    return encrypt_many(plaintexts, worker_key(), compact)
 
 
 def generate_sym_key() -> bytes:
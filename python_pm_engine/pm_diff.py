@@ -0,0 +1,156 @@
+"""
+Incremental diff between two CSV vault exports
+Rows are matched by their Index column and compared by a hash of their cells
+
+Every encryption uses a fresh random IV, so re-encrypting a value always
+produces a different ciphertext. An identical ciphertext string therefore
+means the value did not change, and only added, changed or deleted rows
+ever need decrypting.
+"""
+
+import hashlib
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from pm_parallel import ordered_map
+from pm_vault import CsvVaultReader, column_positions, is_encrypted_column
+
+ADDED = 'added'
+CHANGED = 'changed'
+DELETED = 'deleted'
+
+# (Index value, occurrence) so duplicate Index values still pair up in order
+RowKey = Tuple[str, int]
+
+
+class RowChange(NamedTuple):
+    """One added, changed or deleted row; columns are the headers whose cells differ"""
+    kind: str
+    index: str
+    site: str
+    columns: Tuple[str, ...]
+    old_row: Optional[Dict[str, str]]
+    new_row: Optional[Dict[str, str]]
+
+
+def _row_cells(row: List[str], headers: List[str]) -> Dict[str, str]:
+    return {header: row[i] if i < len(row) else "" for i, header in enumerate(headers)}
+
+
+def _row_digest(cells: Dict[str, str]) -> bytes:
+    """Hash of the cells by column name, so reordered columns do not count as a change"""
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(cells, key=str.lower):
+        for text in (name.strip().lower(), cells[name]):
+            data = text.encode('utf-8')
+            digest.update(len(data).to_bytes(4, 'big'))
+            digest.update(data)
+    return digest.digest()
+
+
+def _keyed_rows(reader: CsvVaultReader) -> Iterator[Tuple[RowKey, int, List[str]]]:
+    """Yields (key, row number, row) for every data row"""
+    index_col = column_positions(reader.headers).get('index')
+    if index_col is None:
+        raise ValueError(f"{reader.csv_file} has no Index column")
+    seen: Dict[str, int] = {}
+    for row_number, row in enumerate(reader):
+        index = row[index_col].strip() if index_col < len(row) else ""
+        occurrence = seen.get(index, 0)
+        seen[index] = occurrence + 1
+        yield (index, occurrence), row_number, row
+
+
+def _site(cells: Dict[str, str]) -> str:
+    for name, value in cells.items():
+        if name.strip().lower() == 'site':
+            return value
+    return ""
+
+
+class VaultDiff:
+    """
+    Changes between an old and a new CSV export
+    - The old export is read once to hash every row; only the hashes are kept
+    - The new export is streamed and compared row by row
+    - Rows that differ are re-read from the old file by byte offset, so memory
+      grows with the number of rows, not their size
+    """
+
+    def __init__(self, old_csv: str, new_csv: str):
+        self.old_csv = old_csv
+        self.new_csv = new_csv
+        self.changes: List[RowChange] = []
+        self.unchanged = 0
+
+        with CsvVaultReader(old_csv) as old, CsvVaultReader(new_csv) as new:
+            self.old_headers = old.headers
+            self.new_headers = new.headers
+            self.old_master_key = old.encrypted_master_key
+            self.new_master_key = new.encrypted_master_key
+
+            old_rows: Dict[RowKey, Tuple[bytes, int]] = {
+                key: (_row_digest(_row_cells(row, old.headers)), row_number)
+                for key, row_number, row in _keyed_rows(old)
+            }
+
+            for key, _, row in _keyed_rows(new):
+                new_cells = _row_cells(row, new.headers)
+                previous = old_rows.pop(key, None)
+                if previous is None:
+                    columns = tuple(name for name, value in new_cells.items() if value)
+                    self.changes.append(RowChange(ADDED, key[0], _site(new_cells), columns, None, new_cells))
+                elif previous[0] == _row_digest(new_cells):
+                    self.unchanged += 1
+                else:
+                    old_cells = _row_cells(old.read_row(previous[1]), old.headers)
+                    columns = tuple(name for name in dict.fromkeys(list(old_cells) + list(new_cells))
+                                    if old_cells.get(name, "") != new_cells.get(name, ""))
+                    self.changes.append(RowChange(CHANGED, key[0], _site(new_cells), columns, old_cells, new_cells))
+
+            for key, (_, row_number) in sorted(old_rows.items(), key=lambda item: item[1][1]):
+                old_cells = _row_cells(old.read_row(row_number), old.headers)
+                columns = tuple(name for name, value in old_cells.items() if value)
+                self.changes.append(RowChange(DELETED, key[0], _site(old_cells), columns, old_cells, None))
+
+    @property
+    def master_key_changed(self) -> bool:
+        """True if the master key row differs (a new passphrase or a rotated key)"""
+        return self.old_master_key != self.new_master_key
+
+    def counts(self) -> Dict[str, int]:
+        counts = {ADDED: 0, CHANGED: 0, DELETED: 0}
+        for change in self.changes:
+            counts[change.kind] += 1
+        counts['unchanged'] = self.unchanged
+        return counts
+
+    def report(self, new_engine=None, old_engine=None, workers: Optional[int] = None) -> List[dict]:
+        """
+        JSON-ready records for every change
+        - Only the differing columns are included, plus Index and Site
+        - With engines, encrypted values are decrypted (old values with old_engine,
+          which defaults to new_engine); without them, encrypted values are left out
+        """
+        old_engine = old_engine or new_engine
+
+        def values(cells: Optional[Dict[str, str]], columns: Iterable[str], engine) -> Optional[Dict[str, str]]:
+            if cells is None:
+                return None
+            plain = {name: cells.get(name, "") for name in columns if not is_encrypted_column(name)}
+            if engine is None:
+                return plain
+            encrypted = [name for name in columns if is_encrypted_column(name)]
+            decrypted = next(engine.decrypt_vault([[cells.get(name, "") for name in encrypted]], encrypted, workers=1))
+            return {**plain, **dict(zip(encrypted, decrypted))}
+
+        def record(change: RowChange) -> dict:
+            return {
+                "change": change.kind,
+                "index": change.index,
+                "site": change.site,
+                "columns": list(change.columns),
+                "old": values(change.old_row, change.columns, old_engine),
+                "new": values(change.new_row, change.columns, new_engine),
+            }
+
+        return list(ordered_map(record, self.changes, workers if new_engine is not None else 1))
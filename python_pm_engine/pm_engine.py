@@ -3,43 +3,171 @@ Password Manager Engine for Python
 Mirrors the functionality from PasswordManageEngine.js
 """
 
-import json
-import os
-from typing import Optional, Callable, Union
+import time
+from collections import deque
+from typing import Optional, Callable, Union, Iterable, Iterator, List, Dict
 from pm_crypto import (
+    clear_worker_keys,
+    compress_payload,
+    decompress_payload,
     ez_subtle_decrypt, 
     ez_subtle_encrypt, 
+    decrypt_many,
+    decrypt_many_in_worker,
+    encrypt_many,
+    encrypt_many_in_worker,
+    init_worker_keys,
     import_raw_key,
-    generate_and_export_key
+    generate_and_export_key,
+    KeyHandle,
+    KeyRing,
+    PlaintextCache
 )
+from pm_metrics import get_metrics
+from pm_parallel import chunked, ordered_map, resolve_mode
+from pm_search import SiteSearchIndex, SiteMatch
+from pm_storage import JsonFileStorage
+from pm_vault import is_encrypted_column, LazyVaultRow, Vault
+
+
+def _display_text(plaintext: Union[bytes, Exception]) -> str:
+    """A decrypted cell as text, or the placeholder read-csv-passwords shows for a failure"""
+    if isinstance(plaintext, Exception):
+        return f"[Decryption failed: {plaintext}]"
+    try:
+        return plaintext.decode('utf-8')
+    except UnicodeDecodeError:
+        return f"[Binary data - {len(plaintext)} bytes]"
+
+
+def _cell_text(payload: Union[bytes, Exception]) -> Union[str, Exception]:
+    """A decrypted payload as text, or the error that stopped it (bad payload, not UTF-8)"""
+    if isinstance(payload, Exception):
+        return payload
+    try:
+        return decompress_payload(payload).decode('utf-8')
+    except ValueError as err:
+        return err
 
 
 class PasswordManagerEngine:
     """Python implementation of the JavaScript Password Manager Engine"""
     
     def __init__(self):
+        self._master_key_handle: Optional[KeyHandle] = None
         self.master_key: Optional[bytes] = None
         self.master_key_passcode_encrypted: Optional[str] = None
         self.google_temp_active_user_key: Optional[str] = None
         self.master_key_local_storage_tag = "pmengine_masterkey"
         self.master_key_expiration = 5 * 0.000011  # Days until expiration
         self.get_passphrase_callback: Optional[Callable] = None
+        # Write secrets in the compact v2 envelope (the JavaScript UI only reads the legacy one)
+        self.compact_ciphertext = False
+        # Compress long secrets before encrypting them (see pm_crypto.compress_payload).
+        # Decryption always detects compressed payloads; the JavaScript UI cannot read them
+        self.compress_secrets = False
         
         # Storage file for persistent data (replaces cookies/localStorage)
         self.storage_file = "pm_engine_storage.json"
+        
+        # Cached key handles for the GTAUK and other secondary keys
+        self.keyring = KeyRing()
+        
+        # Site search index (see build_site_index)
+        self.site_index: Optional[SiteSearchIndex] = None
+        
+        # Columnar vault loaded with load_vault
+        self.vault: Optional[Vault] = None
+        
+        # Optional cache of decrypted cells used by lazy_row (None disables it)
+        self.plaintext_cache: Optional[PlaintextCache] = None
+        
+        # Unlock agent serving secret operations when no local master key is set (see attach_agent)
+        self.agent = None
+    
+    @property
+    def master_key(self) -> Optional[bytes]:
+        """Raw master key bytes"""
+        return self._master_key
+    
+    @master_key.setter
+    def master_key(self, key: Optional[bytes]):
+        self._master_key = key
+        self._master_key_handle = None
+        self._clear_plaintext_cache()
+    
+    @property
+    def master_key_handle(self) -> Optional[KeyHandle]:
+        """
+        AES-GCM context for the master key, built on first use and reused by every secret operation
+        - Built lazily, so a key of the wrong length fails inside the operation that uses it
+          (and is reported through whoops), not when it is assigned
+        """
+        if self._master_key_handle is None and self._master_key is not None:
+            self._master_key_handle = KeyHandle(self._master_key)
+        return self._master_key_handle
+    
+    def _clear_plaintext_cache(self):
+        # Cached plaintexts are keyed by ciphertext only, so they belong to the key that produced them
+        cache = getattr(self, 'plaintext_cache', None)
+        if cache is not None:
+            cache.clear()
+    
+    @property
+    def is_unlocked(self) -> bool:
+        """True if secrets can be encrypted/decrypted (local master key or attached agent)"""
+        return self.master_key is not None or self.agent is not None
+    
+    def attach_agent(self, agent):
+        """
+        Use a running unlock agent (pm_agent.AgentClient) for secret operations
+        - The master key stays inside the agent; a local master key takes precedence
+        """
+        self.agent = agent
+        self._clear_plaintext_cache()
+    
+    def _decrypt_payload(self, ciphertext: str) -> bytes:
+        """Decrypted plaintext as stored, still compressed if it was written compressed"""
+        if self.master_key is None and self.agent is not None:
+            return self.agent.decrypt(ciphertext)
+        return ez_subtle_decrypt(ciphertext, self.master_key_handle)
+    
+    def _decrypt_secret_bytes(self, ciphertext: str) -> bytes:
+        return decompress_payload(self._decrypt_payload(ciphertext))
+    
+    def _prepare_plaintext(self, plaintext: Union[str, bytes]) -> Union[str, bytes]:
+        return compress_payload(plaintext) if self.compress_secrets else plaintext
     
     def whoops(self, msg: str, err: Optional[Exception] = None):
         """Error handling function (equivalent to whoops in JS)"""
+        self._count("errors_total")
         print(f"ERROR: {msg}")
         if err:
             raise err
     
+    def _count(self, name: str):
+        """Increments a counter if metrics are enabled (see pm_metrics.enable_metrics)"""
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.inc(name)
+    
+    @property
+    def storage(self) -> JsonFileStorage:
+        """Shared in-memory view of storage_file"""
+        return JsonFileStorage.for_path(self.storage_file)
+    
+    def _check_storage(self, storage: JsonFileStorage):
+        """Reports a storage file that could not be parsed (it reads as empty until it is rewritten)"""
+        if storage.load_error is not None:
+            self.whoops(f"Failed to load storage: {storage.load_error}")
+    
     def _load_storage(self) -> dict:
         """Load persistent storage (replaces cookies/localStorage)"""
         try:
-            if os.path.exists(self.storage_file):
-                with open(self.storage_file, 'r') as f:
-                    return json.load(f)
+            storage = self.storage
+            data = storage.snapshot()
+            self._check_storage(storage)
+            return data
         except Exception as e:
             self.whoops(f"Failed to load storage: {e}")
         return {}
@@ -47,21 +175,32 @@ class PasswordManagerEngine:
     def _save_storage(self, data: dict):
         """Save persistent storage (replaces cookies/localStorage)"""
         try:
-            with open(self.storage_file, 'w') as f:
-                json.dump(data, f)
+            storage = self.storage
+            with storage.batch():
+                for name in storage.snapshot().keys() - data.keys():
+                    storage.delete(name)
+                for name, value in data.items():
+                    storage.set(name, value)
         except Exception as e:
             self.whoops(f"Failed to save storage: {e}")
     
     def _get_cookie(self, name: str) -> Optional[str]:
         """Get value from storage (replaces getCookie in JS)"""
-        storage = self._load_storage()
-        return storage.get(name)
+        try:
+            storage = self.storage
+            value = storage.get(name)
+            self._check_storage(storage)
+            return value
+        except Exception as e:
+            self.whoops(f"Failed to load storage: {e}")
+        return None
     
     def _set_cookie(self, name: str, value: str, expiration_days: float):
         """Set value in storage (replaces setCookie in JS)"""
-        storage = self._load_storage()
-        storage[name] = value
-        self._save_storage(storage)
+        try:
+            self.storage.set(name, value)
+        except Exception as e:
+            self.whoops(f"Failed to save storage: {e}")
     
     def fresh_start(self, passphrase: str, gtauk: str) -> str:
         """
@@ -108,7 +247,7 @@ class PasswordManagerEngine:
             raw_key_arr = generate_and_export_key(self.master_key)
             
             # Encrypt with GTAUK
-            raw_key_str = ez_subtle_encrypt(raw_key_arr, self.google_temp_active_user_key)
+            raw_key_str = ez_subtle_encrypt(raw_key_arr, self.keyring.get(self.google_temp_active_user_key))
             
             # Store it
             self._set_cookie(self.master_key_local_storage_tag, raw_key_str, self.master_key_expiration)
@@ -124,7 +263,17 @@ class PasswordManagerEngine:
         - Checks storage for stored master key
         - Attempts to decrypt with GTAUK
         - Falls back to passphrase decryption if needed
+        - Records unlock_seconds, gtauk_unlocks_total and gtauk_fallbacks_total metrics
         """
+        start = time.perf_counter()
+        try:
+            return self._recover_master_key(passphrase)
+        finally:
+            metrics = get_metrics()
+            if metrics is not None:
+                metrics.observe("unlock_seconds", time.perf_counter() - start)
+    
+    def _recover_master_key(self, passphrase: Optional[str] = None) -> bool:
         try:
             # Try to get stored master key
             master_key_from_storage = self._get_cookie(self.master_key_local_storage_tag)
@@ -132,25 +281,29 @@ class PasswordManagerEngine:
             if master_key_from_storage:
                 # Attempt decrypt using GTAUK
                 try:
-                    mk_raw = ez_subtle_decrypt(master_key_from_storage, self.google_temp_active_user_key)
+                    mk_raw = ez_subtle_decrypt(master_key_from_storage, self.keyring.get(self.google_temp_active_user_key))
                     
                     # Convert to key bytes
                     mk = import_raw_key(mk_raw)
                     
                     # Save master key
                     self.master_key = mk
+                    self._count("gtauk_unlocks_total")
                     return True
                     
                 except Exception as err:
                     self.whoops(f"Failed to decrypt stored key: {err}")
                     # Fall back to passphrase decryption
+                    self._count("gtauk_fallbacks_total")
                     return self._decrypt_and_store_master_key(passphrase)
             else:
                 # No stored key, use passphrase
+                self._count("gtauk_fallbacks_total")
                 return self._decrypt_and_store_master_key(passphrase)
                 
         except Exception as err:
             self.whoops(f"recoverMasterKeyFromLocalStorage: {err}")
+            self._count("gtauk_fallbacks_total")
             return self._decrypt_and_store_master_key(passphrase)
     
     def _decrypt_and_store_master_key(self, passphrase: Optional[str] = None) -> bool:
@@ -212,12 +365,12 @@ class PasswordManagerEngine:
         Decrypt secret with master key (equivalent to decryptSecretWithMasterKey in JS)
         - Returns decrypted secret as bytes or readable string
         """
-        if self.master_key is None:
+        if not self.is_unlocked:
             self.whoops("Cannot decrypt! Get master key first.")
             return b"" if not readable else ""
         
         try:
-            plaintext = ez_subtle_decrypt(ciphertext, self.master_key)
+            plaintext = self._decrypt_secret_bytes(ciphertext)
             
             if readable:
                 return plaintext.decode('utf-8')
@@ -233,18 +386,243 @@ class PasswordManagerEngine:
         Encrypt secret with master key (equivalent to encryptSecretWithMasterKey in JS)
         - Returns encrypted secret in "ez" format
         """
-        if self.master_key is None:
+        if not self.is_unlocked:
             self.whoops("Cannot encrypt! Get master key first.")
             return ""
         
         try:
-            ciphertext = ez_subtle_encrypt(plaintext, self.master_key)
+            plaintext = self._prepare_plaintext(plaintext)
+            if self.master_key is None:
+                return self.agent.encrypt(plaintext, compact=self.compact_ciphertext)
+            ciphertext = ez_subtle_encrypt(plaintext, self.master_key_handle, compact=self.compact_ciphertext)
             return ciphertext
             
         except Exception as err:
             self.whoops(f"encryptSecretWithMasterKey: {err}")
             return ""
     
+    def encrypt_many(self, plaintexts: Iterable[Union[str, bytes]], workers: Optional[int] = None,
+                     mode: str = 'thread', chunk_size: int = 1000) -> List[str]:
+        """
+        Encrypt many secrets with the master key in one batch (see pm_crypto.encrypt_many)
+        - Returns ciphertexts in input order, or [] on error
+        - mode='process' (or 'auto' on a large batch) encrypts chunks of chunk_size
+          on a process pool; each worker receives the master key once
+        - Values are compressed first if compress_secrets is set
+        """
+        if not self.is_unlocked:
+            self.whoops("Cannot encrypt! Get master key first.")
+            return []
+        
+        try:
+            plaintexts = [self._prepare_plaintext(p) for p in plaintexts]
+            if self.master_key is None:
+                return self.agent.encrypt_many(plaintexts, compact=self.compact_ciphertext)
+            if resolve_mode(mode, len(plaintexts)) == 'process':
+                tasks = [(chunk, self.compact_ciphertext) for chunk in chunked(plaintexts, chunk_size)]
+                results = ordered_map(encrypt_many_in_worker, tasks, workers, mode='process',
+                                      initializer=init_worker_keys, initargs=(self.master_key,),
+                                      finalizer=clear_worker_keys)
+                return [ciphertext for chunk in results for ciphertext in chunk]
+            return encrypt_many(plaintexts, self.master_key_handle, compact=self.compact_ciphertext)
+            
+        except Exception as err:
+            self.whoops(f"encryptMany: {err}")
+            return []
+    
+    def _decrypt_cell(self, ciphertext: str, use_cache: bool = False) -> str:
+        """Decrypt a single vault cell for display (same placeholders as read-csv-passwords)"""
+        if not ciphertext.strip():
+            return ""
+        
+        cache = self.plaintext_cache if use_cache else None
+        plaintext = cache.get(ciphertext) if cache is not None else None
+        if plaintext is None:
+            try:
+                plaintext = self._decrypt_secret_bytes(ciphertext)
+            except Exception as err:
+                return _display_text(err)
+            if cache is not None:
+                cache.put(ciphertext, plaintext)
+        
+        return _display_text(plaintext)
+    
+    def lazy_row(self, row: List[str], headers: List[str],
+                 positions: Optional[Dict[str, int]] = None) -> LazyVaultRow:
+        """
+        Wrap a vault row so each encrypted column is decrypted only when it is read
+        - Decrypted values go through plaintext_cache, so repeat views cost no crypto
+        - positions (from pm_vault.column_positions) can be shared across rows
+        """
+        return LazyVaultRow(row, headers, lambda ciphertext: self._decrypt_cell(ciphertext, use_cache=True),
+                            positions)
+    
+    def decrypt_vault(self, rows: Iterable[List[str]], headers: List[str],
+                      workers: Optional[int] = None, mode: str = 'thread',
+                      chunk_size: int = 500) -> Iterator[List[str]]:
+        """
+        Decrypt every encrypted column of a CSV vault export
+        - Index and Site columns are passed through as plain text
+        - Rows are decrypted on a thread pool and yielded in their original order
+        - mode='process' (or 'auto' on a large list of rows) sends the ciphertexts of
+          chunk_size rows at a time to a process pool; each worker receives the
+          master key once, through the pool initializer
+        - With an attached agent (and no local key), rows go to the agent in pipelined batches
+        - rows may be a Vault (see load_vault); its rows come back as plain lists
+        """
+        if not self.is_unlocked:
+            self.whoops("Cannot decrypt! Get master key first.")
+            return
+        
+        if self.master_key is None:
+            yield from self.agent.decrypt_rows((list(row) for row in rows), headers)
+            return
+        
+        encrypted_columns = [is_encrypted_column(header) for header in headers]
+        
+        cells = len(rows) * sum(encrypted_columns) if hasattr(rows, '__len__') else None
+        if resolve_mode(mode, cells) == 'process':
+            yield from self._decrypt_vault_in_processes(rows, encrypted_columns, workers, chunk_size)
+            return
+        
+        def decrypt_row(row: List[str]) -> List[str]:
+            return [
+                self._decrypt_cell(value) if i < len(encrypted_columns) and encrypted_columns[i] else value
+                for i, value in enumerate(row)
+            ]
+        
+        yield from ordered_map(decrypt_row, rows, workers)
+    
+    def decrypt_cells(self, ciphertexts: List[str], workers: Optional[int] = None,
+                      chunk_size: int = 500) -> List[Union[str, Exception]]:
+        """
+        Decrypt ciphertexts to text, with failures returned in place as exceptions
+        - Unlike decrypt_vault, no placeholder text stands in for a failure, so callers
+          that hand values on (like the get command) can report them
+        - Chunks go to the agent or to decrypt_many on the ordered_map thread pool
+        """
+        if not self.is_unlocked:
+            self.whoops("Cannot decrypt! Get master key first.")
+            return []
+        
+        def decrypt_chunk(chunk: List[str]) -> List[Union[str, Exception]]:
+            if self.master_key is None:
+                payloads = self.agent.decrypt_many(chunk)
+            else:
+                payloads = decrypt_many(chunk, self.master_key_handle)
+            return [_cell_text(payload) for payload in payloads]
+        
+        return [text for texts in ordered_map(decrypt_chunk, chunked(ciphertexts, chunk_size), workers)
+                for text in texts]
+    
+    def _decrypt_vault_in_processes(self, rows: Iterable[List[str]], encrypted_columns: List[bool],
+                                    workers: Optional[int], chunk_size: int) -> Iterator[List[str]]:
+        """Process pool side of decrypt_vault: only the non-empty ciphertexts are sent to workers"""
+        def encrypted(row: List[str]) -> Iterator[int]:
+            return (i for i in range(min(len(row), len(encrypted_columns))) if encrypted_columns[i])
+        
+        # Row chunks wait here until their decrypted cells come back, in the same order
+        pending = deque()
+        
+        def ciphertext_chunks() -> Iterator[List[str]]:
+            for chunk in chunked(rows, chunk_size):
+                pending.append(chunk)
+                yield [row[i] for row in chunk for i in encrypted(row) if row[i].strip()]
+        
+        def display(payload: Union[bytes, Exception]) -> str:
+            try:
+                return _display_text(payload if isinstance(payload, Exception) else decompress_payload(payload))
+            except ValueError as err:
+                return _display_text(err)
+        
+        results = ordered_map(decrypt_many_in_worker, ciphertext_chunks(), workers, mode='process',
+                              initializer=init_worker_keys, initargs=(self.master_key,),
+                              finalizer=clear_worker_keys)
+        for payloads in results:
+            payloads = iter(payloads)
+            for row in pending.popleft():
+                decrypted = list(row)
+                for i in encrypted(row):
+                    decrypted[i] = display(next(payloads)) if row[i].strip() else ""
+                yield decrypted
+    
+    def unlock_vault(self, vault, passphrase: str) -> bool:
+        """
+        Decrypt a vault's master key with the passphrase
+        - vault is any backend with an encrypted_master_key (e.g. SqliteVault)
+        """
+        try:
+            self.master_key_passcode_encrypted = vault.encrypted_master_key
+            self.master_key = import_raw_key(ez_subtle_decrypt(vault.encrypted_master_key, passphrase))
+            return True
+        except Exception as err:
+            self.whoops(f"unlockVault: {err}")
+            return False
+    
+    def read_vault_entry(self, vault, index: str) -> Optional[Dict[str, str]]:
+        """Look up a row by Index and return it decrypted as {header: value}"""
+        row = vault.get_by_index(index)
+        if row is None:
+            return None
+        return dict(zip(vault.headers, next(self.decrypt_vault([row], vault.headers, workers=1))))
+    
+    def find_vault_entries(self, vault, site: str) -> List[Dict[str, str]]:
+        """Look up rows by Site and return them decrypted as {header: value}"""
+        rows = vault.find_by_site(site)
+        return [dict(zip(vault.headers, row)) for row in self.decrypt_vault(rows, vault.headers, workers=1)]
+    
+    def write_vault_entry(self, vault, entry: Dict[str, str]) -> bool:
+        """
+        Encrypt an entry and store it in the vault
+        - entry maps header names to plain text values; missing columns are left empty
+        - The row with the same Index is replaced, otherwise the row is appended
+        - Returns False and leaves the vault unchanged if any value fails to encrypt
+        """
+        if not self.is_unlocked:
+            self.whoops("Cannot encrypt! Get master key first.")
+            return False
+        
+        values = {name.strip().lower(): value for name, value in entry.items()}
+        row = []
+        for header in vault.headers:
+            value = values.get(header.strip().lower(), "")
+            if value and is_encrypted_column(header):
+                value = self.encrypt_secret_with_master_key(value)
+                if not value:
+                    return False
+            row.append(str(value))
+        
+        vault.put_row(row)
+        return True
+    
+    def load_vault(self, csv_file: str) -> Vault:
+        """
+        Load a CSV export into a columnar Vault and build the site index from it
+        - vault[i] is a VaultRow; pass it to lazy_row to decrypt its columns on demand
+        - unlock_vault(vault, passphrase) unlocks its master key
+        """
+        self.vault = Vault.from_csv(csv_file)
+        self.build_site_index(self.vault.sites)
+        return self.vault
+    
+    def build_site_index(self, sites: Iterable[str]) -> SiteSearchIndex:
+        """
+        Build the site search index once after loading a vault
+        - sites are the plain text Site values in data row order
+        """
+        self.site_index = SiteSearchIndex(sites)
+        return self.site_index
+    
+    def search_sites(self, term: str, limit: Optional[int] = None, fuzzy: bool = True) -> List[SiteMatch]:
+        """
+        Search the site index (prefix, substring and fuzzy matches, best first)
+        - Each match carries the 0-based data row position of the site
+        """
+        if self.site_index is None:
+            self.whoops("No site index! Call build_site_index first.")
+            return []
+        return self.site_index.search(term, limit=limit, fuzzy=fuzzy)
+    
     def fake_vals(self):
         """Test function with fake values (equivalent to fakeVals in JS)"""
         self.google_temp_active_user_key = "mxlplx"
@@ -0,0 +1,237 @@
+"""
+Bulk import from other password managers for Python Password Manager Engine
+Maps CSV exports onto the Index, Site, Username, Password, AdditionalInfo
+layout that Code.gs stores, and encrypts them with the master key
+
+The source is streamed in batches: each batch is mapped, its values are
+encrypted with encrypt_many on a thread or process pool, and the rows are
+written out in order. Memory use is bounded by the batches in flight, not
+by the size of the export.
+"""
+
+import csv
+import os
+from collections import deque
+from typing import Callable, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from pm_crypto import (clear_worker_keys, compress_payload, encrypt_many, encrypt_many_in_worker,
+                       init_worker_keys)
+from pm_parallel import chunked, ordered_map, resolve_mode
+from pm_vault import CsvVaultReader, column_positions
+
+VAULT_HEADERS = ["Index", "Site", "Username", "Password", "AdditionalInfo"]
+MASTER_KEY_NOTE = "Master key"
+
+
+class ImportLayout(NamedTuple):
+    """
+    How one export format maps onto the vault columns
+    - Each field lists candidate source columns (lower-case); the first non-empty one wins
+    - extras are appended to AdditionalInfo as "Header: value" lines
+    - signatures: the layout is detected if all columns of any one set are present
+    """
+    name: str
+    site: Tuple[str, ...]
+    username: Tuple[str, ...]
+    password: Tuple[str, ...]
+    notes: Tuple[str, ...]
+    extras: Tuple[str, ...]
+    signatures: Tuple[FrozenSet[str], ...]
+
+
+# Checked in this order, so the more specific layouts come first
+LAYOUTS: Dict[str, ImportLayout] = {
+    layout.name: layout for layout in (
+        ImportLayout(
+            "bitwarden",
+            site=("name", "login_uri"), username=("login_username",), password=("login_password",),
+            notes=("notes",), extras=("login_uri", "login_totp", "folder", "fields"),
+            signatures=(frozenset({"login_uri", "login_username", "login_password"}),)),
+        ImportLayout(
+            "lastpass",
+            site=("name", "url"), username=("username",), password=("password",),
+            notes=("extra",), extras=("url", "totp", "grouping"),
+            signatures=(frozenset({"url", "username", "password", "extra", "grouping"}),)),
+        ImportLayout(
+            "keepass",
+            site=("title", "account", "url", "web site"), username=("username", "login name", "user name"),
+            password=("password",), notes=("notes", "comments"), extras=("url", "web site", "totp", "group"),
+            signatures=(frozenset({"title", "username", "password", "url"}),
+                        frozenset({"account", "login name", "password", "web site"}))),
+        ImportLayout(
+            "chrome",
+            site=("name", "url"), username=("username",), password=("password",),
+            notes=("note",), extras=("url",),
+            signatures=(frozenset({"name", "url", "username", "password"}),)),
+        ImportLayout(
+            "generic",
+            site=("site", "name", "title", "website", "url"),
+            username=("username", "user", "login", "email", "user name", "login name"),
+            password=("password", "pass"), notes=("additionalinfo", "notes", "note", "extra", "comments"),
+            extras=("url",),
+            signatures=(frozenset({"password"}), frozenset({"pass"}))),
+    )
+}
+
+
+def detect_layout(headers: List[str]) -> ImportLayout:
+    """Returns the first layout whose signature columns are all in headers"""
+    names = set(column_positions(headers))
+    for layout in LAYOUTS.values():
+        if any(signature <= names for signature in layout.signatures):
+            return layout
+    raise ValueError(f"Unrecognized export layout (columns: {', '.join(headers)}); "
+                     f"expected one of {', '.join(LAYOUTS)} or a Password column")
+
+
+def _host(url: str) -> str:
+    """Host name of a URL, or the value itself if it has none"""
+    host = urlsplit(url if "://" in url else "//" + url).hostname
+    return host or url
+
+
+class RowMapper:
+    """Maps source rows onto the vault's Site, Username, Password and AdditionalInfo"""
+
+    def __init__(self, layout: ImportLayout, headers: List[str]):
+        self.layout = layout
+        self.headers = headers
+        positions = column_positions(headers)
+
+        def present(names: Tuple[str, ...]) -> List[Tuple[str, int]]:
+            return [(name, positions[name]) for name in names if name in positions]
+
+        self._site = present(layout.site)
+        self._username = present(layout.username)
+        self._password = present(layout.password)
+        self._notes = present(layout.notes)
+        self._extras = present(layout.extras)
+
+    @staticmethod
+    def _first(row: List[str], columns: List[Tuple[str, int]]) -> Tuple[Optional[str], str]:
+        for name, i in columns:
+            if i < len(row) and row[i].strip():
+                return name, row[i].strip()
+        return None, ""
+
+    def map(self, row: List[str]) -> Optional[Tuple[str, str, str, str]]:
+        """(Site, Username, Password, AdditionalInfo), or None for an empty row"""
+        site_column, site = self._first(row, self._site)
+        if site_column in ("url", "login_uri", "web site"):
+            site = _host(site)
+        _, username = self._first(row, self._username)
+        _, password = self._first(row, self._password)
+        _, notes = self._first(row, self._notes)
+
+        info = [notes] if notes else []
+        for name, i in self._extras:
+            # The URL is only repeated when it was not used for Site
+            if i < len(row) and row[i].strip() and name != site_column:
+                info.append(f"{self.headers[i].strip()}: {row[i].strip()}")
+
+        if not (site or username or password or info):
+            return None
+        return site, username, password, "\n".join(info)
+
+
+def _count_lines(path: str) -> int:
+    with open(path, 'rb') as file:
+        return sum(block.count(b'\n') for block in iter(lambda: file.read(1 << 20), b''))
+
+
+def _encrypted_values(mapped: List[Tuple[str, str, str, str]]) -> List[str]:
+    """The non-empty Username, Password and AdditionalInfo values of a batch, in row order"""
+    return [value for entry in mapped for value in entry[1:] if value]
+
+
+def import_passwords(engine, source_csv: str, output_csv: str, encrypted_master_key: str,
+                     layout: str = 'auto', existing_csv: Optional[str] = None, start_index: Optional[int] = None,
+                     batch_size: int = 1000, workers: Optional[int] = None, mode: str = 'thread',
+                     progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Writes an upload-ready CSV export of source_csv encrypted with the engine's master key
+    - engine must be unlocked (directly or through an agent) with the key that
+      encrypted_master_key wraps; it is stored in row 1 of the output
+    - layout is 'auto' (see detect_layout) or a name from LAYOUTS
+    - existing_csv rows are copied to the output first, and new entries are
+      numbered after its highest Index (or from start_index, default 1)
+    - mode='process' encrypts batches on a process pool that receives the key once;
+      'auto' counts the source lines first and picks by size (see pm_parallel.resolve_mode)
+    - Values are compressed first if engine.compress_secrets is set
+    - progress(entries_imported) is called after every batch
+    Returns the number of imported entries
+    """
+    if not engine.is_unlocked:
+        raise ValueError("Engine must be unlocked with the vault's master key")
+    inputs = [source_csv] + ([existing_csv] if existing_csv else [])
+    if os.path.abspath(output_csv) in map(os.path.abspath, inputs):
+        raise ValueError("Output file must be different from the input files")
+    compact = engine.compact_ciphertext
+    if mode == 'auto' and engine.master_key is not None:
+        # About three encrypted values per entry
+        mode = resolve_mode(mode, _count_lines(source_csv) * 3)
+
+    with open(source_csv, 'r', newline='', encoding='utf-8-sig') as source, \
+            open(output_csv, 'w', newline='', encoding='utf-8') as output:
+        reader = csv.reader(source)
+        headers = next(reader, None)
+        if headers is None:
+            raise ValueError(f"{source_csv} is empty")
+        mapper = RowMapper(detect_layout(headers) if layout == 'auto' else LAYOUTS[layout], headers)
+
+        writer = csv.writer(output)
+        writer.writerow([MASTER_KEY_NOTE, encrypted_master_key])
+        writer.writerow(VAULT_HEADERS)
+
+        next_index = start_index if start_index is not None else 1
+        if existing_csv is not None:
+            next_index = max(next_index, _copy_existing(existing_csv, writer) + 1)
+
+        # Mapped batches wait here until their ciphertexts come back, in the same order
+        pending = deque()
+
+        def batches() -> Iterator[List[str]]:
+            for chunk in chunked(reader, batch_size):
+                mapped = [entry for entry in map(mapper.map, chunk) if entry is not None]
+                pending.append(mapped)
+                values = _encrypted_values(mapped)
+                yield [compress_payload(value) for value in values] if engine.compress_secrets else values
+
+        if engine.master_key is None:
+            results = ordered_map(lambda values: engine.agent.encrypt_many(values, compact=compact),
+                                  batches(), workers)
+        elif resolve_mode(mode) == 'process':
+            results = ordered_map(encrypt_many_in_worker, ((values, compact) for values in batches()),
+                                  workers, mode='process',
+                                  initializer=init_worker_keys, initargs=(engine.master_key,),
+                                  finalizer=clear_worker_keys)
+        else:
+            handle = engine.master_key_handle
+            results = ordered_map(lambda values: encrypt_many(values, handle, compact), batches(), workers)
+
+        imported = 0
+        for ciphertexts in results:
+            ciphertexts = iter(ciphertexts)
+            for site, *values in pending.popleft():
+                writer.writerow([str(next_index), site] + [next(ciphertexts) if value else "" for value in values])
+                next_index += 1
+                imported += 1
+            if progress is not None:
+                progress(imported)
+
+    return imported
+
+
+def _copy_existing(existing_csv: str, writer) -> int:
+    """Copies an export's rows in the vault column order; returns its highest numeric Index"""
+    highest = 0
+    with CsvVaultReader(existing_csv) as existing:
+        positions = column_positions(existing.headers)
+        columns = [positions.get(header.lower()) for header in VAULT_HEADERS]
+        for row in existing:
+            out = [row[i] if i is not None and i < len(row) else "" for i in columns]
+            writer.writerow(out)
+            if out[0].strip().isdigit():
+                highest = max(highest, int(out[0]))
+    return highest
@@ -0,0 +1,179 @@
+"""
+Metrics for Python Password Manager Engine
+Call counters and latency histograms for the KDF, encrypt/decrypt, storage and unlock paths
+
+Metrics are off by default. enable_metrics() installs a process-wide registry
+that pm_crypto, pm_storage and PasswordManagerEngine record into; read it with
+snapshot(), stream every observation to a callback sink, or write a Prometheus
+textfile for node_exporter's textfile collector.
+"""
+
+import bisect
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Latency bucket upper bounds in seconds (an implicit +Inf bucket follows)
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+COUNTER = 'counter'
+HISTOGRAM = 'histogram'
+
+# A sink is called as sink(kind, name, value) for every inc() and observe()
+Sink = Callable[[str, str, float], None]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """(upper bound, observations <= bound) pairs, ending with +Inf"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and histograms keyed by name
+    - Counter names end in _total, histogram names in _seconds
+    - Sinks are called outside the lock, so they may be slow or re-enter the registry
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters: Dict[str, float] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._sinks: List[Sink] = []
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink: Sink):
+        self._sinks.append(sink)
+
+    def remove_sink(self, sink: Sink):
+        self._sinks.remove(sink)
+
+    def _notify(self, kind: str, name: str, value: float):
+        for sink in self._sinks:
+            sink(kind, name, value)
+
+    def inc(self, name: str, amount: float = 1):
+        """Adds amount to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+        if self._sinks:
+            self._notify(COUNTER, name, amount)
+
+    def observe(self, name: str, seconds: float):
+        """Records one latency observation"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+        if self._sinks:
+            self._notify(HISTOGRAM, name, seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Observes how long the with-block took (also when it raises)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        """
+        Returns a copy of every metric
+        - {"counters": {name: value}, "histograms": {name: {"count", "sum", "buckets": [[le, cumulative], ...]}}}
+        """
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "histograms": {
+                    name: {"count": h.count, "sum": h.sum, "buckets": [list(pair) for pair in h.cumulative()]}
+                    for name, h in self._histograms.items()
+                },
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_prometheus(self, prefix: str = "pm_engine") -> str:
+        """Renders every metric in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            full_name = f"{prefix}_{name}"
+            lines.append(f"# TYPE {full_name} counter")
+            lines.append(f"{full_name} {value:g}")
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            full_name = f"{prefix}_{name}"
+            lines.append(f"# TYPE {full_name} histogram")
+            for bound, count in histogram["buckets"]:
+                le = "+Inf" if bound == float('inf') else f"{bound:g}"
+                lines.append(f'{full_name}_bucket{{le="{le}"}} {count}')
+            lines.append(f"{full_name}_sum {histogram['sum']:.9g}")
+            lines.append(f"{full_name}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_textfile(self, path: str, prefix: str = "pm_engine"):
+        """Writes to_prometheus() to path atomically (temp file + rename), as the textfile collector expects"""
+        directory = os.path.dirname(path) or '.'
+        fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', dir=directory)
+        try:
+            # mkstemp creates the file 0600; node_exporter often runs as another user
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, 'w') as f:
+                f.write(self.to_prometheus(prefix))
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+# Opt-in process-wide registry (see enable_metrics)
+_registry: Optional[MetricsRegistry] = None
+
+
+def enable_metrics(registry: Optional[MetricsRegistry] = None) -> MetricsRegistry:
+    """Starts recording metrics into registry (a new one if not given) and returns it"""
+    global _registry
+    _registry = registry if registry is not None else MetricsRegistry()
+    return _registry
+
+
+def disable_metrics():
+    """Stops recording metrics"""
+    global _registry
+    _registry = None
+
+
+def get_metrics() -> Optional[MetricsRegistry]:
+    """The active registry, or None while metrics are disabled"""
+    return _registry
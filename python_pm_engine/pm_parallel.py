@@ -0,0 +1,92 @@
+"""
+Parallel execution helpers for bulk vault work
+
+Work runs on a thread pool by default. AES-GCM releases the GIL but the
+base64/decimal codec around it does not, so very large jobs can use a process
+pool instead (mode='process'), or let the batch size decide (mode='auto').
+"""
+
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+MODES = ('thread', 'process', 'auto')
+
+# Below this many items, starting worker processes costs more than the GIL does
+PROCESS_MIN_ITEMS = 20000
+
+
+def default_workers(mode: str = 'thread') -> int:
+    """Default pool size: one process per CPU, or the concurrent.futures cap for threads"""
+    if mode == 'process':
+        return os.cpu_count() or 1
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Splits items into lists of `size` (the last one may be shorter)"""
+    items = iter(items)
+    return iter(lambda: list(itertools.islice(items, size)), [])
+
+
+def resolve_mode(mode: str, size: Optional[int] = None) -> str:
+    """
+    Returns 'thread' or 'process' for a job of `size` items
+    - 'auto' picks processes only for batches of at least PROCESS_MIN_ITEMS on a
+      multi-core host; an unknown size counts as small
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    if mode != 'auto':
+        return mode
+    if size is None or size < PROCESS_MIN_ITEMS or (os.cpu_count() or 1) < 2:
+        return 'thread'
+    return 'process'
+
+
+def ordered_map(func: Callable[[T], R], items: Iterable[T],
+                workers: Optional[int] = None, window: Optional[int] = None,
+                mode: str = 'thread', initializer: Optional[Callable[..., Any]] = None,
+                initargs: Sequence[Any] = (), finalizer: Optional[Callable[[], Any]] = None) -> Iterator[R]:
+    """
+    Maps func over items on a thread or process pool, yielding results in input order
+    - At most `window` tasks are in flight, so long iterables are streamed
+      instead of being submitted all at once
+    - workers <= 1 runs inline without a pool: initializer is still called once,
+      and finalizer() runs afterwards so that state does not outlive the map
+    - mode='process' needs a picklable, module-level func; initializer(*initargs)
+      runs once in each worker, so shared state (like a key) is not sent per task
+    - mode='auto' uses len(items) when items has one (see resolve_mode)
+    """
+    mode = resolve_mode(mode, len(items) if hasattr(items, '__len__') else None)
+    if workers is None:
+        workers = default_workers(mode)
+
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        try:
+            yield from map(func, items)
+        finally:
+            if finalizer is not None:
+                finalizer()
+        return
+
+    if window is None:
+        window = workers * 4
+
+    executor = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+    with executor(max_workers=workers, initializer=initializer, initargs=tuple(initargs)) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
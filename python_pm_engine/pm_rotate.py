@@ -0,0 +1,171 @@
+"""
+Master key rotation for Python Password Manager Engine
+Re-encrypts every encrypted cell of a CSV vault export under a new master key
+
+change_passphrase_on_master_key only re-wraps the existing key. Rotation
+replaces it: a new key is generated with generate_and_export_key, and each
+cell is decrypted with the old key and encrypted with the new one on a
+worker pool. Output is written incrementally, and progress is saved to a
+checkpoint file after each chunk, so an interrupted run resumes where it
+stopped instead of starting over.
+"""
+
+import csv
+import io
+import itertools
+import os
+from typing import Callable, List, Optional, Tuple
+
+from pm_crypto import (
+    clear_worker_keys,
+    ez_subtle_decrypt,
+    ez_subtle_encrypt,
+    generate_and_export_key,
+    import_raw_key,
+    init_worker_keys,
+    is_compact_ciphertext,
+    worker_key,
+    KeyHandle
+)
+from pm_parallel import chunked, ordered_map, resolve_mode
+from pm_storage import JsonFileStorage
+from pm_vault import CsvVaultReader, is_encrypted_column
+
+# Rows per process pool task
+PROCESS_TASK_ROWS = 200
+
+
+def default_checkpoint_path(output_file: str) -> str:
+    return output_file + ".checkpoint"
+
+
+def _source_stamp(path: str) -> List[int]:
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _rotate_row(numbered_row: Tuple[int, List[str]], headers: List[str], encrypted_columns: List[int],
+                decrypt: Callable[[str], bytes], new_handle: KeyHandle) -> List[str]:
+    row_number, row = numbered_row
+    rotated = list(row)
+    for i in encrypted_columns:
+        if i < len(row) and row[i].strip():
+            try:
+                plaintext = decrypt(row[i])
+            except ValueError as e:
+                raise ValueError(f"Row {row_number + 1}, column {headers[i]}: {e}")
+            rotated[i] = ez_subtle_encrypt(plaintext, new_handle, compact=is_compact_ciphertext(row[i]))
+    return rotated
+
+
+def _rotate_rows_in_worker(task: Tuple[List[str], List[int], List[Tuple[int, List[str]]]]) -> List[List[str]]:
+    """Process pool task; worker keys 0 and 1 are the old and new master keys (see init_worker_keys)"""
+    headers, encrypted_columns, numbered_rows = task
+    old_handle, new_handle = worker_key(0), worker_key(1)
+    return [_rotate_row(numbered_row, headers, encrypted_columns,
+                        lambda ciphertext: ez_subtle_decrypt(ciphertext, old_handle), new_handle)
+            for numbered_row in numbered_rows]
+
+
+def rotate_csv_vault(engine, csv_file: str, output_file: str, new_passphrase: str,
+                     checkpoint_file: Optional[str] = None, workers: Optional[int] = None,
+                     chunk_size: int = 1000,
+                     progress: Optional[Callable[[int], None]] = None,
+                     mode: str = 'thread') -> int:
+    """
+    Writes csv_file to output_file re-encrypted under a new master key; returns the row count
+    - engine must be unlocked with the current master key (directly or through an agent)
+    - The new key is stored in row 1 of the output, encrypted with new_passphrase
+    - Each cell keeps its envelope format (legacy or compact v2) and its payload,
+      compressed or not
+    - progress(rows_done) is called after every checkpointed chunk
+    - mode='process' re-encrypts on a process pool whose workers receive the old
+      and new keys once; 'auto' counts the rows first and picks by size. An
+      agent-unlocked engine always uses threads, since the key stays in the agent
+    - If checkpoint_file exists from an interrupted run of the same source,
+      rotation resumes from it; new_passphrase must be the one used originally
+    """
+    if os.path.abspath(csv_file) == os.path.abspath(output_file):
+        raise ValueError("Output file must be different from the source file")
+    if not engine.is_unlocked:
+        raise ValueError("Engine must be unlocked with the current master key")
+    checkpoint_file = checkpoint_file or default_checkpoint_path(output_file)
+
+    with CsvVaultReader(csv_file) as reader:
+        encrypted_columns = [i for i, header in enumerate(reader.headers) if is_encrypted_column(header)]
+        resuming = os.path.exists(checkpoint_file)
+        checkpoint = JsonFileStorage(checkpoint_file)
+
+        if resuming:
+            if checkpoint.get("source") != os.path.abspath(csv_file) or \
+                    checkpoint.get("source_stamp") != _source_stamp(csv_file):
+                raise ValueError(f"Checkpoint {checkpoint_file} is for a different or changed source file; "
+                                 f"delete it to start over")
+            encrypted_new_key = checkpoint.get("encrypted_new_key")
+            try:
+                new_key = import_raw_key(ez_subtle_decrypt(encrypted_new_key, new_passphrase))
+            except ValueError:
+                raise ValueError("New passphrase does not match the interrupted rotation")
+            rows_done = checkpoint.get("rows_done", 0)
+            # Drop anything written after the last checkpoint
+            raw_output = open(output_file, 'r+b')
+            raw_output.truncate(checkpoint.get("output_bytes"))
+            raw_output.seek(0, os.SEEK_END)
+        else:
+            new_key = generate_and_export_key()
+            encrypted_new_key = ez_subtle_encrypt(
+                new_key, new_passphrase, compact=is_compact_ciphertext(reader.encrypted_master_key))
+            rows_done = 0
+            raw_output = open(output_file, 'wb')
+
+        new_handle = KeyHandle(new_key)
+
+        if engine.master_key is None:
+            mode = 'thread'
+        elif mode == 'auto':
+            mode = resolve_mode(mode, (reader.scan() - rows_done) * len(encrypted_columns))
+
+        output = io.TextIOWrapper(raw_output, encoding='utf-8', newline='')
+        writer = csv.writer(output)
+
+        def save_checkpoint():
+            output.flush()
+            os.fsync(raw_output.fileno())
+            with checkpoint.batch():
+                checkpoint.set("source", os.path.abspath(csv_file))
+                checkpoint.set("source_stamp", _source_stamp(csv_file))
+                checkpoint.set("encrypted_new_key", encrypted_new_key)
+                checkpoint.set("rows_done", rows_done)
+                checkpoint.set("output_bytes", raw_output.tell())
+
+        with output:
+            if not resuming:
+                writer.writerows([[reader.master_key_note, encrypted_new_key], reader.headers])
+                save_checkpoint()
+
+            remaining = itertools.islice(enumerate(reader), rows_done, None)
+            if resolve_mode(mode) == 'process':
+                tasks = ((reader.headers, encrypted_columns, numbered_rows)
+                         for numbered_rows in chunked(remaining, PROCESS_TASK_ROWS))
+                rotated_rows = itertools.chain.from_iterable(ordered_map(
+                    _rotate_rows_in_worker, tasks, workers, mode='process',
+                    initializer=init_worker_keys, initargs=(engine.master_key, new_key),
+                    finalizer=clear_worker_keys))
+            else:
+                rotated_rows = ordered_map(
+                    lambda numbered_row: _rotate_row(numbered_row, reader.headers, encrypted_columns,
+                                                     engine._decrypt_payload, new_handle),
+                    remaining, workers)
+            while True:
+                chunk = list(itertools.islice(rotated_rows, chunk_size))
+                if not chunk:
+                    break
+                writer.writerows(chunk)
+                rows_done += len(chunk)
+                save_checkpoint()
+                if progress is not None:
+                    progress(rows_done)
+
+    os.remove(checkpoint_file)
+    return rows_done
+
@@ -0,0 +1,123 @@
+"""
+Site search for Python Password Manager Engine
+Builds an index over the plain text Site column once, so lookups do not scan every row
+"""
+
+import bisect
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from pm_vault import normalize_site
+
+# Match kinds, best first
+EXACT = 'exact'
+PREFIX = 'prefix'
+SUBSTRING = 'substring'
+FUZZY = 'fuzzy'
+_KIND_RANK = {EXACT: 0, PREFIX: 1, SUBSTRING: 2, FUZZY: 3}
+
+
+class SiteMatch(NamedTuple):
+    """One search hit; position is the 0-based data row the site came from"""
+    position: int
+    site: str
+    kind: str
+    score: float
+
+
+def _trigrams(text: str) -> Set[str]:
+    """Padded trigrams, so short strings and word starts still produce grams"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SiteSearchIndex:
+    """
+    Search index over Site values
+    - Sites are normalized once (stripped, lower-cased)
+    - A sorted key list answers prefix queries with bisect
+    - A trigram index narrows substring candidates and ranks fuzzy matches
+      by trigram similarity, so small typos still find the site
+    """
+
+    def __init__(self, sites: Iterable[str]):
+        self.sites: List[str] = []
+        self._normalized: List[str] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._gram_counts: List[int] = []
+
+        for position, site in enumerate(sites):
+            normalized = normalize_site(site)
+            self.sites.append(site)
+            self._normalized.append(normalized)
+            grams = _trigrams(normalized) if normalized else set()
+            self._gram_counts.append(len(grams))
+            for gram in grams:
+                self._postings[gram].append(position)
+
+        self._sorted = sorted((normalized, position) for position, normalized in enumerate(self._normalized)
+                              if normalized)
+
+    def __len__(self) -> int:
+        return len(self.sites)
+
+    def _prefix_positions(self, term: str) -> List[int]:
+        start = bisect.bisect_left(self._sorted, (term, -1))
+        positions = []
+        for normalized, position in self._sorted[start:]:
+            if not normalized.startswith(term):
+                break
+            positions.append(position)
+        return positions
+
+    def _substring_positions(self, term: str) -> List[int]:
+        if len(term) < 3:
+            # Too short for trigram filtering; the scan is a C-level `in` per site
+            return [p for p, normalized in enumerate(self._normalized) if term in normalized]
+
+        # Every trigram inside the term must occur in a matching site
+        inner = [term[i:i + 3] for i in range(len(term) - 2)]
+        postings = sorted((self._postings.get(gram, []) for gram in inner), key=len)
+        if not postings[0]:
+            return []
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return sorted(p for p in candidates if term in self._normalized[p])
+
+    def search(self, term: str, limit: Optional[int] = None, fuzzy: bool = True,
+               min_similarity: float = 0.3) -> List[SiteMatch]:
+        """
+        Returns matches ranked exact > prefix > substring > fuzzy
+        - Within a kind, higher trigram similarity ranks first, then file order
+        """
+        term = normalize_site(term)
+        if not term:
+            return []
+
+        term_grams = _trigrams(term)
+        shared = Counter()
+        for gram in term_grams:
+            for position in self._postings.get(gram, ()):
+                shared[position] += 1
+
+        def similarity(position: int) -> float:
+            common = shared.get(position, 0)
+            return common / (len(term_grams) + self._gram_counts[position] - common)
+
+        kinds: Dict[int, str] = {}
+        for position in self._substring_positions(term):
+            kinds[position] = SUBSTRING
+        for position in self._prefix_positions(term):
+            kinds[position] = EXACT if self._normalized[position] == term else PREFIX
+
+        if fuzzy:
+            for position in shared:
+                if position not in kinds and similarity(position) >= min_similarity:
+                    kinds[position] = FUZZY
+
+        matches = [SiteMatch(p, self.sites[p], kind, similarity(p)) for p, kind in kinds.items()]
+        matches.sort(key=lambda m: (_KIND_RANK[m.kind], -m.score, m.position))
+        return matches[:limit] if limit is not None else matches
@@ -0,0 +1,314 @@
+"""
+Sharded vault backend for Python Password Manager Engine
+Splits the MyPasswordData layout into hash-partitioned CSV shards plus a small
+JSON manifest, so opening a vault and looking up one entry never reads it all
+
+Layout of a vault directory:
+    manifest.json     encrypted master key, headers, partitioning and row counts
+    shard-0000.csv    data rows whose partition key hashes to shard 0
+    ...
+"""
+
+import csv
+import json
+import os
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+from pm_parallel import ordered_map
+from pm_vault import CsvVaultReader, column_positions, normalize_site
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_FORMAT = 1
+PARTITION_KEYS = ('index', 'site')
+
+
+def _shard_name(shard: int) -> str:
+    return f"shard-{shard:04d}.csv"
+
+
+def _atomic_write(path: str, write: Callable[[Any], None], newline: Optional[str] = None):
+    """Writes a file through write(file) with a temp file + rename"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', newline=newline, encoding='utf-8') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class ShardedVault:
+    """
+    Vault stored as hash-partitioned CSV shards in a directory
+    - Rows are assigned to a shard by a CRC32 of their Index or normalized Site
+      (partition_by), so a lookup on the partition key reads a single shard
+    - Opening only reads the manifest; shards are loaded on demand and at most
+      max_cached_shards are kept in memory
+    - Writes follow Code.gs saveAccount: replace the row with the same Index or append
+    - Same lookup interface as SqliteVault, so PasswordManagerEngine.read_vault_entry,
+      find_vault_entries and write_vault_entry work with either
+    """
+
+    def __init__(self, path: str, shard_count: int = 16, partition_by: str = 'index',
+                 max_cached_shards: int = 8):
+        if partition_by not in PARTITION_KEYS:
+            raise ValueError(f"partition_by must be one of {PARTITION_KEYS}")
+        self.path = path
+        self.max_cached_shards = max_cached_shards
+        self._cache: "OrderedDict[int, List[List[str]]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            # An existing vault keeps its own layout
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                self._manifest = json.load(f)
+        else:
+            self._manifest = {
+                "format": MANIFEST_FORMAT,
+                "master_key_note": "",
+                "encrypted_master_key": None,
+                "headers": [],
+                "partition_by": partition_by,
+                "shard_count": shard_count,
+                "row_counts": [0] * shard_count,
+            }
+        self._positions = column_positions(self.headers)
+
+    def close(self):
+        with self._lock:
+            self._cache.clear()
+
+    def __enter__(self) -> "ShardedVault":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def shard_count(self) -> int:
+        return self._manifest["shard_count"]
+
+    @property
+    def partition_by(self) -> str:
+        return self._manifest["partition_by"]
+
+    @property
+    def encrypted_master_key(self) -> Optional[str]:
+        """The passphrase-encrypted master key (row 1 of the CSV export)"""
+        return self._manifest["encrypted_master_key"]
+
+    @encrypted_master_key.setter
+    def encrypted_master_key(self, value: str):
+        with self._lock:
+            self._manifest["encrypted_master_key"] = value
+            self._save_manifest()
+
+    @property
+    def headers(self) -> List[str]:
+        """Column names (row 2 of the CSV export)"""
+        return self._manifest["headers"]
+
+    def _save_manifest(self):
+        os.makedirs(self.path, exist_ok=True)
+        _atomic_write(os.path.join(self.path, MANIFEST_NAME), lambda f: json.dump(self._manifest, f))
+
+    def _cell(self, row: List[str], column: str) -> Optional[str]:
+        position = self._positions.get(column)
+        return row[position] if position is not None and position < len(row) else None
+
+    def _keys(self, row: List[str]) -> Tuple[Optional[str], Optional[str]]:
+        """Returns the (Index, normalized Site) lookup keys for a row"""
+        idx = self._cell(row, 'index')
+        site = self._cell(row, 'site')
+        return (idx.strip() if idx is not None else None,
+                normalize_site(site) if site is not None else None)
+
+    def shard_for(self, key: str) -> int:
+        """Shard number for a partition key value (Index or Site, per partition_by)"""
+        key = key.strip() if self.partition_by == 'index' else normalize_site(key)
+        return zlib.crc32(key.encode('utf-8')) % self.shard_count
+
+    def _shard_of_row(self, row: List[str]) -> int:
+        idx, site = self._keys(row)
+        key = idx if self.partition_by == 'index' else site
+        return self.shard_for(key or "")
+
+    def _iter_shard_file(self, shard: int) -> Iterator[List[str]]:
+        try:
+            file = open(os.path.join(self.path, _shard_name(shard)), 'r', newline='', encoding='utf-8')
+        except FileNotFoundError:
+            return
+        with file:
+            yield from csv.reader(file)
+
+    def shard_rows(self, shard: int) -> List[List[str]]:
+        """Returns the rows of one shard, loading it if it is not cached"""
+        with self._lock:
+            rows = self._cache.get(shard)
+            if rows is not None:
+                self._cache.move_to_end(shard)
+                return rows
+            rows = list(self._iter_shard_file(shard))
+            self._cache[shard] = rows
+            while len(self._cache) > self.max_cached_shards:
+                self._cache.popitem(last=False)
+            return rows
+
+    def _write_shard(self, shard: int, rows: List[List[str]]):
+        _atomic_write(os.path.join(self.path, _shard_name(shard)),
+                      lambda f: csv.writer(f).writerows(rows), newline='')
+        self._cache[shard] = rows
+        self._cache.move_to_end(shard)
+        self._manifest["row_counts"][shard] = len(rows)
+        self._save_manifest()
+
+    def import_rows(self, encrypted_master_key: str, headers: List[str], rows, note: str = "") -> int:
+        """
+        Replaces the vault contents; rows are streamed straight into the shard files
+        - Memory use does not grow with the number of rows
+        """
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            self._cache.clear()
+            self._manifest.update({
+                "master_key_note": note,
+                "encrypted_master_key": encrypted_master_key,
+                "headers": list(headers),
+                "row_counts": [0] * self.shard_count,
+            })
+            self._positions = column_positions(self.headers)
+
+            counts = self._manifest["row_counts"]
+            files = []
+            try:
+                for shard in range(self.shard_count):
+                    fd, tmp_path = tempfile.mkstemp(prefix='.' + _shard_name(shard) + '.', dir=self.path)
+                    files.append((tmp_path, os.fdopen(fd, 'w', newline='', encoding='utf-8')))
+                writers = [csv.writer(file) for _, file in files]
+                for row in rows:
+                    shard = self._shard_of_row(row)
+                    writers[shard].writerow(row)
+                    counts[shard] += 1
+                for shard, (tmp_path, file) in enumerate(files):
+                    file.close()
+                    os.replace(tmp_path, os.path.join(self.path, _shard_name(shard)))
+            except BaseException:
+                for tmp_path, file in files:
+                    file.close()
+                    try:
+                        os.unlink(tmp_path)
+                    except OSError:
+                        pass
+                raise
+            self._save_manifest()
+            return sum(counts)
+
+    def import_csv(self, csv_file: str) -> int:
+        """Replaces the vault contents with a CSV export"""
+        with CsvVaultReader(csv_file) as reader:
+            return self.import_rows(reader.encrypted_master_key, reader.headers, reader, reader.master_key_note)
+
+    def export_csv(self, csv_file: str, note: Optional[str] = None):
+        """Writes the vault back out in the CSV export layout (rows grouped by shard)"""
+        with open(csv_file, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow([self._manifest["master_key_note"] if note is None else note,
+                             self.encrypted_master_key or ""])
+            writer.writerow(self.headers)
+            writer.writerows(self.rows())
+
+    def __len__(self) -> int:
+        return sum(self._manifest["row_counts"])
+
+    def rows(self) -> Iterator[List[str]]:
+        """Yields every row, shard by shard, without caching the shards"""
+        for shard in range(self.shard_count):
+            with self._lock:
+                cached = self._cache.get(shard)
+            yield from (cached if cached is not None else self._iter_shard_file(shard))
+
+    def map_shards(self, func: Callable[[int, List[List[str]]], Any],
+                   workers: Optional[int] = None) -> Iterator[Any]:
+        """
+        Calls func(shard, rows) for every shard on a thread pool; results come back in shard order
+        - Shards are read straight from disk, so the cache is not flooded by bulk jobs
+        """
+        def run(shard: int):
+            return func(shard, list(self._iter_shard_file(shard)))
+        return ordered_map(run, range(self.shard_count), workers)
+
+    def _candidate_shards(self, column: str, key: str) -> List[int]:
+        """The one shard that can hold key if the vault is partitioned on column, else all of them"""
+        if self.partition_by == column:
+            return [self.shard_for(key)]
+        return list(range(self.shard_count))
+
+    def _locate(self, index: str) -> Optional[Tuple[int, int]]:
+        """(shard, position in shard) of the first row with this Index"""
+        index = str(index).strip()
+        for shard in self._candidate_shards('index', index):
+            for position, row in enumerate(self.shard_rows(shard)):
+                idx, _ = self._keys(row)
+                if idx == index:
+                    return shard, position
+        return None
+
+    def get_by_index(self, index: str) -> Optional[List[str]]:
+        """Returns the first row with this Index value, or None"""
+        with self._lock:
+            location = self._locate(index)
+            return list(self.shard_rows(location[0])[location[1]]) if location else None
+
+    def find_by_site(self, site: str, prefix: bool = False) -> List[List[str]]:
+        """Returns rows whose Site matches (case-insensitive), or starts with site if prefix is True"""
+        key = normalize_site(site)
+        shards = list(range(self.shard_count)) if prefix else self._candidate_shards('site', key)
+        matches = []
+        with self._lock:
+            for shard in shards:
+                for row in self.shard_rows(shard):
+                    _, row_site = self._keys(row)
+                    if row_site is not None and (row_site.startswith(key) if prefix else row_site == key):
+                        matches.append(list(row))
+        return matches
+
+    def put_row(self, row: List[str]):
+        """Replaces the row with the same Index, or appends it (like saveAccount in Code.gs)"""
+        idx, _ = self._keys(row)
+        target = self._shard_of_row(row)
+        with self._lock:
+            location = self._locate(idx) if idx is not None else None
+            if location is not None and location[0] != target:
+                # Partitioned by Site and the Site changed: move the row
+                old_rows = list(self.shard_rows(location[0]))
+                del old_rows[location[1]]
+                self._write_shard(location[0], old_rows)
+                location = None
+
+            rows = list(self.shard_rows(target))
+            if location is not None:
+                rows[location[1]] = list(row)
+            else:
+                rows.append(list(row))
+            self._write_shard(target, rows)
+
+    def delete_by_index(self, index: str) -> bool:
+        """Deletes the row with this Index (like deleteAccount in Code.gs)"""
+        with self._lock:
+            location = self._locate(index)
+            if location is None:
+                return False
+            rows = list(self.shard_rows(location[0]))
+            del rows[location[1]]
+            self._write_shard(location[0], rows)
+            return True
@@ -0,0 +1,190 @@
+"""
+SQLite vault backend for Python Password Manager Engine
+Stores the MyPasswordData layout (master key, headers, encrypted rows) in a
+single sqlite3 database with indexes on the Index and Site columns
+"""
+
+import csv
+import json
+import sqlite3
+from typing import Iterable, Iterator, List, Optional
+
+from pm_vault import column_positions, normalize_site
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    position INTEGER PRIMARY KEY,
+    idx TEXT,
+    site_key TEXT,
+    cells TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_idx ON entries (idx);
+CREATE INDEX IF NOT EXISTS entries_site ON entries (site_key);
+"""
+
+
+class SqliteVault:
+    """
+    Vault stored in SQLite
+    - Rows keep their CSV order and are stored as JSON lists of cells in header order
+    - Lookups by Index and Site go through B-tree indexes instead of a full scan
+    - Writes follow Code.gs saveAccount: replace the row with the same Index or append
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+        self._headers: Optional[List[str]] = None
+        self._positions: Optional[dict] = None
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self) -> "SqliteVault":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get_meta(self, name: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: str):
+        self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    @property
+    def encrypted_master_key(self) -> Optional[str]:
+        """The passphrase-encrypted master key (row 1 of the CSV export)"""
+        return self._get_meta("encrypted_master_key")
+
+    @encrypted_master_key.setter
+    def encrypted_master_key(self, value: str):
+        with self._conn:
+            self._set_meta("encrypted_master_key", value)
+
+    @property
+    def headers(self) -> List[str]:
+        """Column names (row 2 of the CSV export)"""
+        if self._headers is None:
+            value = self._get_meta("headers")
+            self._headers = json.loads(value) if value else []
+        return self._headers
+
+    def _keys(self, row: List[str]):
+        """Returns the (Index, normalized Site) lookup keys for a row"""
+        if self._positions is None:
+            self._positions = column_positions(self.headers)
+        positions = self._positions
+        idx_col = positions.get('index')
+        site_col = positions.get('site')
+        idx = row[idx_col].strip() if idx_col is not None and idx_col < len(row) else None
+        site = normalize_site(row[site_col]) if site_col is not None and site_col < len(row) else None
+        return idx, site
+
+    def import_rows(self, encrypted_master_key: str, headers: List[str], rows: Iterable[List[str]]) -> int:
+        """Replaces the vault contents; rows are streamed into one transaction"""
+        with self._conn:
+            self._conn.execute("DELETE FROM entries")
+            self._set_meta("encrypted_master_key", encrypted_master_key)
+            self._set_meta("headers", json.dumps(headers))
+            self._headers = list(headers)
+            self._positions = None
+
+            count = 0
+
+            def records():
+                nonlocal count
+                for row in rows:
+                    count += 1
+                    idx, site = self._keys(row)
+                    yield idx, site, json.dumps(row)
+
+            self._conn.executemany("INSERT INTO entries (idx, site_key, cells) VALUES (?, ?, ?)", records())
+        return count
+
+    def import_csv(self, csv_file: str) -> int:
+        """
+        Replaces the vault contents with a CSV export
+        - Row 1: [Note/ignored, Encrypted master key]
+        - Row 2: Headers
+        - Row 3+: Encrypted data rows
+        """
+        with open(csv_file, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            master_row = next(reader, None)
+            headers = next(reader, None)
+            if master_row is None or headers is None or len(master_row) < 2:
+                raise ValueError("CSV file must start with a master key row and a header row")
+            return self.import_rows(master_row[1], headers, reader)
+
+    def export_csv(self, csv_file: str, note: str = ""):
+        """Writes the vault back out in the CSV export layout"""
+        with open(csv_file, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow([note, self.encrypted_master_key or ""])
+            writer.writerow(self.headers)
+            writer.writerows(self.rows())
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def rows(self) -> Iterator[List[str]]:
+        """Yields every row in CSV order"""
+        for (cells,) in self._conn.execute("SELECT cells FROM entries ORDER BY position"):
+            yield json.loads(cells)
+
+    def get_by_index(self, index: str) -> Optional[List[str]]:
+        """Returns the first row with this Index value, or None"""
+        row = self._conn.execute(
+            "SELECT cells FROM entries WHERE idx = ? ORDER BY position LIMIT 1", (str(index).strip(),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_by_site(self, site: str, prefix: bool = False) -> List[List[str]]:
+        """Returns rows whose Site matches (case-insensitive), or starts with site if prefix is True"""
+        key = normalize_site(site)
+        if prefix:
+            # Range scan so the site index is used (LIKE would not be)
+            cursor = self._conn.execute(
+                "SELECT cells FROM entries WHERE site_key >= ? AND site_key < ? ORDER BY position",
+                (key, key + '\U0010ffff')
+            )
+        else:
+            cursor = self._conn.execute(
+                "SELECT cells FROM entries WHERE site_key = ? ORDER BY position", (key,)
+            )
+        return [json.loads(cells) for (cells,) in cursor]
+
+    def put_row(self, row: List[str]):
+        """Replaces the row with the same Index, or appends it (like saveAccount in Code.gs)"""
+        idx, site = self._keys(row)
+        with self._conn:
+            existing = self._conn.execute(
+                "SELECT position FROM entries WHERE idx = ? ORDER BY position LIMIT 1", (idx,)
+            ).fetchone()
+            if existing:
+                self._conn.execute(
+                    "UPDATE entries SET idx = ?, site_key = ?, cells = ? WHERE position = ?",
+                    (idx, site, json.dumps(row), existing[0])
+                )
+            else:
+                self._conn.execute(
+                    "INSERT INTO entries (idx, site_key, cells) VALUES (?, ?, ?)",
+                    (idx, site, json.dumps(row))
+                )
+
+    def delete_by_index(self, index: str) -> bool:
+        """Deletes the row with this Index (like deleteAccount in Code.gs)"""
+        with self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM entries WHERE position = "
+                "(SELECT position FROM entries WHERE idx = ? ORDER BY position LIMIT 1)",
+                (str(index).strip(),)
+            )
+        return cursor.rowcount > 0
@@ -0,0 +1,178 @@
+"""
+Persistent storage for Python Password Manager Engine
+Replaces the cookies/localStorage used by PasswordManageEngine.js with a JSON file
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from pm_metrics import get_metrics
+
+# Marks a key deleted in the pending write set
+_DELETED = object()
+
+
+class JsonFileStorage:
+    """
+    In-memory, write-through view of a JSON storage file
+    - Parsed data is kept in memory and only re-read when the file's
+      mtime/size/inode change
+    - Writes inside batch() are committed together when the batch ends
+    - Commits re-read the file, apply the pending changes and replace the
+      file atomically with a temp file + rename, so readers never see a torn write
+    - A file that does not parse reads as empty (load_error says why) and is
+      replaced by the next commit; a failed commit drops its pending writes
+    """
+
+    _instances: Dict[str, "JsonFileStorage"] = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, path: str) -> "JsonFileStorage":
+        """Returns the shared storage object for path (one per file per process)"""
+        key = os.path.abspath(path)
+        with cls._instances_lock:
+            storage = cls._instances.get(key)
+            if storage is None:
+                storage = cls._instances[key] = cls(key)
+            return storage
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data: Dict[str, Any] = {}
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._loaded = False
+        self._pending: Dict[str, Any] = {}
+        self.load_error: Optional[Exception] = None
+        self._batch_depth = 0
+        self._lock = threading.RLock()
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _refresh(self):
+        """Re-reads the file if it changed since it was last loaded"""
+        stamp = self._file_stamp()
+        if self._loaded and stamp == self._stamp:
+            return
+
+        data = {}
+        self.load_error = None
+        if stamp is not None:
+            start = time.perf_counter()
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                if not isinstance(data, dict):
+                    raise ValueError("storage file does not hold a JSON object")
+            except ValueError as e:
+                # Empty or corrupt file: start over, the next commit replaces it
+                data = {}
+                self.load_error = e
+            metrics = get_metrics()
+            if metrics is not None:
+                metrics.observe("storage_load_seconds", time.perf_counter() - start)
+
+        # Keep uncommitted writes on top of what is on disk
+        for name, value in self._pending.items():
+            if value is _DELETED:
+                data.pop(name, None)
+            else:
+                data[name] = value
+
+        self._data = data
+        self._stamp = stamp
+        self._loaded = True
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Returns a stored value"""
+        with self._lock:
+            self._refresh()
+            return self._data.get(name, default)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Returns a copy of everything in storage"""
+        with self._lock:
+            self._refresh()
+            return dict(self._data)
+
+    def set(self, name: str, value: Any):
+        """Stores a value (committed immediately unless inside batch())"""
+        with self._lock:
+            self._refresh()
+            self._data[name] = value
+            self._pending[name] = value
+            if self._batch_depth == 0:
+                self.flush()
+
+    def delete(self, name: str):
+        """Removes a value (committed immediately unless inside batch())"""
+        with self._lock:
+            self._refresh()
+            self._data.pop(name, None)
+            self._pending[name] = _DELETED
+            if self._batch_depth == 0:
+                self.flush()
+
+    @contextmanager
+    def batch(self) -> Iterator["JsonFileStorage"]:
+        """Defers commits until the outermost batch ends"""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.flush()
+
+    def flush(self):
+        """Commits pending writes with an atomic temp-file rename"""
+        with self._lock:
+            if not self._pending:
+                return
+
+            # Pick up changes made by other processes before writing
+            self._refresh()
+
+            start = time.perf_counter()
+            try:
+                self._commit()
+            except BaseException:
+                # Drop the failed writes so they are not replayed; re-read the file next time
+                self._pending.clear()
+                self._loaded = False
+                raise
+
+            self._pending.clear()
+            self._stamp = self._file_stamp()
+            self.load_error = None
+
+            metrics = get_metrics()
+            if metrics is not None:
+                metrics.observe("storage_save_seconds", time.perf_counter() - start)
+
+    def _commit(self):
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(self.path) + '.', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
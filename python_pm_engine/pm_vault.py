@@ -0,0 +1,349 @@
+"""
+Vault helpers for Python Password Manager Engine
+Understands the CSV layout exported from the MyPasswordData sheet (see Code.gs)
+"""
+
+import csv
+import itertools
+import mmap
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+# Columns the Sheets UI stores as plain text; everything else is an ez ciphertext
+PLAIN_TEXT_COLUMNS = ('index', 'site')
+
+
+def is_encrypted_column(header: str) -> bool:
+    """Returns True if the column holds ciphertext rather than plain text"""
+    return header.strip().lower() not in PLAIN_TEXT_COLUMNS
+
+
+def column_positions(headers: List[str]) -> Dict[str, int]:
+    """Maps lower-cased header names to their column (first occurrence wins)"""
+    positions = {}
+    for i, header in enumerate(headers):
+        positions.setdefault(header.strip().lower(), i)
+    return positions
+
+
+def normalize_site(site: str) -> str:
+    """Normalized form of a Site value used for lookups"""
+    return site.strip().lower()
+
+
+class LazyVaultRow:
+    """
+    One vault row whose encrypted columns are decrypted on first access only
+    - row[header] looks the column up case-insensitively
+    - Plain text columns (Index, Site) are returned as stored
+    - decrypt turns a ciphertext cell into its display string
+    """
+    
+    __slots__ = ('cells', 'headers', '_positions', '_decrypt')
+    
+    def __init__(self, cells: List[str], headers: List[str], decrypt: Callable[[str], str],
+                 positions: Optional[Dict[str, int]] = None):
+        self.cells = cells
+        self.headers = headers
+        self._positions = positions if positions is not None else column_positions(headers)
+        self._decrypt = decrypt
+    
+    def raw(self, header: str) -> str:
+        """Returns the stored (possibly encrypted) cell"""
+        position = self._positions.get(header.strip().lower())
+        if position is None:
+            raise KeyError(header)
+        return self.cells[position] if position < len(self.cells) else ""
+    
+    def __getitem__(self, header: str) -> str:
+        value = self.raw(header)
+        if value.strip() and is_encrypted_column(header):
+            return self._decrypt(value)
+        return value
+    
+    def __contains__(self, header: str) -> bool:
+        return header.strip().lower() in self._positions
+
+
+def read_csv_vault(csv_file: str) -> Tuple[str, List[str], List[List[str]]]:
+    """
+    Reads a CSV vault export
+    - Row 1: [Note/ignored, Encrypted master key]
+    - Row 2: Headers (column names)
+    - Row 3+: Encrypted data rows
+    Returns: (encrypted_master_key, headers, data_rows)
+    """
+    with open(csv_file, 'r', newline='', encoding='utf-8') as file:
+        rows = list(csv.reader(file))
+
+    if len(rows) < 2 or len(rows[0]) < 2:
+        raise ValueError("CSV file must start with a master key row and a header row")
+
+    return rows[0][1], rows[1], rows[2:]
+
+
+class CsvVaultReader:
+    """
+    Streaming reader for a CSV vault export
+    - The master key row and header row are parsed on open; data rows are
+      parsed lazily as they are iterated, so the file is never held in memory
+    - The byte offset of every data row seen is kept, so a row can be
+      re-read later by seeking instead of keeping it around
+    - use_mmap maps the file instead of using buffered reads
+    """
+    
+    def __init__(self, csv_file: str, use_mmap: bool = False):
+        self.csv_file = csv_file
+        self._file = open(csv_file, 'rb')
+        self._mmap: Optional[mmap.mmap] = None
+        self._source = self._file
+        try:
+            if use_mmap and self._file.seek(0, 2) > 0:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._source = self._mmap
+            self._source.seek(0)
+            
+            reader = csv.reader(self._lines())
+            master_row = next(reader, None)
+            headers = next(reader, None)
+            if master_row is None or headers is None or len(master_row) < 2:
+                raise ValueError("CSV file must start with a master key row and a header row")
+        except BaseException:
+            self.close()
+            raise
+        
+        self.master_key_note = master_row[0]
+        self.encrypted_master_key = master_row[1]
+        self.headers = headers
+        # Byte offsets of data rows, filled in as rows are read
+        self.offsets = array('q')
+        self._data_start = self._source.tell()
+    
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+    
+    def __enter__(self) -> "CsvVaultReader":
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _lines(self) -> Iterator[str]:
+        # csv.reader pulls exactly the lines of one record at a time, so
+        # tell() between records is the start of the next record
+        readline = self._source.readline
+        while True:
+            line = readline()
+            if not line:
+                return
+            yield line.decode('utf-8')
+    
+    def __iter__(self) -> Iterator[List[str]]:
+        """Yields data rows in file order, recording their offsets"""
+        source = self._source
+        position = self._data_start
+        row_number = 0
+        while True:
+            # read_row() may have moved the file position since the last row
+            source.seek(position)
+            row = next(csv.reader(self._lines()), None)
+            if row is None:
+                return
+            if row_number == len(self.offsets):
+                self.offsets.append(position)
+            position = source.tell()
+            row_number += 1
+            yield row
+    
+    def scan(self) -> int:
+        """Reads through the whole file to index every row; returns the row count"""
+        for _ in self:
+            pass
+        return len(self.offsets)
+    
+    def read_row(self, row_number: int) -> List[str]:
+        """Re-reads data row row_number (0-based) by seeking to its recorded offset"""
+        if not 0 <= row_number < len(self.offsets):
+            raise IndexError(f"Row {row_number} has not been read yet")
+        self._source.seek(self.offsets[row_number])
+        return next(csv.reader(self._lines()))
+
+
+class VaultRow:
+    """
+    One row of a Vault, read in place from the vault's columns
+    - row[header] looks the column up case-insensitively; row[i] reads column i
+    - len() and iteration cover the stored cells, so a VaultRow can be passed
+      wherever a list row is expected (decrypt_vault, lazy_row)
+    """
+    
+    __slots__ = ('vault', 'position')
+    
+    def __init__(self, vault: "Vault", position: int):
+        self.vault = vault
+        self.position = position
+    
+    def __getitem__(self, key: Union[int, str]) -> str:
+        if isinstance(key, str):
+            key = self.vault.column_index(key)
+        return self.vault.cell(self.position, key)
+    
+    def get(self, header: str, default: str = "") -> str:
+        return self[header] if header in self else default
+    
+    def __contains__(self, header: str) -> bool:
+        return self.vault.has_column(header)
+    
+    def __len__(self) -> int:
+        return self.vault.width(self.position)
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.cells())
+    
+    def cells(self) -> List[str]:
+        """The row as a new list of cells"""
+        return self.vault.row_cells(self.position)
+    
+    @property
+    def index(self) -> str:
+        return self.get('index')
+    
+    @property
+    def site(self) -> str:
+        return self.get('site')
+    
+    def __repr__(self) -> str:
+        return f"VaultRow({self.position}, {self.cells()!r})"
+
+
+class Vault:
+    """
+    In-memory CSV vault held as one list per column instead of one list per row
+    - An entry costs one pointer per column; vault[i] builds a VaultRow view on demand
+    - Site values are deduplicated as rows are added, so entries for the same site
+      share one string (a table local to each extend call, not sys.intern, so
+      unique sites cost nothing extra once loaded)
+    - Column positions are computed once, and each header spelling is normalized
+      only the first time it is looked up
+    - Rows keep their stored width: a short (or blank) row reads as "" in its missing
+      columns but row_cells returns only the cells it had (see short_widths), and cells
+      past the last header are kept in overflow, by row position
+    """
+    
+    def __init__(self, headers: List[str], encrypted_master_key: str = "", master_key_note: str = "Master key"):
+        self.headers = list(headers)
+        self.encrypted_master_key = encrypted_master_key
+        self.master_key_note = master_key_note
+        self.positions = column_positions(self.headers)
+        self.encrypted_columns = [is_encrypted_column(header) for header in self.headers]
+        self.columns: List[List[str]] = [[] for _ in self.headers]
+        self.overflow: Dict[int, List[str]] = {}
+        self.short_widths: Dict[int, int] = {}
+        self._lookup = dict(self.positions)
+        self._site = self.positions.get('site')
+        self._size = 0
+    
+    @classmethod
+    def from_rows(cls, headers: List[str], rows: Iterable[List[str]], encrypted_master_key: str = "") -> "Vault":
+        vault = cls(headers, encrypted_master_key)
+        vault.extend(rows)
+        return vault
+    
+    @classmethod
+    def from_csv(cls, csv_file: str) -> "Vault":
+        """Loads a CSV vault export, streaming its rows straight into the columns"""
+        with open(csv_file, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            master_row = next(reader, None)
+            headers = next(reader, None)
+            if master_row is None or headers is None or len(master_row) < 2:
+                raise ValueError("CSV file must start with a master key row and a header row")
+            vault = cls(headers, master_row[1], master_row[0])
+            vault.extend(reader)
+        return vault
+    
+    def append(self, row: List[str]):
+        self.extend([row])
+    
+    def extend(self, rows: Iterable[List[str]], batch_size: int = 1024):
+        """Appends rows a batch at a time; full-width batches are copied column by column"""
+        rows = iter(rows)
+        width = len(self.columns)
+        seen_sites: Dict[str, str] = {}
+        for batch in iter(lambda: list(itertools.islice(rows, batch_size)), []):
+            start = self._size
+            for offset, row in enumerate(batch):
+                if len(row) > width:
+                    self.overflow[start + offset] = row[width:]
+                    batch[offset] = row[:width]
+                elif len(row) < width:
+                    self.short_widths[start + offset] = len(row)
+                    batch[offset] = row + [""] * (width - len(row))
+            for column, values in zip(self.columns, zip(*batch)):
+                column.extend(values)
+            if self._site is not None:
+                sites = self.columns[self._site]
+                sites[start:] = [seen_sites.setdefault(site, site) for site in sites[start:]]
+            self._size += len(batch)
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __getitem__(self, position: int) -> VaultRow:
+        if position < 0:
+            position += self._size
+        if not 0 <= position < self._size:
+            raise IndexError("Vault row out of range")
+        return VaultRow(self, position)
+    
+    def __iter__(self) -> Iterator[VaultRow]:
+        return (VaultRow(self, position) for position in range(self._size))
+    
+    def has_column(self, header: str) -> bool:
+        try:
+            self.column_index(header)
+            return True
+        except KeyError:
+            return False
+    
+    def column_index(self, header: str) -> int:
+        """Position of a column by (case-insensitive) name; KeyError if it is missing"""
+        position = self._lookup.get(header)
+        if position is None:
+            position = self.positions[header.strip().lower()]
+            self._lookup[header] = position
+        return position
+    
+    def column(self, header: str) -> List[str]:
+        """The stored values of one column, in row order (do not modify)"""
+        return self.columns[self.column_index(header)]
+    
+    @property
+    def sites(self) -> List[str]:
+        """Site values in row order ("" for every row if there is no Site column)"""
+        return self.columns[self._site] if self._site is not None else [""] * self._size
+    
+    def cell(self, position: int, column: int) -> str:
+        if column < len(self.columns):
+            return self.columns[column][position]
+        extra = self.overflow.get(position, ())
+        return extra[column - len(self.columns)] if column - len(self.columns) < len(extra) else ""
+    
+    def width(self, position: int) -> int:
+        """Number of cells row position had when it was added"""
+        if position in self.overflow:
+            return len(self.columns) + len(self.overflow[position])
+        return self.short_widths.get(position, len(self.columns))
+    
+    def row_cells(self, position: int) -> List[str]:
+        """The row's cells exactly as they were added"""
+        cells = [column[position] for column in self.columns]
+        if position in self.overflow:
+            return cells + self.overflow[position]
+        if position in self.short_widths:
+            return cells[:self.short_widths[position]]
+        return cells
@@ -34,6 +34,119 @@ def test_basic_encryption():
     print("✅ Basic encryption test passed!\n")
 
 
+def test_codec_compatibility():
+    """Test the table-driven codec matches the comma-decimal format from subtlecryptowrap.js"""
+    print("🔢 Testing comma-decimal base64 codec...")
+    
+    import base64
+    from pm_crypto import (
+        bytes_to_base64, base64_string_to_bytes,
+        bytes_list_to_base64, base64_strings_to_bytes
+    )
+    
+    def reference_encode(data):
+        return base64.b64encode(','.join(str(b) for b in data).encode('utf-8')).decode('utf-8')
+    
+    samples = [bytes(range(256)), os.urandom(12), os.urandom(61), b"\x00"]
+    for data in samples:
+        encoded = bytes_to_base64(data)
+        if encoded != reference_encode(data) or base64_string_to_bytes(encoded) != data:
+            raise ValueError("Codec round trip does not match the JavaScript format!")
+    
+    if bytes_list_to_base64(samples) != [reference_encode(d) for d in samples]:
+        raise ValueError("Batch encoder does not match!")
+    if base64_strings_to_bytes(bytes_list_to_base64(samples)) != samples:
+        raise ValueError("Batch decoder does not match!")
+    
+    # IV from the JavaScript fakeVals() master key
+    if base64_string_to_bytes("MTI2LDE2MCwxOSwxMTgsNzgsMjcsMjE4LDY1LDIzNiwxMCwxODEsMTAw") != bytes(
+            [126, 160, 19, 118, 78, 27, 218, 65, 236, 10, 181, 100]):
+        raise ValueError("Failed to decode JavaScript IV!")
+    
+    # Non-canonical decimal text is still accepted, garbage is rejected
+    if base64_strings_to_bytes([reference_encode(b"ab"), base64.b64encode(b" 7, 008").decode()]) != [b"ab", b"\x07\x08"]:
+        raise ValueError("Non-canonical decimal text was not decoded!")
+    for bad in ["", base64.b64encode(b"1,256").decode(), base64.b64encode(b"1,,2").decode()]:
+        try:
+            base64_strings_to_bytes([reference_encode(b"ok"), bad])
+        except ValueError:
+            continue
+        raise ValueError(f"Invalid codec input was accepted: {bad!r}")
+    
+    print("✅ Codec compatibility test passed!\n")
+
+
+def test_compact_envelope():
+    """Test the compact v2 envelope is detected and converts losslessly"""
+    print("📦 Testing compact v2 envelope...")
+    
+    from pm_crypto import reencode_ciphertext, is_compact_ciphertext
+    
+    secret = "compact secret"
+    passphrase = "test_password_123"
+    
+    legacy = ez_subtle_encrypt(secret, passphrase)
+    compact = ez_subtle_encrypt(secret, passphrase, compact=True)
+    print(f"  Legacy length: {len(legacy)}, compact length: {len(compact)}")
+    
+    if not is_compact_ciphertext(compact) or is_compact_ciphertext(legacy):
+        raise ValueError("Envelope detection failed!")
+    
+    for ciphertext in [legacy, compact, reencode_ciphertext(legacy)]:
+        if ez_subtle_decrypt(ciphertext, passphrase).decode('utf-8') != secret:
+            raise ValueError("Compact envelope decryption failed!")
+    
+    if reencode_ciphertext(reencode_ciphertext(legacy), compact=False) != legacy:
+        raise ValueError("Envelope conversion is not lossless!")
+    
+    for bad in ["v2:", "v2:not*base64", "v2:" + "A" * 20]:
+        try:
+            ez_subtle_decrypt(bad, passphrase)
+        except ValueError:
+            continue
+        raise ValueError(f"Malformed compact envelope was accepted: {bad!r}")
+    
+    print("✅ Compact envelope test passed!\n")
+
+
+def test_kdf_cache():
+    """Test the opt-in passphrase KDF cache"""
+    print("⏱️  Testing KDF cache...")
+    
+    import pm_crypto
+    from pm_crypto import get_key_material_from_passphrase, enable_kdf_cache, disable_kdf_cache, kdf_cache_stats
+    
+    expected = get_key_material_from_passphrase("cached passphrase")
+    cache = enable_kdf_cache(maxsize=2, ttl=60)
+    try:
+        for _ in range(3):
+            if get_key_material_from_passphrase("cached passphrase") != expected:
+                raise ValueError("Cached key does not match!")
+        stats = kdf_cache_stats()
+        print(f"  Stats: {stats}")
+        if stats["hits"] != 2 or stats["misses"] != 1:
+            raise ValueError("KDF cache did not memoize the derivation!")
+        
+        # Different salt or iterations must not hit the same entry
+        if get_key_material_from_passphrase("cached passphrase", iterations=101) == expected:
+            raise ValueError("Iterations are not part of the cache key!")
+        get_key_material_from_passphrase("another passphrase")
+        if kdf_cache_stats()["evictions"] != 1:
+            raise ValueError("KDF cache is not bounded!")
+        
+        cache.ttl = -1
+        get_key_material_from_passphrase("another passphrase")
+        if kdf_cache_stats()["expirations"] != 1:
+            raise ValueError("KDF cache entry did not expire!")
+    finally:
+        disable_kdf_cache()
+    
+    if kdf_cache_stats() is not None or pm_crypto._kdf_cache is not None:
+        raise ValueError("KDF cache was not disabled!")
+    
+    print("✅ KDF cache test passed!\n")
+
+
 def test_master_key_flow():
     """Test the master key encryption/decryption flow"""
     print("🔑 Testing master key flow...")
@@ -83,6 +196,1341 @@ def test_master_key_flow():
     print("✅ Master key flow test passed!\n")
 
 
+def test_key_handles():
+    """Test the engine reuses its master key handle and the keyring stays bounded"""
+    print("🗝️  Testing key handles and keyring...")
+    
+    from pm_crypto import KeyHandle, KeyRing, generate_sym_key
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = generate_sym_key()
+    handle = engine.master_key_handle
+    
+    ciphertext = engine.encrypt_secret_with_master_key("handle secret")
+    if engine.decrypt_secret_with_master_key(ciphertext, readable=True) != "handle secret":
+        raise ValueError("Key handle round trip failed!")
+    if engine.master_key_handle is not handle or ez_subtle_decrypt(ciphertext, engine.master_key) != b"handle secret":
+        raise ValueError("Master key handle was not reused!")
+    
+    keyring = KeyRing(maxsize=2)
+    first = keyring.get("gtauk-1")
+    if keyring.get("gtauk-1") is not first:
+        raise ValueError("Keyring did not cache the handle!")
+    keyring.get("gtauk-2")
+    keyring.get(b"\x01" * 32)
+    if len(keyring) != 2 or keyring.get("gtauk-1") is first:
+        raise ValueError("Keyring did not evict the least recently used key!")
+    if not isinstance(keyring.get(first), KeyHandle):
+        raise ValueError("Keyring did not pass a KeyHandle through!")
+    
+    engine.master_key = None
+    if engine.master_key_handle is not None:
+        raise ValueError("Clearing the master key did not drop its handle!")
+    
+    # Any key can be assigned; a bad length fails in the operation, through whoops
+    engine.master_key = b"short key"
+    if engine.encrypt_secret_with_master_key("secret") != "":
+        raise ValueError("Encrypting with a bad key length should fail!")
+    
+    print("✅ Key handle test passed!\n")
+
+
+def test_storage_layer():
+    """Test the shared write-through JSON storage"""
+    print("💾 Testing storage layer...")
+    
+    import json
+    import tempfile
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "storage.json")
+        
+        engine1 = PasswordManagerEngine()
+        engine2 = PasswordManagerEngine()
+        engine1.storage_file = engine2.storage_file = path
+        if engine1.storage is not engine2.storage:
+            raise ValueError("Engines do not share the storage object!")
+        
+        engine1._set_cookie("a", "1", 1)
+        if engine2._get_cookie("a") != "1":
+            raise ValueError("Write was not visible to the second engine!")
+        
+        # Changes made behind our back are picked up
+        with open(path, 'w') as f:
+            json.dump({"a": "1", "external": "yes!"}, f)
+        if engine1._get_cookie("external") != "yes!":
+            raise ValueError("External change was not detected!")
+        
+        with engine1.storage.batch():
+            engine1._set_cookie("b", "2", 1)
+            engine1._set_cookie("c", "3", 1)
+            with open(path) as f:
+                if "b" in json.load(f):
+                    raise ValueError("Batched write was committed early!")
+        with open(path) as f:
+            if json.load(f) != {"a": "1", "external": "yes!", "b": "2", "c": "3"}:
+                raise ValueError("Batched writes were not committed!")
+        
+        engine2._save_storage({"only": "this"})
+        if engine1._load_storage() != {"only": "this"}:
+            raise ValueError("Full storage save failed!")
+        
+        if os.listdir(tmpdir) != ["storage.json"]:
+            raise ValueError("Temp files were left behind!")
+        
+        # A corrupt file reads as empty and is replaced by the next write
+        with open(path, 'w') as f:
+            f.write("{not json")
+        if engine1._get_cookie("only") is not None or engine1.storage.load_error is None:
+            raise ValueError("Corrupt storage should read as empty and be reported!")
+        engine1._set_cookie("a", "fresh", 1)
+        with open(path) as f:
+            if json.load(f) != {"a": "fresh"} or engine2._get_cookie("a") != "fresh":
+                raise ValueError("Write after a corrupt file did not replace it!")
+        
+        # A failed commit is not replayed by the next one
+        from pm_storage import JsonFileStorage
+        missing_dir = os.path.join(tmpdir, "missing")
+        storage = JsonFileStorage(os.path.join(missing_dir, "storage.json"))
+        try:
+            storage.set("lost", "1")
+            raise ValueError("Writing into a missing directory should fail!")
+        except OSError:
+            pass
+        os.mkdir(missing_dir)
+        storage.set("kept", "2")
+        if storage.snapshot() != {"kept": "2"}:
+            raise ValueError("Failed write was replayed!")
+    
+    print("✅ Storage layer test passed!\n")
+
+
+def test_sqlite_vault():
+    """Test importing a CSV export into SQLite and reading/writing entries through the engine"""
+    print("🗄️  Testing SQLite vault...")
+    
+    import csv
+    import tempfile
+    from pm_crypto import generate_sym_key
+    from pm_sqlite_vault import SqliteVault
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = generate_sym_key()
+    passphrase = "vault passphrase"
+    encrypted_master_key = ez_subtle_encrypt(engine.master_key, passphrase)
+    headers = ["Index", "Site", "Username", "Password", "AdditionalInfo"]
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        csv_path = os.path.join(tmpdir, "vault.csv")
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", encrypted_master_key])
+            writer.writerow(headers)
+            for i in range(1, 21):
+                writer.writerow([str(i), f"Site{i}.com", engine.encrypt_secret_with_master_key(f"user{i}"),
+                                 engine.encrypt_secret_with_master_key(f"pass{i}"), ""])
+        
+        with SqliteVault(os.path.join(tmpdir, "vault.db")) as vault:
+            if vault.import_csv(csv_path) != 20 or len(vault) != 20:
+                raise ValueError("CSV import into SQLite failed!")
+            
+            reader = PasswordManagerEngine()
+            if not reader.unlock_vault(vault, passphrase):
+                raise ValueError("Failed to unlock SQLite vault!")
+            
+            entry = reader.read_vault_entry(vault, "7")
+            if entry != {"Index": "7", "Site": "Site7.com", "Username": "user7", "Password": "pass7", "AdditionalInfo": ""}:
+                raise ValueError(f"Wrong entry read from SQLite vault: {entry}")
+            if [e["Index"] for e in reader.find_vault_entries(vault, "site12.COM")] != ["12"]:
+                raise ValueError("Site lookup failed!")
+            if len(vault.find_by_site("site1", prefix=True)) != 11:
+                raise ValueError("Site prefix lookup failed!")
+            
+            reader.write_vault_entry(vault, {"Index": "7", "Site": "Site7.com", "Password": "changed"})
+            reader.write_vault_entry(vault, {"Index": "21", "Site": "New.com", "Username": "new"})
+            if reader.read_vault_entry(vault, "7")["Password"] != "changed" or len(vault) != 21:
+                raise ValueError("Writing entries through the engine failed!")
+            
+            # A value that fails to encrypt must not be stored as an empty cell
+            master_key = reader.master_key
+            reader.master_key = b"not a valid key"
+            if reader.write_vault_entry(vault, {"Index": "7", "Site": "Site7.com", "Password": "lost"}):
+                raise ValueError("write_vault_entry should fail when encryption fails!")
+            reader.master_key = master_key
+            if reader.read_vault_entry(vault, "7")["Password"] != "changed":
+                raise ValueError("A failed write replaced the stored row!")
+            if not vault.delete_by_index("21") or vault.get_by_index("21") is not None:
+                raise ValueError("Deleting an entry failed!")
+    
+    print("✅ SQLite vault test passed!\n")
+
+
+def test_csv_vault_reader():
+    """Test the streaming CSV reader re-reads rows by offset, with and without mmap"""
+    print("📜 Testing streaming CSV vault reader...")
+    
+    import csv
+    import tempfile
+    from pm_vault import CsvVaultReader
+    
+    headers = ["Index", "Site", "Username", "Password", "AdditionalInfo"]
+    rows = [[str(i), f"site{i}", f"u{i}", f"p{i}", "multi\nline, \"quoted\"" if i % 3 == 0 else "é"] for i in range(30)]
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "vault.csv")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", "mk"])
+            writer.writerow(headers)
+            writer.writerows(rows)
+        
+        for use_mmap in (False, True):
+            with CsvVaultReader(path, use_mmap=use_mmap) as reader:
+                if reader.encrypted_master_key != "mk" or reader.headers != headers:
+                    raise ValueError("Master key or header row parsed incorrectly!")
+                
+                iterator = iter(reader)
+                if [next(iterator) for _ in range(10)] != rows[:10]:
+                    raise ValueError("Streamed rows do not match!")
+                # Random access in the middle of iteration must not disturb it
+                if reader.read_row(3) != rows[3] or next(iterator) != rows[10]:
+                    raise ValueError("Seeking back disturbed iteration!")
+                
+                if reader.scan() != len(rows) or [reader.read_row(i) for i in (29, 0, 15)] != [rows[29], rows[0], rows[15]]:
+                    raise ValueError("Re-reading rows by offset failed!")
+    
+    print("✅ Streaming CSV vault reader test passed!\n")
+
+
+def test_site_search():
+    """Test ranked prefix, substring and fuzzy site search through the engine"""
+    print("🔎 Testing site search index...")
+    
+    engine = PasswordManagerEngine()
+    if engine.search_sites("anything") != []:
+        raise ValueError("Search without an index should return nothing!")
+    
+    engine.build_site_index(["GitHub", "  github enterprise", "Bank of America", "gitlab.com", "", "MyGitHub"])
+    
+    kinds = [(m.site, m.kind) for m in engine.search_sites("GitHub")]
+    print(f"  'GitHub' -> {kinds}")
+    if kinds[:3] != [("GitHub", "exact"), ("  github enterprise", "prefix"), ("MyGitHub", "substring")]:
+        raise ValueError("Matches are not ranked exact > prefix > substring!")
+    
+    if [m.position for m in engine.search_sites("bank of amrica")] != [2]:
+        raise ValueError("Fuzzy match did not find the misspelled site!")
+    if [m.site for m in engine.search_sites("git", limit=2, fuzzy=False)] != ["GitHub", "gitlab.com"]:
+        raise ValueError("Limit or prefix ordering is wrong!")
+    if engine.search_sites("gi", fuzzy=False)[-1].site != "MyGitHub":
+        raise ValueError("Short substring search failed!")
+    
+    # read-csv-passwords only falls back to fuzzy matches when nothing else matches
+    import csv
+    import tempfile
+    from typer.testing import CliRunner
+    from pm_crypto import generate_sym_key
+    from main import app
+    
+    key = generate_sym_key()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "vault.csv")
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", ez_subtle_encrypt(key, "search passphrase")])
+            writer.writerow(["Index", "Site", "Password"])
+            writer.writerows([str(i), f"Site{i}.com", ""] for i in range(1, 7))
+        runner = CliRunner(env={"PM_AGENT_SOCK": os.path.join(tmpdir, "no-agent.sock")})
+        result = runner.invoke(app, ["read-csv-passwords", path],
+                               input="search passphrase\nsearch site1\nsearch sute2.com\nq\n")
+        if "Found 1 matching entries" not in result.output or "Site3.com (fuzzy)" in result.output:
+            raise ValueError("Substring search should not add fuzzy matches!")
+        if "found 1 similar entries" not in result.output or "Site2.com (fuzzy)" not in result.output:
+            raise ValueError("Fuzzy fallback should be labelled!")
+    
+    print("✅ Site search test passed!\n")
+
+
+def test_lazy_rows():
+    """Test lazy rows decrypt on first access and repeat views hit the plaintext cache"""
+    print("🦥 Testing lazy row decryption...")
+    
+    from pm_crypto import generate_sym_key, PlaintextCache
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = generate_sym_key()
+    engine.plaintext_cache = PlaintextCache(maxsize=2, ttl=60)
+    headers = ["Index", "Site", "Username", "Password", "AdditionalInfo"]
+    row = ["1", " example.com ", engine.encrypt_secret_with_master_key("alice"),
+           engine.encrypt_secret_with_master_key("s3cret"), ""]
+    
+    entry = engine.lazy_row(row, headers)
+    if entry["site"] != " example.com " or entry["AdditionalInfo"] != "":
+        raise ValueError("Plain or empty columns were altered!")
+    if engine.plaintext_cache.misses != 0:
+        raise ValueError("Reading plain columns decrypted something!")
+    
+    if entry["Password"] != "s3cret" or engine.lazy_row(row, headers)["password"] != "s3cret":
+        raise ValueError("Lazy decryption failed!")
+    if (engine.plaintext_cache.misses, engine.plaintext_cache.hits) != (1, 1):
+        raise ValueError("Repeat view did not use the plaintext cache!")
+    
+    # A new master key drops plaintexts cached under the old one
+    row_key = engine.master_key
+    engine.master_key = generate_sym_key()
+    if len(engine.plaintext_cache) != 0 or engine.lazy_row(row, headers)["Password"] == "s3cret":
+        raise ValueError("Plaintext cache survived a master key change!")
+    engine.plaintext_cache.put(row[2], b"alice")
+    engine.attach_agent(None)
+    if len(engine.plaintext_cache) != 0:
+        raise ValueError("Plaintext cache survived attaching an agent!")
+    
+    # Expired plaintexts are wiped
+    engine.plaintext_cache.put(row[3], b"s3cret")
+    cached = engine.plaintext_cache._entries[row[3]][1]
+    engine.plaintext_cache.ttl = -1
+    if len(engine.plaintext_cache) != 0 or any(cached):
+        raise ValueError("Expired plaintext was not wiped!")
+    
+    # read-csv-passwords shows every field; --hide keeps all but the Password hidden
+    import csv
+    import tempfile
+    from typer.testing import CliRunner
+    from main import app
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "vault.csv")
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", ez_subtle_encrypt(row_key, "lazy passphrase")])
+            writer.writerow(headers)
+            writer.writerow(row)
+        runner = CliRunner(env={"PM_AGENT_SOCK": os.path.join(tmpdir, "no-agent.sock")})
+        shown = runner.invoke(app, ["read-csv-passwords", path], input="lazy passphrase\n1\nq\n").output
+        hidden = runner.invoke(app, ["read-csv-passwords", path, "--hide"],
+                               input="lazy passphrase\n1\nusername\nq\n").output
+        if "Username: alice" not in shown or "[Hidden]" in shown:
+            raise ValueError("Encrypted fields should be shown by default!")
+        if "Username: [Hidden]" not in hidden or "Username: alice" not in hidden:
+            raise ValueError("--hide should reveal fields only when asked!")
+    
+    print("✅ Lazy row test passed!\n")
+
+
+def test_batch_get():
+    """Test the get command looks up many keys and prints JSON or JSONL"""
+    print("📦 Testing batch get command...")
+    
+    import csv
+    import json
+    import tempfile
+    from typer.testing import CliRunner
+    from pm_crypto import generate_sym_key
+    from main import app
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = generate_sym_key()
+    headers = ["Index", "Site", "Username", "Password"]
+    rows = [[str(i), f"Site{i}.com", engine.encrypt_secret_with_master_key(f"user{i}"),
+             engine.encrypt_secret_with_master_key(f"pass{i}")] for i in range(1, 6)]
+    rows.append(["6", "broken.com", engine.encrypt_secret_with_master_key("user6"), "not a ciphertext"])
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "vault.csv")
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", ez_subtle_encrypt(engine.master_key, "get passphrase")])
+            writer.writerow(headers)
+            writer.writerows(rows)
+        
+        runner = CliRunner(env={"PM_PASSPHRASE": "get passphrase",
+                                "PM_AGENT_SOCK": os.path.join(tmpdir, "no-agent.sock")})
+        
+        # Index and Site keys (case-insensitive) in one call
+        result = runner.invoke(app, ["get", "2", "site4.COM", "--csv", path])
+        if result.exit_code != 0:
+            raise ValueError(f"get failed: {result.output}")
+        results = json.loads(result.stdout)
+        if [(r["query"], r["Site"], r["Password"]) for r in results] != \
+                [("2", "Site2.com", "pass2"), ("site4.COM", "Site4.com", "pass4")]:
+            raise ValueError("get returned the wrong entries!")
+        
+        # Every spelling of a key gets the row, and a row can match by Index and Site at once
+        result = runner.invoke(app, ["get", "SITE3.com", "site3.com", "3", "--csv", path, "--field", "password"])
+        if result.exit_code != 0 or json.loads(result.stdout) != [
+                {"query": q, "Password": "pass3"} for q in ("3", "SITE3.com", "site3.com")]:
+            raise ValueError(f"Each query should get its own result: {result.output}")
+        
+        # Keys from stdin, filtered fields, one JSON object per line
+        result = runner.invoke(app, ["get", "--stdin", "--csv", path, "--field", "username", "--format", "jsonl"],
+                               input="Site1.com\n\n5\n")
+        lines = [json.loads(line) for line in result.stdout.splitlines()]
+        if result.exit_code != 0 or lines != [{"query": "Site1.com", "Username": "user1"},
+                                              {"query": "5", "Username": "user5"}]:
+            raise ValueError(f"get --stdin --format jsonl failed: {result.output}")
+        
+        result = runner.invoke(app, ["get", "1", "--csv", path, "--field", "pin"])
+        if result.exit_code != 2 or result.stdout.strip():
+            raise ValueError("Unknown field should exit with status 2!")
+        
+        # A key with no match still prints the others, then exits with 1
+        result = runner.invoke(app, ["get", "3", "nowhere.com", "--csv", path])
+        if result.exit_code != 1 or [r["query"] for r in json.loads(result.stdout)] != ["3"]:
+            raise ValueError("Missing key should exit with status 1!")
+        if "nowhere.com" not in result.stderr:
+            raise ValueError("Missing key was not reported on stderr!")
+        
+        # A field that does not decrypt is null with its error, never a placeholder value
+        result = runner.invoke(app, ["get", "broken.com", "--csv", path])
+        broken = json.loads(result.stdout)[0]
+        if result.exit_code != 1 or broken["Username"] != "user6" or broken["Password"] is not None:
+            raise ValueError(f"Failed field should be null and exit 1: {result.output}")
+        if broken["errors"]["Password"]["cause"] != "bad envelope" or "errors" in json.loads(
+                runner.invoke(app, ["get", "1", "--csv", path]).stdout)[0]:
+            raise ValueError("Decryption errors were not reported per field!")
+    
+    print("✅ Batch get test passed!\n")
+
+
+def test_async_engine():
+    """Test the asyncio engine runs session start and batch crypto off the event loop"""
+    print("⚡ Testing asyncio engine...")
+    
+    import asyncio
+    import tempfile
+    from pm_async import AsyncPasswordManagerEngine
+    
+    async def scenario(storage_file):
+        async with AsyncPasswordManagerEngine(max_concurrency=3) as setup:
+            setup.engine.storage_file = storage_file
+            mk_pe = await setup.fresh_start("async passphrase", "async gtauk")
+            secrets = [f"secret {i}" for i in range(20)]
+            ciphertexts = await setup.encrypt_many(secrets)
+        
+        async with AsyncPasswordManagerEngine(max_concurrency=3) as engine:
+            engine.engine.storage_file = storage_file
+            if not await engine.session_start(mk_pe, "async gtauk", lambda msg=None: None):
+                raise ValueError("Async session start failed!")
+            
+            # Concurrent batches can be gathered together
+            first, second = await asyncio.gather(
+                engine.decrypt_many(ciphertexts[:10], readable=True),
+                engine.decrypt_many(ciphertexts[10:], readable=True),
+            )
+            if first + second != secrets:
+                raise ValueError("Async batch decryption failed!")
+            
+            # Small chunks spread a batch over several executor jobs without reordering it
+            if await engine.decrypt_many(ciphertexts, readable=True, chunk_size=3) != secrets:
+                raise ValueError("Chunked async decryption lost order!")
+            rows = [[str(i), "site", ct] for i, ct in enumerate(ciphertexts)]
+            expected = [[str(i), "site", secret] for i, secret in enumerate(secrets)]
+            if await engine.decrypt_vault(rows, ["Index", "Site", "Password"], chunk_size=4) != expected:
+                raise ValueError("Chunked async vault decryption lost order!")
+            
+            rows = await engine.decrypt_vault([["1", "site", ciphertexts[0]]], ["Index", "Site", "Password"])
+            if rows != [["1", "site", "secret 0"]]:
+                raise ValueError("Async vault decryption failed!")
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        asyncio.run(scenario(os.path.join(tmpdir, "storage.json")))
+    
+    print("✅ Asyncio engine test passed!\n")
+
+
+def test_unlock_agent():
+    """Test the unlock agent serves decrypt/encrypt requests for the key it holds"""
+    print("🔐 Testing unlock agent...")
+    
+    import tempfile
+    import threading
+    from pm_agent import UnlockAgent, AgentClient, agent_key_id
+    from pm_crypto import generate_and_export_key, import_raw_key, ez_subtle_encrypt, reencode_ciphertext
+    
+    mk_pe = ez_subtle_encrypt(generate_and_export_key(), "agent passphrase")
+    holder = PasswordManagerEngine()
+    holder.master_key = import_raw_key(ez_subtle_decrypt(mk_pe, "agent passphrase"))
+    ciphertexts = [ez_subtle_encrypt(f"secret {i}", holder.master_key) for i in range(10)]
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        socket_path = os.path.join(tmpdir, "agent.sock")
+        key_id = agent_key_id(mk_pe)
+        if agent_key_id(reencode_ciphertext(mk_pe, compact=True)) != key_id:
+            raise ValueError("Key id should not depend on the envelope format!")
+        
+        agent = UnlockAgent(holder, key_id, socket_path, idle_timeout=30)
+        server = threading.Thread(target=agent.serve_forever, daemon=True)
+        server.start()
+        if not agent.wait_ready(5):
+            raise ValueError("Agent did not start!")
+        
+        if AgentClient.connect("another key id", socket_path) is not None:
+            raise ValueError("Agent holding another key should not be used!")
+        
+        # agent-start refuses a socket that another agent already serves
+        from typer.testing import CliRunner
+        from main import app
+        other_mk_pe = ez_subtle_encrypt(generate_and_export_key(), "other passphrase")
+        result = CliRunner().invoke(app, ["agent-start", other_mk_pe, "--socket", socket_path],
+                                    input="other passphrase\n")
+        if result.exit_code != 1 or "already running" not in result.output:
+            raise ValueError(f"agent-start should refuse a socket in use: {result.output}")
+        
+        with AgentClient.connect(key_id, socket_path) as client:
+            if client.decrypt(ciphertexts[3]) != b"secret 3":
+                raise ValueError("Agent decryption failed!")
+            if client.decrypt(client.encrypt("round trip", compact=True)) != b"round trip":
+                raise ValueError("Agent encryption failed!")
+            
+            results = client.decrypt_many(ciphertexts[:2] + ["not a ciphertext"])
+            if results[:2] != [b"secret 0", b"secret 1"] or not isinstance(results[2], ValueError):
+                raise ValueError("Agent batch decryption failed!")
+            if getattr(results[2], "cause", None) != "bad envelope":
+                raise ValueError("Agent errors should keep their cause!")
+            from pm_crypto import CiphertextError
+            for error_class in CiphertextError.__subclasses__():
+                if type(AgentClient._error({"error": "x", "cause": error_class.cause})) is not error_class:
+                    raise ValueError(f"Agent client lost the {error_class.cause} error class!")
+            
+            headers = ["Index", "Site", "Password"]
+            rows = [[str(i), f"site{i}", c] for i, c in enumerate(ciphertexts)]
+            decrypted = list(client.decrypt_rows(rows, headers, chunk_size=3))
+            if decrypted != [[str(i), f"site{i}", f"secret {i}"] for i in range(10)]:
+                raise ValueError("Agent row decryption failed!")
+            
+            # An engine without a local key can use the agent
+            engine = PasswordManagerEngine()
+            engine.attach_agent(client)
+            if engine.decrypt_secret_with_master_key(ciphertexts[5], readable=True) != "secret 5":
+                raise ValueError("Engine decryption through the agent failed!")
+            if list(engine.decrypt_vault(rows[:2], headers)) != decrypted[:2]:
+                raise ValueError("Engine vault decryption through the agent failed!")
+            
+            client.stop()
+        
+        server.join(5)
+        if server.is_alive() or os.path.exists(socket_path):
+            raise ValueError("Agent did not shut down!")
+        if holder.master_key is not None:
+            raise ValueError("Agent should drop the master key on shutdown!")
+    
+    print("✅ Unlock agent test passed!\n")
+
+
+def test_cli_startup():
+    """Test the CLI starts without loading the engine or cryptography"""
+    print("🚀 Testing CLI startup time...")
+    
+    import subprocess
+    import time
+    
+    here = os.path.dirname(os.path.abspath(__file__))
+    # Budgets can be raised on slow machines
+    import_budget_ms = float(os.environ.get("PM_IMPORT_BUDGET_MS", "500"))
+    startup_budget_ms = float(os.environ.get("PM_CLI_STARTUP_BUDGET_MS", "2000"))
+    heavy_modules = ("cryptography", "pm_engine")
+    
+    def imported_modules(*args):
+        """Runs python -X importtime and returns {module: cumulative microseconds}"""
+        result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=here,
+                                capture_output=True, text=True)
+        modules = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                modules[name.strip()] = int(cumulative)
+        return modules
+    
+    for args in (["-c", "import main"], ["main.py", "--help"]):
+        modules = imported_modules(*args)
+        loaded = sorted(m for m in modules if m.split(".")[0] in heavy_modules)
+        if loaded:
+            raise ValueError(f"{' '.join(args)} imported heavy modules: {loaded}")
+    
+    import_ms = imported_modules("-c", "import main")["main"] / 1000
+    print(f"  import main: {import_ms:.1f} ms (budget {import_budget_ms:.0f} ms)")
+    if import_ms > import_budget_ms:
+        raise ValueError(f"Importing main took {import_ms:.1f} ms!")
+    
+    # Best of three cold starts, to ignore one-off scheduling noise
+    timings = []
+    for _ in range(3):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "main.py", "--help"], cwd=here, capture_output=True, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    startup_ms = min(timings)
+    print(f"  main.py --help: {startup_ms:.1f} ms (budget {startup_budget_ms:.0f} ms)")
+    if startup_ms > startup_budget_ms:
+        raise ValueError(f"CLI startup took {startup_ms:.1f} ms!")
+    
+    print("✅ CLI startup test passed!\n")
+
+
+def test_benchmarks():
+    """Test the benchmark suite runs and flags regressions against a baseline"""
+    print("⏱️  Testing benchmark suite...")
+    
+    import json
+    import tempfile
+    from bench_engine import run_benchmarks, compare_to_baseline, main as bench_main
+    
+    report = run_benchmarks(sizes=[50], repeat=1)
+    results = report["results"]
+    for name in ("codec.bytes_to_base64.12b", "kdf.derive", "crypto.decrypt",
+                 "vault.50.read_csv_vault", "vault.50.search_fuzzy", "vault.50.decrypt_vault"):
+        if not results.get(name, 0) > 0:
+            raise ValueError(f"Missing benchmark result: {name}")
+    memory = report["memory"]
+    if not 0 < memory["vault.50.vault_bytes_per_entry"] < memory["vault.50.list_rows_bytes_per_entry"]:
+        raise ValueError("Columnar vault should use less memory per entry than list rows!")
+    
+    if compare_to_baseline(results, results):
+        raise ValueError("Results should not regress against themselves!")
+    
+    faster = {name: seconds / 2 for name, seconds in results.items()}
+    regressions = compare_to_baseline(results, faster, threshold=0.25)
+    if len(regressions) != len(results):
+        raise ValueError("A 2x slowdown should be flagged for every benchmark!")
+    overrides = {name: 1.5 for name in results}
+    if compare_to_baseline(results, faster, threshold=0.25, overrides=overrides):
+        raise ValueError("Per-benchmark thresholds should be honoured!")
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        baseline_file = os.path.join(tmpdir, "baseline.json")
+        with open(baseline_file, "w") as file:
+            json.dump({"results": {"kdf.derive": 1e-9}}, file)
+        output_file = os.path.join(tmpdir, "results.json")
+        if bench_main(["--sizes", "20", "--repeat", "1", "-o", output_file, "--baseline", baseline_file]) != 1:
+            raise ValueError("Regression against the baseline should fail the run!")
+        with open(output_file) as file:
+            if json.load(file)["meta"]["sizes"] != [20]:
+                raise ValueError("JSON results were not written!")
+    
+    print("✅ Benchmark suite test passed!\n")
+
+
+def test_metrics():
+    """Test metrics record crypto, storage and unlock activity into the registry and sinks"""
+    print("📈 Testing metrics...")
+    
+    import tempfile
+    from pm_metrics import enable_metrics, disable_metrics, get_metrics
+    
+    events = []
+    registry = enable_metrics()
+    registry.add_sink(lambda kind, name, value: events.append((kind, name)))
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            engine = PasswordManagerEngine()
+            engine.storage_file = os.path.join(tmpdir, "storage.json")
+            mk_pe = engine.fresh_start("metrics passphrase", "metrics gtauk")
+            ciphertext = engine.encrypt_secret_with_master_key("secret")
+            engine.decrypt_secret_with_master_key(ciphertext)
+            engine.decrypt_secret_with_master_key("bad&data")
+            
+            # GTAUK unlock, then a wrong GTAUK that falls back to the passphrase
+            for gtauk in ("metrics gtauk", "wrong gtauk"):
+                other = PasswordManagerEngine()
+                other.storage_file = engine.storage_file
+                other.master_key_passcode_encrypted = mk_pe
+                other.google_temp_active_user_key = gtauk
+                if not other._recover_master_key_from_local_storage("metrics passphrase"):
+                    raise ValueError("Unlock failed!")
+            
+            # The shared storage object is already loaded; a fresh one reads the file
+            from pm_storage import JsonFileStorage
+            JsonFileStorage(engine.storage_file).snapshot()
+            
+            textfile = os.path.join(tmpdir, "pm_engine.prom")
+            registry.write_prometheus_textfile(textfile)
+            with open(textfile) as f:
+                prometheus = f.read()
+            if os.stat(textfile).st_mode & 0o777 != 0o644:
+                raise ValueError("Textfile should be readable by the node_exporter user!")
+        
+        snapshot = registry.snapshot()
+        counters, histograms = snapshot["counters"], snapshot["histograms"]
+        print(f"  Counters: {counters}")
+        for name in ("kdf_derive_seconds", "encrypt_seconds", "decrypt_seconds",
+                     "storage_load_seconds", "storage_save_seconds", "unlock_seconds"):
+            if histograms.get(name, {}).get("count", 0) < 1:
+                raise ValueError(f"No observations for {name}!")
+        if histograms["unlock_seconds"]["count"] != 2:
+            raise ValueError("Each unlock should be timed once!")
+        if counters.get("gtauk_unlocks_total") != 1 or counters.get("gtauk_fallbacks_total") != 1:
+            raise ValueError("GTAUK unlocks and fallbacks were not counted!")
+        if counters.get("decrypt_failures_total", 0) < 2 or counters.get("errors_total", 0) < 2:
+            raise ValueError("Decrypt failures were not counted!")
+        
+        buckets = histograms["decrypt_seconds"]["buckets"]
+        if buckets[-1][1] != histograms["decrypt_seconds"]["count"]:
+            raise ValueError("The +Inf bucket should hold every observation!")
+        if ("histogram", "encrypt_seconds") not in events or ("counter", "gtauk_unlocks_total") not in events:
+            raise ValueError("Sink did not receive observations!")
+        if 'pm_engine_decrypt_seconds_bucket{le="+Inf"}' not in prometheus or \
+                "pm_engine_gtauk_fallbacks_total 1" not in prometheus:
+            raise ValueError("Prometheus textfile is missing metrics!")
+    finally:
+        disable_metrics()
+    
+    if get_metrics() is not None:
+        raise ValueError("Metrics should be disabled!")
+    
+    print("✅ Metrics test passed!\n")
+
+
+def test_key_rotation():
+    """Test master key rotation re-encrypts every cell and resumes after an interruption"""
+    print("🔁 Testing master key rotation...")
+    
+    import csv
+    import tempfile
+    from pm_crypto import generate_and_export_key, import_raw_key
+    from pm_rotate import rotate_csv_vault
+    from pm_vault import read_csv_vault
+    
+    old_key = generate_and_export_key()
+    headers = ["Index", "Site", "Username", "Password", "AdditionalInfo"]
+    plain_rows = [[str(i), f"site{i}", f"user{i}", f"pass{i}", "" if i % 4 == 0 else f"note {i}"] for i in range(25)]
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = old_key
+    
+    class Interrupted(Exception):
+        pass
+    
+    def interrupt(rows_done):
+        if rows_done >= 10:
+            raise Interrupted()
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = os.path.join(tmpdir, "vault.csv")
+        output = os.path.join(tmpdir, "rotated.csv")
+        checkpoint = output + ".checkpoint"
+        with open(source, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", ez_subtle_encrypt(old_key, "old passphrase")])
+            writer.writerow(headers)
+            # Empty notes are whitespace-only cells, which are copied through as they are
+            for row in plain_rows:
+                writer.writerow(row[:2] + [ez_subtle_encrypt(cell, old_key, compact=(i == 1)) if cell else "  "
+                                           for i, cell in enumerate(row[2:])])
+        
+        try:
+            rotate_csv_vault(engine, source, output, "new passphrase", workers=3, chunk_size=5, progress=interrupt)
+            raise ValueError("Rotation should have been interrupted!")
+        except Interrupted:
+            pass
+        if not os.path.exists(checkpoint):
+            raise ValueError("Checkpoint was not kept after the interruption!")
+        
+        try:
+            rotate_csv_vault(engine, source, output, "wrong passphrase", workers=3, chunk_size=5)
+            raise ValueError("Resuming with another passphrase should fail!")
+        except ValueError as e:
+            if "does not match" not in str(e):
+                raise
+        
+        # Resume: rows are picked up after the last checkpoint
+        resumed_at = []
+        count = rotate_csv_vault(engine, source, output, "new passphrase", workers=3, chunk_size=5,
+                                 progress=resumed_at.append)
+        if count != len(plain_rows) or resumed_at[0] != 15 or os.path.exists(checkpoint):
+            raise ValueError(f"Rotation did not resume correctly: {count} rows, progress {resumed_at}")
+        
+        new_mk_pe, new_headers, new_rows = read_csv_vault(output)
+        new_key = import_raw_key(ez_subtle_decrypt(new_mk_pe, "new passphrase"))
+        if new_key == old_key or new_headers != headers or len(new_rows) != len(plain_rows):
+            raise ValueError("Rotated vault has the wrong key or shape!")
+        
+        rotated = PasswordManagerEngine()
+        rotated.master_key = new_key
+        if list(rotated.decrypt_vault(new_rows, headers, workers=1)) != plain_rows:
+            raise ValueError("Rotated vault does not decrypt to the original values!")
+        if not new_rows[1][3].startswith("v2:") or new_rows[1][2].startswith("v2:"):
+            raise ValueError("Cells should keep their envelope format!")
+        if new_rows[0][4] != "  ":
+            raise ValueError("Whitespace-only cells should be copied unchanged!")
+        try:
+            ez_subtle_decrypt(new_rows[1][2], old_key)
+            raise ValueError("The old key should no longer decrypt the vault!")
+        except ValueError as e:
+            if "Decryption failed" not in str(e):
+                raise
+    
+    print("✅ Master key rotation test passed!\n")
+
+
+def test_encrypt_many():
+    """Test batched encryption round-trips and never repeats an IV"""
+    print("📦 Testing batched encryption...")
+    
+    import pm_crypto
+    from pm_crypto import encrypt_many, unpack_ciphertext, generate_sym_key
+    
+    key = generate_sym_key()
+    secrets = [f"secret {i}" for i in range(50)] + [b"\x00\xffbinary", ""]
+    expected = [s.encode('utf-8') if isinstance(s, str) else s for s in secrets]
+    
+    for compact in (False, True):
+        ciphertexts = encrypt_many(secrets, key, compact=compact)
+        if [ez_subtle_decrypt(c, key) for c in ciphertexts] != expected:
+            raise ValueError("Batched encryption did not round-trip!")
+        if any(c.startswith("v2:") != compact for c in ciphertexts):
+            raise ValueError("Batched encryption used the wrong envelope!")
+    
+    if encrypt_many([], key) != []:
+        raise ValueError("Empty batch should give no ciphertexts!")
+    
+    # A random source that repeats itself must not lead to a reused IV
+    real_get_salt = pm_crypto.get_salt
+    draws = iter(range(1, 1000))
+    pm_crypto.get_salt = lambda size=12: bytes(size) if size > 12 else next(draws).to_bytes(12, 'big')
+    try:
+        ciphertexts = encrypt_many(secrets, key)
+    finally:
+        pm_crypto.get_salt = real_get_salt
+    ivs = [unpack_ciphertext(c)[0] for c in ciphertexts]
+    if len(set(ivs)) != len(ivs):
+        raise ValueError("IVs must be unique within a batch!")
+    if [ez_subtle_decrypt(c, key) for c in ciphertexts] != expected:
+        raise ValueError("Redrawn IVs broke decryption!")
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = key
+    engine.compact_ciphertext = True
+    ciphertexts = engine.encrypt_many(["a", "b"])
+    if [engine.decrypt_secret_with_master_key(c, readable=True) for c in ciphertexts] != ["a", "b"] or \
+            not ciphertexts[0].startswith("v2:"):
+        raise ValueError("Engine batched encryption failed!")
+    
+    print("✅ Batched encryption test passed!\n")
+
+
+def test_sharded_vault():
+    """Test splitting a CSV export into shards and reading/writing entries through the engine"""
+    print("🧩 Testing sharded vault...")
+    
+    import csv
+    import tempfile
+    from pm_crypto import generate_sym_key
+    from pm_sharded_vault import ShardedVault
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = generate_sym_key()
+    passphrase = "shard passphrase"
+    encrypted_master_key = ez_subtle_encrypt(engine.master_key, passphrase)
+    headers = ["Index", "Site", "Username", "Password", "AdditionalInfo"]
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        csv_path = os.path.join(tmpdir, "vault.csv")
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", encrypted_master_key])
+            writer.writerow(headers)
+            for i in range(1, 41):
+                writer.writerow([str(i), f"Site{i}.com", engine.encrypt_secret_with_master_key(f"user{i}"),
+                                 engine.encrypt_secret_with_master_key(f"pass{i}"), ""])
+        
+        for partition_by in ("index", "site"):
+            vault_dir = os.path.join(tmpdir, f"by_{partition_by}")
+            with ShardedVault(vault_dir, shard_count=8, partition_by=partition_by, max_cached_shards=2) as vault:
+                if vault.import_csv(csv_path) != 40 or len(vault) != 40:
+                    raise ValueError("CSV import into shards failed!")
+            
+            # Reopening reads only the manifest; shards load on demand
+            with ShardedVault(vault_dir, shard_count=99, partition_by="index", max_cached_shards=2) as vault:
+                if vault.shard_count != 8 or vault.partition_by != partition_by or len(vault) != 40:
+                    raise ValueError("Manifest was not used when reopening!")
+                
+                reader = PasswordManagerEngine()
+                if not reader.unlock_vault(vault, passphrase):
+                    raise ValueError("Failed to unlock sharded vault!")
+                
+                entry = reader.read_vault_entry(vault, "7")
+                if entry != {"Index": "7", "Site": "Site7.com", "Username": "user7", "Password": "pass7", "AdditionalInfo": ""}:
+                    raise ValueError(f"Wrong entry read from sharded vault: {entry}")
+                if [e["Index"] for e in reader.find_vault_entries(vault, "site12.COM")] != ["12"]:
+                    raise ValueError("Site lookup failed!")
+                if len(vault.find_by_site("site1", prefix=True)) != 11:
+                    raise ValueError("Site prefix lookup failed!")
+                if len(vault._cache) > 2:
+                    raise ValueError("Too many shards kept in memory!")
+                
+                # Changing the Site may move the row to another shard
+                reader.write_vault_entry(vault, {"Index": "7", "Site": "Moved.com", "Password": "changed"})
+                reader.write_vault_entry(vault, {"Index": "41", "Site": "New.com", "Username": "new"})
+                if reader.read_vault_entry(vault, "7")["Password"] != "changed" or len(vault) != 41:
+                    raise ValueError("Writing entries through the engine failed!")
+                if vault.find_by_site("Site7.com") or len(vault.find_by_site("moved.com")) != 1:
+                    raise ValueError("Moved entry is in the wrong shard!")
+                if not vault.delete_by_index("41") or vault.get_by_index("41") is not None:
+                    raise ValueError("Deleting an entry failed!")
+                
+                # Bulk work runs shard by shard
+                counts = list(vault.map_shards(lambda shard, rows: len(rows), workers=4))
+                if len(counts) != 8 or sum(counts) != 40:
+                    raise ValueError("Shard map did not cover every row!")
+                
+                export_path = os.path.join(tmpdir, f"export_{partition_by}.csv")
+                vault.export_csv(export_path)
+            
+            from pm_vault import read_csv_vault
+            exported_key, exported_headers, exported_rows = read_csv_vault(export_path)
+            if exported_key != encrypted_master_key or exported_headers != headers or \
+                    sorted(int(row[0]) for row in exported_rows) != list(range(1, 41)):
+                raise ValueError("Exported vault does not match!")
+    
+    print("✅ Sharded vault test passed!\n")
+
+
+def test_vault_diff():
+    """Test diffing two exports reports only added, changed and deleted rows"""
+    print("🔍 Testing vault diff...")
+    
+    import csv
+    import tempfile
+    from pm_crypto import generate_sym_key
+    from pm_diff import VaultDiff
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = generate_sym_key()
+    encrypted_master_key = ez_subtle_encrypt(engine.master_key, "diff passphrase")
+    rows = [[str(i), f"site{i}.com", engine.encrypt_secret_with_master_key(f"user{i}"),
+             engine.encrypt_secret_with_master_key(f"pass{i}")] for i in range(1, 31)]
+    
+    def write_export(path, headers, data_rows):
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", encrypted_master_key])
+            writer.writerow(headers)
+            writer.writerows(data_rows)
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        old_path = os.path.join(tmpdir, "old.csv")
+        new_path = os.path.join(tmpdir, "new.csv")
+        write_export(old_path, ["Index", "Site", "Username", "Password"], rows)
+        
+        # Reordered columns; one password changed, one row deleted, one added
+        new_rows = [[row[1], row[0], row[3], row[2]] for row in rows if row[0] != "4"]
+        new_rows[6][2] = engine.encrypt_secret_with_master_key("new pass8")
+        new_rows.append(["new.com", "31", engine.encrypt_secret_with_master_key("pass31"), ""])
+        write_export(new_path, ["Site", "Index", "Password", "Username"], new_rows)
+        
+        diff = VaultDiff(old_path, new_path)
+        summary = [(c.kind, c.index, c.columns) for c in diff.changes]
+        print(f"  Changes: {summary}")
+        if summary != [("changed", "8", ("Password",)), ("added", "31", ("Site", "Index", "Password")),
+                       ("deleted", "4", ("Index", "Site", "Username", "Password"))]:
+            raise ValueError("Wrong changes reported!")
+        if diff.unchanged != 28 or diff.master_key_changed:
+            raise ValueError("Unchanged rows miscounted!")
+        
+        # Without an engine no encrypted values are exposed
+        if diff.report()[0] != {"change": "changed", "index": "8", "site": "site8.com", "columns": ["Password"],
+                                "old": {}, "new": {}}:
+            raise ValueError("Report without an engine should leave encrypted values out!")
+        
+        report = diff.report(engine, workers=2)
+        if report[0]["old"] != {"Password": "pass8"} or report[0]["new"] != {"Password": "new pass8"}:
+            raise ValueError("Changed values were not decrypted!")
+        if report[2]["old"]["Username"] != "user4" or report[2]["new"] is not None:
+            raise ValueError("Deleted row was not decrypted!")
+    
+    print("✅ Vault diff test passed!\n")
+
+
+def test_vault_audit():
+    """Test the audit finds every corrupted cell and reports its cause"""
+    print("🩺 Testing vault audit...")
+    
+    import csv
+    import tempfile
+    from pm_audit import audit_csv_vault
+    from pm_crypto import bytes_to_base64, base64_string_to_bytes, generate_sym_key
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = generate_sym_key()
+    rows = [[str(i), f"site{i}.com", engine.encrypt_secret_with_master_key(f"user{i}"),
+             ez_subtle_encrypt(f"pass{i}", engine.master_key, compact=i % 2 == 0)] for i in range(1, 51)]
+    
+    # Flip one byte of the GCM tag, keeping the envelope valid
+    iv_b64, ct_b64 = rows[9][2].split("&")
+    ct = bytearray(base64_string_to_bytes(ct_b64))
+    ct[-1] ^= 0x01
+    rows[9][2] = iv_b64 + "&" + bytes_to_base64(bytes(ct))
+    rows[19][3] = rows[19][3][:6]
+    rows[29][2] = rows[29][2][:-1]
+    rows[39][2] = ""  # empty cells are skipped
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "vault.csv")
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", ez_subtle_encrypt(engine.master_key, "audit passphrase")])
+            writer.writerow(["Index", "Site", "Username", "Password"])
+            writer.writerows(rows)
+        
+        seen = []
+        result = audit_csv_vault(engine, path, workers=4, chunk_size=7,
+                                 progress=lambda cells, seconds: seen.append(cells))
+        found = [(f.row, f.index, f.column, f.cause) for f in result.failures]
+        print(f"  {result.cells} cells, failures: {found}")
+        if found != [(10, "10", "Username", "bad tag"), (20, "20", "Password", "bad envelope"),
+                     (30, "30", "Username", "bad base64")]:
+            raise ValueError("Wrong audit failures!")
+        if result.ok or result.rows != 50 or result.cells != 99:
+            raise ValueError("Audit counted the wrong rows or cells!")
+        if seen[-1] != 99 or seen != sorted(seen) or len(seen) != 15:
+            raise ValueError("Audit progress was not reported per chunk!")
+        
+        # A clean vault passes
+        rows[9][2] = rows[29][2] = engine.encrypt_secret_with_master_key("fixed")
+        rows[19][3] = engine.encrypt_secret_with_master_key("fixed")
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", ""])
+            writer.writerow(["Index", "Site", "Username", "Password"])
+            writer.writerows(rows)
+        if not audit_csv_vault(engine, path).ok:
+            raise ValueError("Clean vault should pass the audit!")
+        
+        try:
+            audit_csv_vault(PasswordManagerEngine(), path)
+            raise ValueError("Audit should require an unlocked engine!")
+        except ValueError as e:
+            if "unlocked" not in str(e):
+                raise
+    
+    print("✅ Vault audit test passed!\n")
+
+
+def test_process_pool():
+    """Test bulk work on a process pool matches the thread pool"""
+    print("🏭 Testing process pool mode...")
+    
+    import csv
+    import tempfile
+    from pm_audit import audit_csv_vault
+    from pm_crypto import decrypt_many, decrypt_many_in_worker, generate_sym_key, init_worker_keys
+    from pm_parallel import ordered_map, resolve_mode, PROCESS_MIN_ITEMS
+    from pm_rotate import rotate_csv_vault
+    
+    if resolve_mode('auto', 10) != 'thread' or resolve_mode('auto') != 'thread':
+        raise ValueError("Small or unsized jobs should stay on threads!")
+    expected_auto = 'process' if (os.cpu_count() or 1) > 1 else 'thread'
+    if resolve_mode('auto', PROCESS_MIN_ITEMS) != expected_auto or resolve_mode('process', 1) != 'process':
+        raise ValueError("Wrong pool mode picked!")
+    try:
+        resolve_mode('fibers')
+        raise ValueError("Unknown modes should be rejected!")
+    except ValueError as e:
+        if "mode must be" not in str(e):
+            raise
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = generate_sym_key()
+    ciphertexts = [ez_subtle_encrypt(f"secret {i}", engine.master_key, compact=i % 3 == 0) for i in range(40)]
+    outcomes = decrypt_many(ciphertexts[:2] + ["not a ciphertext"], engine.master_key)
+    if outcomes[:2] != [b"secret 0", b"secret 1"] or getattr(outcomes[2], "cause", None) != "bad envelope":
+        raise ValueError("decrypt_many should return errors in place!")
+    
+    # The key goes to each worker once, through the initializer
+    chunks = [ciphertexts[i:i + 7] for i in range(0, 40, 7)]
+    results = list(ordered_map(decrypt_many_in_worker, chunks, workers=2, mode='process',
+                               initializer=init_worker_keys, initargs=(engine.master_key,)))
+    if [p for chunk in results for p in chunk] != [f"secret {i}".encode() for i in range(40)]:
+        raise ValueError("Process pool decryption failed!")
+    
+    headers = ["Index", "Site", "Username", "Password"]
+    rows = [[str(i), f"site{i}.com", c, "" if i % 5 == 0 else engine.encrypt_secret_with_master_key(f"pass{i}")]
+            for i, c in enumerate(ciphertexts)]
+    rows[7][3] = "garbage"
+    rows.append(["short row"])
+    by_threads = list(engine.decrypt_vault(rows, headers, workers=2))
+    by_processes = list(engine.decrypt_vault(rows, headers, workers=2, mode='process', chunk_size=6))
+    print(f"  Row 7: {by_processes[7]}")
+    if by_processes != by_threads or not by_processes[7][3].startswith("[Decryption failed"):
+        raise ValueError("Process pool decrypt_vault differs from threads!")
+    
+    encrypted = engine.encrypt_many([f"value {i}" for i in range(25)], workers=2, mode='process', chunk_size=4)
+    if [ez_subtle_decrypt(c, engine.master_key) for c in encrypted] != [f"value {i}".encode() for i in range(25)]:
+        raise ValueError("Process pool encrypt_many failed!")
+    
+    # Inline (workers=1) process-mode runs call the initializer here; the keys must not outlive them
+    import pm_crypto
+    inline = list(engine.decrypt_vault(rows, headers, workers=1, mode='process', chunk_size=6))
+    if inline != by_threads or pm_crypto._worker_keys:
+        raise ValueError("Inline process-mode run leaked the worker keys!")
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "vault.csv")
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", ez_subtle_encrypt(engine.master_key, "old passphrase")])
+            writer.writerow(headers)
+            writer.writerows(rows[:-1])
+        
+        result = audit_csv_vault(engine, path, workers=2, chunk_size=9, mode='process')
+        if [(f.row, f.column, f.cause) for f in result.failures] != [(8, "Password", "bad envelope")]:
+            raise ValueError("Process pool audit missed the bad cell!")
+        
+        rows[7][3] = engine.encrypt_secret_with_master_key("pass7")
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", ez_subtle_encrypt(engine.master_key, "old passphrase")])
+            writer.writerow(headers)
+            writer.writerows(rows[:-1])
+        
+        rotated = os.path.join(tmpdir, "rotated.csv")
+        rotate_csv_vault(engine, path, rotated, "new passphrase", workers=2, mode='process')
+        new_engine = PasswordManagerEngine()
+        with open(rotated, newline='') as f:
+            rotated_rows = list(csv.reader(f))
+        new_engine.master_key = ez_subtle_decrypt(rotated_rows[0][1], "new passphrase")
+        if list(new_engine.decrypt_vault(rotated_rows[2:], headers)) != \
+                list(engine.decrypt_vault(rows[:-1], headers)):
+            raise ValueError("Process pool rotation failed!")
+    
+    print("✅ Process pool test passed!\n")
+
+
+def test_password_import():
+    """Test other password managers' exports map onto the vault layout and encrypt"""
+    print("📥 Testing password import...")
+    
+    import csv
+    import tempfile
+    from pm_crypto import generate_sym_key
+    from pm_import import detect_layout, import_passwords, RowMapper, LAYOUTS
+    
+    exports = {
+        "bitwarden": (["folder", "favorite", "type", "name", "notes", "fields", "reprompt",
+                       "login_uri", "login_username", "login_password", "login_totp"],
+                      ["Work", "", "login", "GitHub", "my notes", "", "0",
+                       "https://github.com/login", "octo", "hunter2", "JBSWY3DP"]),
+        "lastpass": (["url", "username", "password", "totp", "extra", "name", "grouping", "fav"],
+                     ["https://github.com", "octo", "hunter2", "", "my notes", "GitHub", "Work", "0"]),
+        "keepass": (["Group", "Title", "Username", "Password", "URL", "Notes", "TOTP"],
+                    ["Work", "GitHub", "octo", "hunter2", "https://github.com", "my notes", ""]),
+        "chrome": (["name", "url", "username", "password", "note"],
+                   ["GitHub", "https://github.com/", "octo", "hunter2", "my notes"]),
+        "generic": (["Site", "Username", "Password", "Notes"], ["GitHub", "octo", "hunter2", "my notes"]),
+    }
+    for name, (headers, row) in exports.items():
+        layout = detect_layout(headers)
+        mapped = RowMapper(layout, headers).map(row)
+        print(f"  {name}: {mapped}")
+        if layout.name != name or mapped[:3] != ("GitHub", "octo", "hunter2") or \
+                not mapped[3].startswith("my notes"):
+            raise ValueError(f"{name} export mapped wrongly!")
+    
+    # A URL stands in for a missing name, and is not repeated in AdditionalInfo
+    chrome = RowMapper(LAYOUTS["chrome"], exports["chrome"][0])
+    if chrome.map(["", "https://mail.example.com/inbox", "me", "pw", ""]) != ("mail.example.com", "me", "pw", ""):
+        raise ValueError("URL should be used as the Site!")
+    if chrome.map(["", "", "", "", ""]) is not None:
+        raise ValueError("Empty rows should be skipped!")
+    try:
+        detect_layout(["a", "b"])
+        raise ValueError("Unknown layouts should be rejected!")
+    except ValueError as e:
+        if "Unrecognized" not in str(e):
+            raise
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = generate_sym_key()
+    encrypted_master_key = ez_subtle_encrypt(engine.master_key, "import passphrase")
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        source = os.path.join(tmpdir, "bitwarden.csv")
+        with open(source, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(exports["bitwarden"][0])
+            for i in range(23):
+                writer.writerow(["", "", "login", f"Site {i}", "", "", "0", "", f"user{i}", f"pass{i}", ""])
+            writer.writerow([""] * 11)
+        
+        existing = os.path.join(tmpdir, "vault.csv")
+        with open(existing, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", encrypted_master_key])
+            writer.writerow(["Index", "Site", "Username", "Password", "AdditionalInfo"])
+            writer.writerow(["7", "old.com", engine.encrypt_secret_with_master_key("old user"), "", ""])
+        
+        batches = []
+        for mode in ('thread', 'process'):
+            output = os.path.join(tmpdir, f"import_{mode}.csv")
+            count = import_passwords(engine, source, output, encrypted_master_key, existing_csv=existing,
+                                     batch_size=5, workers=2, mode=mode, progress=batches.append)
+            with open(output, newline='') as f:
+                rows = list(csv.reader(f))
+            decrypted = list(engine.decrypt_vault(rows[2:], rows[1]))
+            if count != 23 or rows[0][1] != encrypted_master_key or len(decrypted) != 24:
+                raise ValueError(f"Wrong number of imported rows ({mode})!")
+            if decrypted[0][:3] != ["7", "old.com", "old user"] or \
+                    decrypted[1] != ["8", "Site 0", "user0", "pass0", ""] or decrypted[-1][0] != "30":
+                raise ValueError(f"Imported rows are wrong ({mode})!")
+        if batches[:5] != [5, 10, 15, 20, 23]:
+            raise ValueError("Import progress was not reported per batch!")
+    
+    print("✅ Password import test passed!\n")
+
+
+def test_compressed_payloads():
+    """Test opt-in compression of long secrets is detected on decrypt"""
+    print("🗜️  Testing compressed payloads...")
+    
+    import csv
+    import tempfile
+    from pm_crypto import (compress_payload, decompress_payload, generate_sym_key,
+                           COMPRESSED_MAGIC, PayloadError)
+    from pm_rotate import rotate_csv_vault
+    
+    note = "\n".join(f"recovery code {i}: {i * 7919:08d}-{i * 104729:08d}" for i in range(40))
+    random_bytes = os.urandom(200)
+    for value in (b"short", note.encode(), COMPRESSED_MAGIC + b"looks compressed", random_bytes):
+        if decompress_payload(compress_payload(value)) != value:
+            raise ValueError("Compressed payload did not round-trip!")
+    if compress_payload(b"short") != b"short" or compress_payload(random_bytes) != random_bytes:
+        raise ValueError("Values that do not shrink should be left alone!")
+    if not compress_payload(note).startswith(COMPRESSED_MAGIC):
+        raise ValueError("Long values should be compressed!")
+    if compress_payload(COMPRESSED_MAGIC + b"x") == COMPRESSED_MAGIC + b"x":
+        raise ValueError("Values that start with the marker must be wrapped!")
+    try:
+        decompress_payload(COMPRESSED_MAGIC + b"not deflate")
+        raise ValueError("Corrupt payloads should be rejected!")
+    except PayloadError:
+        pass
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = generate_sym_key()
+    plain_ciphertext = engine.encrypt_secret_with_master_key(note)
+    engine.compress_secrets = True
+    compressed_ciphertext = engine.encrypt_secret_with_master_key(note)
+    short_ciphertext = engine.encrypt_secret_with_master_key("hunter2")
+    print(f"  Note ciphertext: {len(plain_ciphertext)} -> {len(compressed_ciphertext)} characters")
+    if len(compressed_ciphertext) * 2 > len(plain_ciphertext):
+        raise ValueError("Compression should shrink a long note!")
+    if ez_subtle_decrypt(short_ciphertext, engine.master_key) != b"hunter2":
+        raise ValueError("Short values should not be compressed!")
+    
+    # Detection is automatic, whether or not compress_secrets is set
+    reader = PasswordManagerEngine()
+    reader.master_key = engine.master_key
+    for ciphertext in (plain_ciphertext, compressed_ciphertext):
+        if reader.decrypt_secret_with_master_key(ciphertext, readable=True) != note:
+            raise ValueError("Compressed secret was not detected!")
+    
+    headers = ["Index", "Site", "AdditionalInfo"]
+    rows = [["1", "a.com", compressed_ciphertext], ["2", "b.com", plain_ciphertext],
+            ["3", "c.com", engine.encrypt_many([note, "x"])[0]]]
+    for mode in ('thread', 'process'):
+        if [row[2] for row in reader.decrypt_vault(rows, headers, workers=2, mode=mode)] != [note] * 3:
+            raise ValueError(f"decrypt_vault did not decompress ({mode})!")
+    
+    # Rotation keeps payloads as they were stored
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "vault.csv")
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", ez_subtle_encrypt(engine.master_key, "pw")])
+            writer.writerow(headers)
+            writer.writerows(rows)
+        rotated = os.path.join(tmpdir, "rotated.csv")
+        rotate_csv_vault(reader, path, rotated, "new pw", workers=1)
+        with open(rotated, newline='') as f:
+            rotated_rows = list(csv.reader(f))
+        new_key = ez_subtle_decrypt(rotated_rows[0][1], "new pw")
+        payload = ez_subtle_decrypt(rotated_rows[2][2], new_key)
+        if not payload.startswith(COMPRESSED_MAGIC) or decompress_payload(payload) != note.encode():
+            raise ValueError("Rotation should keep compressed payloads compressed!")
+        
+        # The audit inflates compressed payloads too
+        from pm_audit import audit_csv_vault
+        rows[1][2] = ez_subtle_encrypt(COMPRESSED_MAGIC + b"not deflate", engine.master_key)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", ""])
+            writer.writerow(headers)
+            writer.writerows(rows)
+        causes = [(f.row, f.cause) for f in audit_csv_vault(reader, path).failures]
+        if causes != [(2, "bad payload")]:
+            raise ValueError("Audit should flag a corrupt compressed payload!")
+        if ez_subtle_decrypt(rotated_rows[3][2], new_key) != note.encode():
+            raise ValueError("Rotation should keep plain payloads plain!")
+    
+    print("✅ Compressed payload test passed!\n")
+
+
+def test_vault_model():
+    """Test the columnar Vault reads back rows, shares site strings and feeds the engine"""
+    print("🧱 Testing columnar vault model...")
+    
+    import csv
+    import tempfile
+    from pm_crypto import generate_sym_key
+    from pm_vault import Vault, VaultRow, read_csv_vault
+    
+    engine = PasswordManagerEngine()
+    engine.master_key = generate_sym_key()
+    headers = ["Index", "Site", "Username", "Password"]
+    rows = [[str(i), "".join(["site", str(i % 3), ".com"]), engine.encrypt_secret_with_master_key(f"user{i}"),
+             engine.encrypt_secret_with_master_key(f"pass{i}")] for i in range(1, 41)]
+    rows[4] = rows[4][:2]
+    rows[5] = rows[5] + ["extra cell"]
+    rows[6] = []
+    
+    vault = Vault.from_rows(headers, rows)
+    if len(vault) != 40 or len(vault.columns[0]) != 40:
+        raise ValueError("Vault size is wrong!")
+    # Short, long and blank rows read back exactly as stored
+    if [row.cells() for row in vault] != rows or list(vault[6]) != [] or len(vault[5]) != 5:
+        raise ValueError("Rows did not read back as stored!")
+    if vault[4]["Password"] != "" or vault[4][3] != "" or vault.columns[3][6] != "":
+        raise ValueError("Missing cells of short rows should read as empty!")
+    entry = vault[9]
+    if not isinstance(entry, VaultRow) or entry["SITE "] != rows[9][1] or entry[2] != rows[9][2]:
+        raise ValueError("Row lookup by name or position failed!")
+    if entry.index != "10" or "password" not in entry or "notes" in entry or entry.get("notes", "-") != "-":
+        raise ValueError("Row helpers failed!")
+    if vault.sites[0] is not vault.sites[3] or vault.sites[0] != "site1.com":
+        raise ValueError("Repeated sites should share one string!")
+    try:
+        vault[40]
+        raise ValueError("Out of range row should raise IndexError!")
+    except IndexError:
+        pass
+    
+    # The engine decrypts a Vault like a list of rows, on threads and processes
+    expected = list(engine.decrypt_vault(rows, headers, workers=1))
+    if list(engine.decrypt_vault(vault, headers, workers=2)) != expected:
+        raise ValueError("Decrypting a Vault should match decrypting list rows!")
+    if list(engine.decrypt_vault(vault, headers, workers=2, mode='process')) != expected:
+        raise ValueError("Decrypting a Vault in processes should match list rows!")
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "vault.csv")
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Master key", "encrypted master key"])
+            writer.writerow(headers)
+            writer.writerows(rows)
+        
+        loaded = engine.load_vault(path)
+        if loaded is not engine.vault or loaded.encrypted_master_key != "encrypted master key":
+            raise ValueError("load_vault did not keep the vault!")
+        if [row.cells() for row in loaded] != rows or read_csv_vault(path)[2] != rows:
+            raise ValueError("Loaded vault differs from the CSV rows!")
+        match = engine.search_sites("site2.com", limit=1)[0]
+        if engine.lazy_row(loaded[match.position], loaded.headers, loaded.positions)["Password"] != f"pass{match.position + 1}":
+            raise ValueError("Lazy row over a VaultRow failed!")
+    
+    print("✅ Columnar vault model test passed!\n")
+
+
 def test_fake_values():
     """Test with the fake values from JavaScript code"""
     print("🎭 Testing with JavaScript fake values...")
@@ -114,13 +1562,68 @@ def test_fake_values():
     print("✅ Fake values test completed!\n")
 
 
+def test_decrypt_vault():
+    """Test bulk decryption of a vault export keeps order and plain columns"""
+    print("📦 Testing bulk vault decryption...")
+    
+    from pm_crypto import generate_sym_key
+    engine = PasswordManagerEngine()
+    engine.master_key = generate_sym_key()
+    
+    headers = ["Index", "Site", "Username", "Password", "AdditionalInfo"]
+    expected = [[str(i), f"site{i}", f"user{i}", f"pass{i}", ""] for i in range(50)]
+    rows = [
+        [idx, site] + [engine.encrypt_secret_with_master_key(v) if v else "" for v in secrets]
+        for idx, site, *secrets in expected
+    ]
+    rows[7][3] = "bm90LWEtY2lwaGVydGV4dA==&bm90LWEtY2lwaGVydGV4dA=="
+    
+    decrypted = list(engine.decrypt_vault(rows, headers, workers=4))
+    print(f"  Decrypted {len(decrypted)} rows")
+    
+    if decrypted[7][3].startswith("[Decryption failed"):
+        decrypted[7][3] = expected[7][3]
+    else:
+        raise ValueError("Corrupted cell was not reported!")
+    
+    if decrypted != expected:
+        raise ValueError("Bulk vault decryption test failed!")
+    
+    print("✅ Bulk vault decryption test passed!\n")
+
+
 if __name__ == "__main__":
     print("🚀 Starting Python Password Manager Engine tests...\n")
     
     try:
         test_basic_encryption()
+        test_codec_compatibility()
+        test_compact_envelope()
+        test_kdf_cache()
         test_master_key_flow()
+        test_key_handles()
+        test_storage_layer()
+        test_sqlite_vault()
+        test_csv_vault_reader()
+        test_site_search()
+        test_lazy_rows()
+        test_batch_get()
+        test_async_engine()
+        test_unlock_agent()
+        test_cli_startup()
+        test_benchmarks()
+        test_metrics()
+        test_key_rotation()
+        test_encrypt_many()
+        test_sharded_vault()
+        test_vault_diff()
+        test_vault_audit()
+        test_process_pool()
+        test_password_import()
+        test_compressed_payloads()
+        test_vault_model()
         test_fake_values()
+        test_decrypt_vault()
         
         print("🎉 All tests completed successfully!")
         